@@ -1,13 +1,35 @@
 # chat/consumers.py
-import json
-from channels.generic.websocket import AsyncWebsocketConsumer
-from .views.messages import create_message
+from django.utils import timezone
 
+# Channels
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.db import database_sync_to_async
+
+# Models
+from api.chats.models import Chat, Message
+
+
+MESSAGE_MAX_LENGTH = 1000
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """Chat room socket.
+
+    Messages are persisted here and broadcast to the chat-<id> group, the
+    same group the user sockets subscribe to.
+    """
 
-class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
-        self.room_group_name = "chat_%s" % self.room_name
+        self.user = self.scope["user"]
+        self.chat_id = self.scope["url_route"]["kwargs"]["room_name"]
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+        if not await self.is_participant():
+            await self.close(code=4003)
+            return
+
+        self.room_group_name = "chat-%s" % self.chat_id
         # Join room group
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
@@ -15,51 +37,53 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         # Leave room group
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if hasattr(self, "room_group_name"):
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        files = text_data_json['files']
-
-        text = text_data_json["text"]
-        sent_by = text_data_json["sent_by"]
-        # Send message to room group
+    async def receive_json(self, content, **kwargs):
+        text = content.get("text") if isinstance(content, dict) else None
+        if not isinstance(text, str) or not text or len(text) > MESSAGE_MAX_LENGTH:
+            await self.send_json({"event": "ERROR", "detail": "Invalid message"})
+            return
 
         # Create message
+        message = await self.create_message(text)
 
-        message, chat__pk, files = await create_message(self, text, sent_by, files)
-
+        # Send message to room group
         await self.channel_layer.group_send(
             self.room_group_name,
             {
-                "type": "chat_message",
-                "id": str(message.id),
-                "text": text,
-                "sent_by": sent_by,
-                "created": str(message.created),
-                "chat__pk": str(chat__pk),
-                "files": files
+                "type": "room.event",
+                "topic": "chat",
+                "id": self.chat_id,
+                "event": "MESSAGE",
+                "data": {
+                    "id": str(message.id),
+                    "text": message.text,
+                    "sent_by": str(self.user.id),
+                    "sent_by__username": self.user.username,
+                    "created": str(message.created),
+                    "chat__id": self.chat_id,
+                },
             },
         )
 
-    # Receive message from room group
-    async def chat_message(self, event):
-        id = event["id"]
-        text = event["text"]
-        sent_by = event["sent_by"]
-        created = event["created"]
-        chat__pk = event["chat__pk"]
-        files = event["files"]
+    @database_sync_to_async
+    def is_participant(self):
+        try:
+            return Chat.objects.filter(id=self.chat_id, participants=self.user).exists()
+        except Exception:
+            # Malformed ids
+            return False
 
+    @database_sync_to_async
+    def create_message(self, text):
+        message = Message.objects.create(chat_id=self.chat_id, text=text, sent_by=self.user)
+        Chat.objects.filter(id=self.chat_id).update(last_message=message, modified=timezone.now())
+        return message
+
+    # Receive message from room group
+    async def room_event(self, event):
         # Send message to WebSocket
-        await self.send(
-            text_data=json.dumps({
-                "id": id,
-                "text": text,
-                "sent_by": sent_by,
-                "created": created,
-                "chat__id": chat__pk,
-                "files": files,
-            })
-        )
+        await self.send_json({key: value for key, value in event.items() if key != "sender_channel_name"})
@@ -0,0 +1,64 @@
+"""Chats inbox.
+
+The participant row of a chat holds the inbox entry of the participant:
+the other participant, the last message text, time and sender and the read
+watermark, the last message read and its time. The rows of a chat are
+updated in one query when a message is written, so the inbox is a range
+scan over the (participant, last_message_at) index. The unread messages
+are the messages of the other participants after the watermark, counted
+over the (chat, created, id) index.
+"""
+
+# Django
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Models
+from api.chats.models import Message, Participant
+
+
+def link(chat_id):
+    """Set the other participant of the chat participants."""
+    participants = list(Participant.objects.filter(room=chat_id).values_list('id', 'participant'))
+    if len(participants) != 2:
+        return
+    (first_id, first_user), (second_id, second_user) = participants
+    Participant.objects.filter(id=first_id).update(to_user=second_user)
+    Participant.objects.filter(id=second_id).update(to_user=first_user)
+
+
+def record_message(message):
+    """Set the last message of the chat inbox entries."""
+    Participant.objects.filter(room=message.chat_id).update(
+        last_message=message.id,
+        last_message_text=message.text,
+        last_message_at=message.created,
+        last_message_sent_by=message.sent_by_id,
+    )
+
+
+def mark_read(chat_id, user_id):
+    """Move the user read watermark to the chat last message."""
+    return Participant.objects.filter(room=chat_id, participant=user_id).exclude(
+        last_read_message=F('last_message')).update(last_read_message=F('last_message'), last_read_at=F('last_message_at'))
+
+
+def with_unread_count(queryset):
+    """Annotate the inbox entries with the count of unread messages."""
+    unread = Message.objects.filter(
+        chat=OuterRef('room'),
+        # Everything since joining the chat is unread until the first read
+        created__gt=Coalesce(OuterRef('last_read_at'), OuterRef('created')),
+    ).exclude(sent_by=OuterRef('participant')).order_by().values('chat').annotate(count=Count('id')).values('count')
+    return queryset.annotate(unread_count=Coalesce(Subquery(unread), Value(0)))
+
+
+def refresh(chat_id):
+    """Set the last message of the chat inbox entries from the messages."""
+    message = Message.objects.filter(chat=chat_id).order_by('-created').first()
+    Participant.objects.filter(room=chat_id).update(
+        last_message=message.id if message else None,
+        last_message_text=message.text if message else None,
+        last_message_at=message.created if message else None,
+        last_message_sent_by=message.sent_by_id if message else None,
+    )
@@ -0,0 +1,81 @@
+# Generated by Django 3.0.3 on 2021-06-10 09:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0002_auto_20210519_1221'),
+        ('chats', '0002_auto_20210519_1221'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.Message'),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='last_message_sent_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='last_message_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='to_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='unread_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['participant', '-last_message_at', '-id'], name='chat_inbox_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE chats_participant SET
+                last_message_id = chats_message.id,
+                last_message_text = chats_message.text,
+                last_message_at = chats_message.created,
+                last_message_sent_by_id = chats_message.sent_by_id
+            FROM chats_chat JOIN chats_message ON chats_message.id = chats_chat.last_message_id
+            WHERE chats_chat.id = chats_participant.room_id;
+
+            UPDATE chats_participant SET to_user_id = other.participant_id
+            FROM chats_participant other
+            WHERE other.room_id = chats_participant.room_id
+            AND other.participant_id <> chats_participant.participant_id
+            AND (SELECT COUNT(*) FROM chats_participant room WHERE room.room_id = chats_participant.room_id) = 2;
+
+            UPDATE chats_participant SET unread_count = (
+                SELECT COUNT(*) FROM notifications_notificationuser
+                JOIN notifications_notification
+                ON notifications_notification.id = notifications_notificationuser.notification_id
+                JOIN notifications_notification_messages
+                ON notifications_notification_messages.notification_id = notifications_notification.id
+                WHERE notifications_notification.chat_id = chats_participant.room_id
+                AND notifications_notification.type = 'ME'
+                AND notifications_notificationuser.user_id = chats_participant.participant_id
+                AND NOT notifications_notificationuser.is_read
+            );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
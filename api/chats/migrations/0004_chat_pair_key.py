@@ -0,0 +1,36 @@
+# Generated by Django 3.0.3 on 2021-06-10 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_chat_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='pair_key',
+            field=models.CharField(blank=True, max_length=73, null=True, unique=True),
+        ),
+        migrations.RunSQL(
+            # The oldest chat of every pair of participants is the direct chat
+            sql="""
+            WITH pairs AS (
+                SELECT room_id, string_agg(participant_id::text, ':' ORDER BY participant_id::text COLLATE "C") AS pair_key
+                FROM chats_participant
+                GROUP BY room_id
+                HAVING COUNT(*) = 2 AND COUNT(DISTINCT participant_id) = 2
+            ), direct_chats AS (
+                SELECT DISTINCT ON (pairs.pair_key) pairs.room_id, pairs.pair_key
+                FROM pairs JOIN chats_chat ON chats_chat.id = pairs.room_id
+                ORDER BY pairs.pair_key, chats_chat.created
+            )
+            UPDATE chats_chat SET pair_key = direct_chats.pair_key
+            FROM direct_chats WHERE direct_chats.room_id = chats_chat.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.3 on 2021-06-10 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0004_chat_pair_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', 'created', 'id'], name='chat_message_history_idx'),
+        ),
+    ]
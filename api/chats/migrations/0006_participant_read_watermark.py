@@ -0,0 +1,42 @@
+# Generated by Django 3.0.3 on 2021-06-11 10:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0005_message_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.Message'),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE chats_participant SET
+                last_read_message_id = chats_message.id,
+                last_read_at = chats_message.created
+            FROM chats_seenby JOIN chats_message ON chats_message.id = chats_seenby.message_id
+            WHERE chats_seenby.chat_id = chats_participant.room_id
+            AND chats_seenby.user_id = chats_participant.participant_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='participant',
+            name='unread_count',
+        ),
+        migrations.DeleteModel(
+            name='SeenBy',
+        ),
+    ]
@@ -1,4 +1,3 @@
 from .chats import Chat
 from .messages import Message, MessageFile
 from .participants import Participant
-from .seen_by import SeenBy
@@ -12,7 +12,13 @@ class Chat(CModel):
     last_message = models.ForeignKey(
         "chats.Message", on_delete=models.SET_NULL, null=True, related_name="last_message"
     )
+    # Sorted participant ids of the direct chats
+    pair_key = models.CharField(max_length=73, unique=True, null=True, blank=True)
 
     class Meta:
 
         ordering = ["-last_message__created"]
+
+    @staticmethod
+    def get_pair_key(user, other_user):
+        return ":".join(sorted([str(user.pk), str(other_user.pk)]))
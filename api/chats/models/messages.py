@@ -11,6 +11,9 @@ class Message(CModel):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=['chat', 'created', 'id'], name='chat_message_history_idx'),
+        ]
 
 
 class MessageFile(CModel):
@@ -6,3 +6,22 @@ class Participant(CModel):
 
     room = models.ForeignKey("chats.Chat", on_delete=models.CASCADE)
     participant = models.ForeignKey("users.User", on_delete=models.CASCADE)
+
+    # Inbox entry of the participant, see api.chats.inbox
+    to_user = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message = models.ForeignKey("chats.Message", on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name="+")
+    last_message_text = models.TextField(null=True, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_sent_by = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True, blank=True,
+                                             related_name="+")
+
+    # Read watermark, the messages after it are unread
+    last_read_message = models.ForeignKey("chats.Message", on_delete=models.SET_NULL, null=True, blank=True,
+                                          related_name="+")
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta(CModel.Meta):
+        indexes = [
+            models.Index(fields=['participant', '-last_message_at', '-id'], name='chat_inbox_idx'),
+        ]
@@ -7,14 +7,16 @@ from rest_framework import serializers
 
 # Models
 from api.users.models import User
-from api.chats.models import Chat, SeenBy, MessageFile
-from api.notifications.models import NotificationUser
+from api.chats.models import Chat, MessageFile, Participant
+from api.notifications.models import Notification, NotificationUser
 
 # Serializers
 from api.users.serializers import UserModelSerializer
 
 # Utils
 from api.utils import helpers
+from api.chats import inbox
+from api.notifications import counters
 
 
 class ChatModelSerializer(serializers.ModelSerializer):
@@ -78,12 +80,8 @@ class ChatModelSerializer(serializers.ModelSerializer):
             if obj.last_message.sent_by == user:
                 return True
 
-            seen_by = SeenBy.objects.filter(chat=obj, user=user)
-            if seen_by.exists():
-                seen_by = seen_by[0]
-
-                return seen_by.message == obj.last_message
-            return False
+            return Participant.objects.filter(
+                room=obj, participant=user, last_read_message=obj.last_message_id).exists()
         else:
             return True
 
@@ -106,6 +104,59 @@ class ChatModelSerializer(serializers.ModelSerializer):
         return None
 
 
+class InboxModelSerializer(serializers.ModelSerializer):
+    """Chat inbox entry serializer, with the ChatModelSerializer fields."""
+
+    id = serializers.UUIDField(source="room_id", read_only=True)
+    room_name = serializers.SerializerMethodField(read_only=True)
+    picture = serializers.SerializerMethodField(read_only=True)
+    last_message = serializers.CharField(source="last_message_text", read_only=True)
+    created = serializers.DateTimeField(source="room.created", read_only=True)
+    last_message_seen = serializers.SerializerMethodField(read_only=True)
+    last_message_sent_by_username = serializers.SerializerMethodField(read_only=True)
+    last_message_created = serializers.DateTimeField(source="last_message_at", read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        """Meta class."""
+
+        model = Participant
+        fields = (
+            "id",
+            "room_name",
+            "picture",
+            "last_message",
+            "created",
+            "last_message_seen",
+            "last_message_sent_by",
+            "last_message_sent_by_username",
+            "last_message_created",
+            "unread_count",
+        )
+
+        read_only_fields = fields
+
+    def get_room_name(self, obj):
+        if obj.room.room_name:
+            return obj.room.room_name
+        if obj.to_user:
+            return obj.to_user.username
+        return None
+
+    def get_picture(self, obj):
+        if obj.to_user and obj.to_user.picture:
+            return obj.to_user.picture.url
+        return None
+
+    def get_last_message_seen(self, obj):
+        return obj.last_message_sent_by_id == obj.participant_id or obj.unread_count == 0
+
+    def get_last_message_sent_by_username(self, obj):
+        if obj.last_message_sent_by:
+            return obj.last_message_sent_by.username
+        return None
+
+
 class RetrieveChatModelSerializer(serializers.ModelSerializer):
     """User model serializer."""
 
@@ -166,10 +217,8 @@ class RetrieveChatModelSerializer(serializers.ModelSerializer):
             to_user = to_users[0]
 
             if obj.last_message and obj.last_message.sent_by == to_user:
-                seen_by = SeenBy.objects.filter(chat=obj, user=to_user)
-                if seen_by.exists():
-                    seen_by = seen_by[0]
-                    return seen_by.message == obj.last_message
+                return Participant.objects.filter(
+                    room=obj, participant=to_user, last_read_message=obj.last_message_id).exists()
 
         return False
 
@@ -199,43 +248,22 @@ class CreateChatSerializer(serializers.Serializer):
         to_user = get_object_or_404(User, pk=data["to_user"])
         from_user = self.context["request"].user
 
-        chats = Chat.objects.filter(participants=from_user)
-        chats = chats.filter(participants=to_user)
-
-        if chats.exists():
-            for chat in chats:
-                if chat.participants.all().count() == 2:
-                    return {"chat": chat}
-            raise serializers.ValidationError("Chat not found")
         return {"to_user": to_user, "from_user": from_user}
 
     def create(self, validated_data):
-        if "chat" in validated_data:
-            return {"chat": validated_data["chat"], "status": "retrieved"}
+        chat, created = helpers.get_or_create_chat(validated_data["from_user"], validated_data["to_user"])
 
-        to_user = validated_data["to_user"]
-        from_user = validated_data["from_user"]
-        chat = Chat.objects.create()
-
-        chat.participants.add(to_user)
-        chat.participants.add(from_user)
-        chat.save()
-
-        return {"chat": chat, "status": "created"}
+        return {"chat": chat, "status": "created" if created else "retrieved"}
 
 
 class ClearChatNotification(serializers.Serializer):
 
     def update(self, instance, validated_data):
         user = self.context['request'].user
-        user.pending_notifications = False
-        user.pending_messages = False
-        notifications = NotificationUser.objects.filter(notification__chat=instance, is_read=False, user=user)
-
-        for notification in notifications:
-            notification.is_read = True
-            notification.save()
-
-        user.save()
+        read = NotificationUser.objects.filter(
+            notification__chat=instance, notification__type=Notification.MESSAGES, is_read=False, user=user
+        ).update(is_read=True)
+        counters.decrement([user.id], counters.MESSAGES, read)
+        inbox.mark_read(instance.id, user.id)
 
         return instance
@@ -35,8 +35,8 @@ class MessageModelSerializer(serializers.ModelSerializer):
     def get_files(self, obj):
 
         from api.chats.serializers import MessageFileModelSerializer
-        files = MessageFile.objects.filter(message=obj.id)
-        return MessageFileModelSerializer(files, many=True).data
+        # Prefetched by the messages list
+        return MessageFileModelSerializer(obj.messagefile_set.all(), many=True).data
 
 
 class CreateMessageSerializer(serializers.Serializer):
@@ -48,8 +48,6 @@ class CreateMessageSerializer(serializers.Serializer):
         chat = self.context["chat"]
 
         message = Message.objects.create(chat=chat, text=validated_data["text"], sent_by=user)
-        user.pending_messages = False
-        user.save()
         chat.last_message = message
         chat.save()
         return message
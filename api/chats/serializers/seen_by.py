@@ -2,22 +2,30 @@
 from rest_framework import serializers
 
 # Models
-from api.chats.models import SeenBy
+from api.chats.models import Participant
+
+# Utils
+from api.chats import inbox
 
 # Serializers
 from api.users.serializers import UserModelSerializer
 
 
 class SeenByModelSerializer(serializers.ModelSerializer):
-    """User model serializer."""
+    """Read watermark of a chat participant."""
+
+    chat = serializers.UUIDField(source="room_id", read_only=True)
+    message = serializers.UUIDField(source="last_read_message_id", read_only=True)
+    user = serializers.UUIDField(source="participant_id", read_only=True)
+    modified = serializers.DateTimeField(source="last_read_at", read_only=True)
 
     class Meta:
         """Meta class."""
 
-        model = SeenBy
+        model = Participant
         fields = ("id", "chat", "message", "user", "modified")
 
-        read_only_fields = ("id",)
+        read_only_fields = fields
 
 
 class CreateSeenBySerializer(serializers.Serializer):
@@ -33,9 +41,5 @@ class CreateSeenBySerializer(serializers.Serializer):
         user = self.context["request"].user
         chat = self.context["chat"]
 
-        seen_by, created = SeenBy.objects.get_or_create(chat=chat, user=user)
-        if seen_by.message != chat.last_message:
-
-            seen_by.message = chat.last_message
-            seen_by.save()
-        return seen_by
\ No newline at end of file
+        inbox.mark_read(chat.id, user.id)
+        return Participant.objects.filter(room=chat, participant=user).first()
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""Chats signals."""
+
+# Django
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+# Models
+from api.chats.models import Chat, Message, Participant
+
+# Utils
+from api.chats import inbox
+
+
+@receiver(post_save, sender=Message)
+def record_message_in_inbox(sender, instance, created, **kwargs):
+    if created:
+        inbox.record_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def refresh_inbox_on_message_delete(sender, instance, **kwargs):
+    # Only the deletion of the last message changes the inbox
+    if Participant.objects.filter(room=instance.chat_id, last_message_at=instance.created).exists():
+        inbox.refresh(instance.chat_id)
+
+
+@receiver(m2m_changed, sender=Chat.participants.through)
+def link_inbox_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add":
+        for chat_id in (pk_set if reverse else [instance.pk]):
+            inbox.link(chat_id)
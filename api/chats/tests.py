@@ -1,3 +1,222 @@
-from django.test import TestCase
+# Django
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+# Django REST Framework
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User
+from api.chats.models import Chat, Message, MessageFile, Participant
+
+# Channels
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from asgiref.sync import async_to_sync
+from config.routing import application
+
+# Utils
+from api.chats import inbox
+from api.utils import helpers
+
+
+class InboxTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.client.force_authenticate(user=self.user)
+
+    def create_chat(self, username):
+        to_user = User.objects.create(username=username, email="%s@gmail.com" % username)
+        chat = Chat.objects.create()
+        chat.participants.add(self.user, to_user)
+        return chat, to_user
+
+    def get_unread_count(self, chat, user):
+        return inbox.with_unread_count(Participant.objects.filter(room=chat, participant=user)).get().unread_count
+
+    def test_messages_update_the_inbox(self):
+        """Messages should set the last message and the unread count of the other participant"""
+        chat, to_user = self.create_chat("ivan")
+        Message.objects.create(chat=chat, text="Hello", sent_by=to_user)
+        Message.objects.create(chat=chat, text="Are you there?", sent_by=to_user)
+
+        entry = Participant.objects.get(room=chat, participant=self.user)
+        self.assertEqual(entry.to_user, to_user)
+        self.assertEqual(entry.last_message_text, "Are you there?")
+        self.assertEqual(self.get_unread_count(chat, self.user), 2)
+        self.assertEqual(self.get_unread_count(chat, to_user), 0)
+
+    def test_list_inbox(self):
+        """The inbox should be listed in the same queries for any number of chats"""
+        for username in ("ivan", "maria"):
+            chat, to_user = self.create_chat(username)
+            Message.objects.create(chat=chat, text="Hello from %s" % username, sent_by=to_user)
+        with CaptureQueriesContext(connection) as two_chats:
+            response = self.client.get("/api/chats/?after=")
+        self.assertEqual([chat["room_name"] for chat in response.data["results"]], ["maria", "ivan"])
+        self.assertFalse(response.data["results"][0]["last_message_seen"])
+
+        for username in ("pedro", "lucia", "marta"):
+            chat, to_user = self.create_chat(username)
+            Message.objects.create(chat=chat, text="Hello from %s" % username, sent_by=to_user)
+        with CaptureQueriesContext(connection) as five_chats:
+            self.client.get("/api/chats/?after=")
+        self.assertEqual(len(two_chats), len(five_chats))
+
+    def test_retrieve_marks_read(self):
+        """Opening a chat should move the read watermark to the last message"""
+        chat, to_user = self.create_chat("ivan")
+        message = Message.objects.create(chat=chat, text="Hello", sent_by=to_user)
+        self.client.get("/api/chats/%s/" % chat.id)
+        self.assertEqual(Participant.objects.get(room=chat, participant=self.user).last_read_message, message)
+        self.assertEqual(self.get_unread_count(chat, self.user), 0)
+
+        Message.objects.create(chat=chat, text="Are you there?", sent_by=to_user)
+        self.assertEqual(self.get_unread_count(chat, self.user), 1)
+
+
+
+class DirectChatsTestCase(APITestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.to_user = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_chat_once(self):
+        """Creating the chat of a pair twice should retrieve the first one"""
+        response = self.client.post("/api/chats/", {"to_user": str(self.to_user.id)}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(user=self.to_user)
+        retrieved = self.client.post("/api/chats/", {"to_user": str(self.user.id)}, format="json")
+        self.assertEqual(retrieved.status_code, 200)
+        self.assertEqual(retrieved.data["id"], response.data["id"])
+        self.assertEqual(Chat.objects.count(), 1)
+
+    def test_lookup_is_one_query(self):
+        """The direct chat should be found by the pair key"""
+        chat, created = helpers.get_or_create_chat(self.user, self.to_user)
+        with self.assertNumQueries(1):
+            self.assertEqual(helpers.get_chat(self.to_user, self.user), chat)
+
+
+
+class MessageHistoryTestCase(APITestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.to_user = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.client.force_authenticate(user=self.user)
+        self.chat, created = helpers.get_or_create_chat(self.user, self.to_user)
+        self.messages = [
+            Message.objects.create(chat=self.chat, text="Message %s" % index, sent_by=self.to_user)
+            for index in range(30)
+        ]
+        for message in self.messages[::3]:
+            MessageFile.objects.create(chat=self.chat, message=message, file="messages/files/file.txt", name="file.txt")
+
+    def get_history(self, query):
+        return self.client.get("/api/chats/%s/messages/?limit=10&%s" % (self.chat.id, query))
+
+    def test_messages_before_and_after_id(self):
+        """The history should page the messages around the given one"""
+        before = self.get_history("before_id=%s" % self.messages[20].id)
+        self.assertEqual([message["text"] for message in before.data["results"]],
+                         ["Message %s" % index for index in range(19, 9, -1)])
+        after = self.get_history("after_id=%s" % self.messages[20].id)
+        self.assertEqual([message["text"] for message in after.data["results"]],
+                         ["Message %s" % index for index in range(29, 20, -1)])
+        self.assertEqual(self.get_history("before_id=%s" % self.chat.id).status_code, 404)
+
+    def test_follow_next_from_message_id(self):
+        """The next link of a page around a message should page on from it"""
+        before = self.get_history("before_id=%s" % self.messages[20].id)
+        self.assertNotIn("before_id", before.data["next"])
+        older = self.client.get(before.data["next"])
+        self.assertEqual([message["text"] for message in older.data["results"]],
+                         ["Message %s" % index for index in range(9, -1, -1)])
+        self.assertIsNone(older.data["next"])
+
+    def test_pages_cost_the_same_queries(self):
+        """Scrolling back should cost the same queries on every page"""
+        with CaptureQueriesContext(connection) as first_page:
+            self.get_history("after=")
+        with CaptureQueriesContext(connection) as older_page:
+            self.get_history("before_id=%s" % self.messages[10].id)
+        self.assertEqual(len(first_page) + 1, len(older_page))
+
+
+# The sockets only accept the allowed hosts origins
+HEADERS = [(b"origin", b"http://localhost")]
+
+
+class ChatConsumerTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.to_user = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.stranger = User.objects.create(username="maria", email="maria@gmail.com")
+        self.chat = Chat.objects.create()
+        self.chat.participants.add(self.user, self.to_user)
+        self.tokens = {
+            user.id: Token.objects.create(user=user).key for user in (self.user, self.to_user, self.stranger)
+        }
+
+    def get_communicator(self, user=None):
+        path = "/ws/chat/%s/" % self.chat.id
+        if user is not None:
+            path += "?token=%s" % self.tokens[user.id]
+        return WebsocketCommunicator(application, path, HEADERS)
+
+    def test_rejected_sockets(self):
+        """Anonymous users and users out of the chat should be rejected"""
+        async def run():
+            self.assertEqual(await self.get_communicator().connect(), (False, 4001))
+            self.assertEqual(await self.get_communicator(self.stranger).connect(), (False, 4003))
+        async_to_sync(run)()
+
+    def test_message_is_persisted_and_broadcast(self):
+        """Messages should be stored and sent to the chat group"""
+        async def run():
+            channel_layer = get_channel_layer()
+            # The user sockets subscribed to the chat receive them too
+            channel_name = await channel_layer.new_channel()
+            await channel_layer.group_add("chat-%s" % self.chat.id, channel_name)
+
+            sender = self.get_communicator(self.user)
+            receiver = self.get_communicator(self.to_user)
+            self.assertTrue((await sender.connect())[0])
+            self.assertTrue((await receiver.connect())[0])
+
+            await sender.send_json_to({"text": "Hello"})
+            for event in (await receiver.receive_json_from(), await channel_layer.receive(channel_name)):
+                self.assertEqual((event["event"], event["data"]["text"]), ("MESSAGE", "Hello"))
+                self.assertEqual(event["data"]["sent_by"], str(self.user.id))
+            await sender.disconnect()
+            await receiver.disconnect()
+        async_to_sync(run)()
+
+        message = Message.objects.get(chat=self.chat)
+        self.assertEqual((message.text, message.sent_by), ("Hello", self.user))
+        self.assertEqual(Chat.objects.get(id=self.chat.id).last_message, message)
+
+    def test_invalid_messages(self):
+        """Malformed messages should be answered with an error and keep the socket open"""
+        async def run():
+            communicator = self.get_communicator(self.user)
+            await communicator.connect()
+            for content in ([], 1, "Hello", {"text": ""}, {"text": ["Hello"]}, {"text": "x" * 1001}):
+                await communicator.send_json_to(content)
+                response = await communicator.receive_json_from()
+                self.assertEqual(response, {"event": "ERROR", "detail": "Invalid message"})
+
+            await communicator.send_json_to({"text": "Hello"})
+            self.assertEqual((await communicator.receive_json_from())["event"], "MESSAGE")
+            await communicator.disconnect()
+        async_to_sync(run)()
@@ -26,15 +26,15 @@ from api.users.permissions import IsAccountOwner
 
 # Models
 from api.users.models import User
-from api.chats.models import Chat
+from api.chats.models import Chat, Participant
 
 # Serializers
 from api.users.serializers import UserModelSerializer
 from api.chats.serializers import (
     ChatModelSerializer,
+    InboxModelSerializer,
     CreateChatSerializer,
     RetrieveChatModelSerializer,
-    CreateSeenBySerializer,
     ClearChatNotification
 )
 
@@ -43,6 +43,8 @@ from rest_framework.filters import SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
 from api.utils import helpers
+from api.chats import inbox
+from api.utils.paginations import KeysetPagination
 
 
 class ChatViewSet(
@@ -56,12 +58,14 @@ class ChatViewSet(
     queryset = Chat.objects.all()
     lookup_field = "id"
     serializer_class = ChatModelSerializer
+    pagination_class = KeysetPagination
     filter_backends = (SearchFilter, DjangoFilterBackend)
-    search_fields = (
-        "participants__first_name",
-        "participants__last_name",
-        "participants__username",
-    )
+
+    @property
+    def search_fields(self):
+        if self.action == "list":
+            return ("to_user__first_name", "to_user__last_name", "to_user__username")
+        return ("participants__first_name", "participants__last_name", "participants__username")
 
     def get_permissions(self):
         """Assign permissions based on action."""
@@ -75,28 +79,30 @@ class ChatViewSet(
             return CreateChatSerializer
         elif self.action == "retrieve":
             return RetrieveChatModelSerializer
+        elif self.action == "list":
+            return InboxModelSerializer
         return ChatModelSerializer
 
+    def get_keyset_ordering(self):
+        if self.action == "list":
+            return ('-last_message_at', '-id')
+        return None
+
     def get_queryset(self):
         user = self.request.user
         if self.action == "list":
-            user.pending_messages = False
-            user.save()
-            return Chat.objects.filter(participants=user).exclude(last_message=None)
+            # The inbox entries of the user
+            return inbox.with_unread_count(
+                Participant.objects.filter(participant=user).exclude(last_message_at=None).select_related(
+                    "room", "to_user", "last_message_sent_by").order_by('-last_message_at', '-id')
+            )
 
         return Chat.objects.all()
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Create seen by
-        createSeenSerializer = CreateSeenBySerializer(
-            data={}, context={"request": request, "chat": instance}
-        )
-        is_valid = createSeenSerializer.is_valid(raise_exception=False)
-        if is_valid:
-            createSeenSerializer.save()
 
-        # Clear chat notifications
+        # Clear chat notifications and move the read watermark
         clearChatNotification = ClearChatNotification(
             instance,
             data={},
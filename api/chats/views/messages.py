@@ -40,6 +40,7 @@ from api.chats.serializers import (
 # Utils
 
 from api.utils.mixins import AddChatMixin
+from api.utils.paginations import MessageHistoryPagination
 import os
 from api.utils import helpers
 from asgiref.sync import sync_to_async
@@ -62,6 +63,7 @@ class MessageViewSet(
     queryset = Message.objects.all()
     lookup_field = "id"
     serializer_class = MessageModelSerializer
+    pagination_class = MessageHistoryPagination
 
     def get_permissions(self):
         """Assign permissions based on action."""
@@ -88,4 +90,4 @@ class MessageViewSet(
 
     def get_queryset(self):
 
-        return Message.objects.filter(chat=self.chat)
+        return Message.objects.filter(chat=self.chat).select_related('sent_by').prefetch_related('messagefile_set')
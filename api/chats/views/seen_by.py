@@ -26,7 +26,7 @@ from api.users.permissions import IsAccountOwner
 
 # Models
 from api.users.models import User
-from api.chats.models import SeenBy, SeenBy
+from api.chats.models import Participant
 
 # Serializers
 from api.users.serializers import UserModelSerializer
@@ -47,12 +47,11 @@ from api.utils import helpers
 class SeenByViewSet(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
-    mixins.DestroyModelMixin,
     AddChatMixin,
 ):
-    """SeenBy view set."""
+    """Read watermarks view set."""
 
-    queryset = SeenBy.objects.all()
+    queryset = Participant.objects.all()
     lookup_field = "id"
     serializer_class = SeenByModelSerializer
 
@@ -81,4 +80,4 @@ class SeenByViewSet(
 
     def get_queryset(self):
 
-        return SeenBy.objects.filter(chat=self.chat)
+        return Participant.objects.filter(room=self.chat).exclude(last_read_at=None)
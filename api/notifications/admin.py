@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 # Models
-from api.notifications.models import Notification, NotificationUser
+from api.notifications.models import Notification, NotificationUser, OutboxEmail
 
 # Register your models here.
 
@@ -16,3 +16,10 @@ class NotificationAdmin(admin.ModelAdmin):
 class NotificationUserAdmin(admin.ModelAdmin):
     """Notification user model admin."""
     pass
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Outbox email model admin."""
+    list_display = ('name', 'email', 'status', 'attempts', 'send_at', 'sent_at')
+    list_filter = ('status', 'name')
@@ -1,29 +1,215 @@
 import asyncio
-from django.core import serializers
-from django.http.response import JsonResponse
-import json
+import re
 
 # Channels
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 
 # Models
-from api.users.models import User
+from api.chats.models import Chat
+from api.posts.models import PostMember
 
+# Presence
+from api.users import presence
+
+# Collaborate rooms
+from api.posts import drawings, notes
+from api.posts.serializers import UpdatePostDrawingSerializer
+
+
+# The room ids name the room groups
+ID_PATTERN = re.compile(r"[-\w.]{1,64}", re.ASCII)
+
+
+class UserConsumer(AsyncJsonWebsocketConsumer):
+    """Authenticated socket of a user session.
+
+    Receives the user-<id> group events and multiplexes the chat and post
+    rooms the client subscribes to:
+
+        {"action": "subscribe", "topic": "chat", "id": "<chat id>"}
+        {"action": "unsubscribe", "topic": "post", "id": "<post id>"}
+        {"action": "publish", "topic": "post", "id": "<post id>", "event": "drawing", "data": {...}}
+
+    Room events are routed through the chat-<id> and post-<id> groups. The
+    post rooms shared notes are edited with ops based on a revision:
+
+        {"action": "publish", "topic": "post", "id": "<post id>", "event": "notes_op",
+         "data": {"revision": 3, "op": {"position": 10, "insert": "text"}}}
+
+    The subscribers receive the notes snapshot when they join, the peers
+    receive the applied ops and the editor an ack with the new revision. An
+    op fully overridden by the ops applied before it is rejected with the
+    current text and revision, the editor replaces its text and applies the
+    ops after that revision.
+
+    Whiteboard strokes are appended to the post strokes log the same way:
+
+        {"action": "publish", "topic": "post", "id": "<post id>", "event": "stroke",
+         "data": {"tool": "pen", "points": [[10, 10], [20, 15]], "color": "#000000", "width": 2}}
+
+    The subscribers receive the drawing snapshot and the strokes after it.
+    """
+
+    TOPICS = ("chat", "post")
 
-class NoseyConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close(code=4001)
+            return
+
         await self.accept()
-        self.user_id = self.scope["url_route"]["kwargs"]["user_id"]
+        self.user_id = str(user.id)
+        self.subscriptions = set()
 
         self.room_group_name = "user-%s" % self.user_id
-        await self.update_user_status(True)
+        await database_sync_to_async(presence.connect)(self.user_id, self.channel_name)
+        self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
     async def disconnect(self, message, **kwargs):
-        await self.update_user_status(False)
+        if not hasattr(self, "user_id"):
+            return
+
+        self.heartbeat_task.cancel()
+        await database_sync_to_async(presence.disconnect)(self.user_id, self.channel_name)
+
+        for group in [self.room_group_name] + list(self.subscriptions):
+            await self.channel_layer.group_discard(group, self.channel_name)
+            await self.leave(group)
 
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+    async def leave(self, group):
+        """Store the shared notes of the post rooms the member leaves."""
+        topic, id = group.split("-", 1)
+        if topic == "post":
+            await database_sync_to_async(notes.flush)(id)
+
+    async def heartbeat(self):
+        """Keep the connection present while the socket is open."""
+        while True:
+            await asyncio.sleep(presence.PRESENCE_HEARTBEAT)
+            await database_sync_to_async(presence.heartbeat)(self.user_id, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            await self.send_json({"event": "ERROR", "detail": "Invalid message"})
+            return
+        action = content.get("action")
+        topic = content.get("topic")
+        id = content.get("id")
+        if topic not in self.TOPICS or not isinstance(id, str) or not ID_PATTERN.fullmatch(id):
+            await self.send_json({"event": "ERROR", "detail": "Invalid topic"})
+            return
+        group = "%s-%s" % (topic, content["id"])
+
+        if action == "subscribe":
+            if not await self.can_subscribe(topic, content["id"]):
+                await self.send_json({"event": "ERROR", "detail": "Not allowed", "topic": topic, "id": content["id"]})
+                return
+            self.subscriptions.add(group)
+            await self.channel_layer.group_add(group, self.channel_name)
+            await self.send_json({"event": "SUBSCRIBED", "topic": topic, "id": content["id"]})
+            if topic == "post":
+                await self.send_notes_snapshot(content["id"])
+                await self.send_drawing_snapshot(content["id"])
+        elif action == "unsubscribe":
+            if group in self.subscriptions:
+                self.subscriptions.discard(group)
+                await self.channel_layer.group_discard(group, self.channel_name)
+                await self.leave(group)
+            await self.send_json({"event": "UNSUBSCRIBED", "topic": topic, "id": content["id"]})
+        elif action == "publish" and group in self.subscriptions and content.get("event") == "notes_op":
+            await self.apply_notes_op(group, content["id"], content.get("data"))
+        elif action == "publish" and group in self.subscriptions and content.get("event") == "stroke":
+            await self.append_stroke(group, content["id"], content.get("data"))
+        elif action == "publish" and group in self.subscriptions:
+            await self.channel_layer.group_send(group, {
+                "type": "room.event",
+                "topic": topic,
+                "id": content["id"],
+                "event": content.get("event"),
+                "data": content.get("data"),
+                "sent_by": self.user_id,
+                "sender_channel_name": self.channel_name,
+            })
+
+    async def send_notes_snapshot(self, id):
+        snapshot = await database_sync_to_async(notes.get_snapshot)(id)
+        await self.send_json({"event": "NOTES_SNAPSHOT", "topic": "post", "id": id, "data": snapshot})
+
+    async def apply_notes_op(self, group, id, data):
+        if not isinstance(data, dict) or type(data.get("revision")) is not int or not notes.is_valid_op(data.get("op")):
+            await self.send_json({"event": "ERROR", "detail": "Invalid op", "topic": "post", "id": id})
+            return
+
+        applied = await database_sync_to_async(notes.apply_op)(id, data["revision"], data["op"])
+        if applied is None:
+            # The editor is too far behind, it starts over from the snapshot
+            await self.send_notes_snapshot(id)
+            return
+
+        op, revision = applied
+        if op is None:
+            # Nothing is left of the op, the editor text has diverged
+            current = await database_sync_to_async(notes.get_text)(id)
+            await self.send_json({"event": "NOTES_REJECT", "topic": "post", "id": id, "data": current})
+            return
+
+        await self.send_json({"event": "NOTES_ACK", "topic": "post", "id": id, "data": {"revision": revision}})
+        await self.channel_layer.group_send(group, {
+            "type": "room.event",
+            "topic": "post",
+            "id": id,
+            "event": "NOTES_OP",
+            "data": {"revision": revision, "op": op},
+            "sent_by": self.user_id,
+            "sender_channel_name": self.channel_name,
+        })
+
+    async def send_drawing_snapshot(self, id):
+        snapshot = await database_sync_to_async(drawings.get_snapshot)(id)
+        await self.send_json({"event": "DRAWING_SNAPSHOT", "topic": "post", "id": id, "data": snapshot})
+
+    async def append_stroke(self, group, id, data):
+        serializer = UpdatePostDrawingSerializer(data=data)
+        if not isinstance(data, dict) or not serializer.is_valid():
+            await self.send_json({"event": "ERROR", "detail": "Invalid stroke", "topic": "post", "id": id})
+            return
+
+        stroke = await database_sync_to_async(drawings.append)(id, self.user_id, serializer.validated_data)
+        if stroke is None:
+            await self.send_json({"event": "ERROR", "detail": "This post has already been finalized",
+                                  "topic": "post", "id": id})
+            return
+
+        await self.send_json({"event": "STROKE_ACK", "topic": "post", "id": id,
+                              "data": {"revision": stroke["revision"]}})
+        await self.channel_layer.group_send(group, {
+            "type": "room.event",
+            "topic": "post",
+            "id": id,
+            "event": "STROKE",
+            "data": stroke,
+            "sent_by": self.user_id,
+            "sender_channel_name": self.channel_name,
+        })
+
+    @database_sync_to_async
+    def can_subscribe(self, topic, id):
+        try:
+            if topic == "chat":
+                return Chat.objects.filter(id=id, participants=self.user_id).exists()
+            return PostMember.objects.filter(post=id, user=self.user_id).exists()
+        except Exception:
+            # Malformed ids
+            return False
+
+    async def room_event(self, event):
+        # The publisher already has the event
+        if event.get("sender_channel_name") == self.channel_name:
+            return
+        await self.send_json({key: value for key, value in event.items() if key != "sender_channel_name"})
 
     async def send_notification(self, event):
 
@@ -32,7 +218,3 @@ class NoseyConsumer(AsyncJsonWebsocketConsumer):
     async def message_sent(self, event):
 
         await self.send_json(event)
-
-    @database_sync_to_async
-    def update_user_status(self, is_online):
-        return User.objects.filter(id=self.user_id) .update(is_online=is_online)
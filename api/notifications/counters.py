@@ -0,0 +1,129 @@
+"""Unread notifications counters.
+
+Every user has an unread counter per type (chat messages and the rest of
+notifications) kept in the cache, so it is incremented and decremented
+atomically in Redis instead of rewriting the user row. Missing counters are
+counted from NotificationUser on read and the reconcile task corrects any
+drift. Every change is pushed to the user-<id> group.
+"""
+
+# Django
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+# Models
+from api.notifications.models import Notification, NotificationUser
+
+# Utils
+from api.notifications.realtime import dispatch_many
+
+
+NOTIFICATIONS = "notifications"
+
+MESSAGES = "messages"
+
+COUNTERS = (NOTIFICATIONS, MESSAGES)
+
+COUNTER_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def get_counter(notification_type):
+    return MESSAGES if notification_type == Notification.MESSAGES else NOTIFICATIONS
+
+
+def get_counter_key(user_id, counter):
+    return "unread-%s-%s" % (counter, user_id)
+
+
+def count_unread(user_ids):
+    """Count the unread notifications of the users from the database."""
+    counts = {user_id: {counter: 0 for counter in COUNTERS} for user_id in user_ids}
+    rows = NotificationUser.objects.filter(user__in=user_ids, is_read=False).order_by().values('user').annotate(
+        messages=Count('id', filter=Q(notification__type=Notification.MESSAGES)),
+        notifications=Count('id', filter=~Q(notification__type=Notification.MESSAGES)),
+    )
+    for row in rows:
+        counts[row['user']] = {MESSAGES: row['messages'], NOTIFICATIONS: row['notifications']}
+    return counts
+
+
+def get_counters(user_id):
+    """Return the unread counters of the user."""
+    keys = {counter: get_counter_key(user_id, counter) for counter in COUNTERS}
+    values = cache.get_many(keys.values())
+    if len(values) < len(keys):
+        counts = count_unread([user_id])[user_id]
+        for counter, key in keys.items():
+            if key not in values:
+                cache.add(key, counts[counter], COUNTER_TIMEOUT)
+        values = cache.get_many(keys.values())
+    return {counter: max(values.get(key, 0), 0) for counter, key in keys.items()}
+
+
+def change(user_ids, counter, amount):
+    """Add amount to the users counter and push the new values."""
+    user_ids = list(user_ids)
+    if not user_ids or not amount:
+        return
+
+    values = {}
+    for user_id in user_ids:
+        try:
+            values[user_id] = cache.incr(get_counter_key(user_id, counter), amount)
+        except ValueError:
+            # Not cached, it is counted from the database on read
+            values[user_id] = None
+
+    missing_user_ids = [user_id for user_id, value in values.items() if value is None]
+    if missing_user_ids:
+        for user_id, counts in count_unread(missing_user_ids).items():
+            cache.add(get_counter_key(user_id, counter), counts[counter], COUNTER_TIMEOUT)
+            values[user_id] = counts[counter]
+
+    push(values, counter)
+
+
+def increment(user_ids, counter, amount=1):
+    change(user_ids, counter, amount)
+
+
+def decrement(user_ids, counter, amount=1):
+    change(user_ids, counter, -amount)
+
+
+def push(values, counter):
+    dispatch_many(
+        ("user-%s" % user_id, {
+            "type": "send.notification",
+            "event": "UNREAD_COUNTER_CHANGED",
+            "counter": counter,
+            "count": max(value, 0),
+        }) for user_id, value in values.items()
+    )
+
+
+def reconcile(user_ids):
+    """Correct the cached counters of the users against the database.
+
+    Only counters that are cached are corrected, the rest are counted on
+    read. Return the number of corrected counters.
+    """
+    keys = {
+        get_counter_key(user_id, counter): (user_id, counter)
+        for user_id in user_ids for counter in COUNTERS
+    }
+    cached = cache.get_many(keys.keys())
+    if not cached:
+        return 0
+
+    counts = count_unread({keys[key][0] for key in cached})
+    changed = {}
+    for key, value in cached.items():
+        user_id, counter = keys[key]
+        if value != counts[user_id][counter]:
+            changed[key] = counts[user_id][counter]
+    cache.set_many(changed, COUNTER_TIMEOUT)
+
+    for counter in COUNTERS:
+        push({keys[key][0]: value for key, value in changed.items() if keys[key][1] == counter}, counter)
+    return len(changed)
@@ -0,0 +1,129 @@
+"""Message digest emails.
+
+New messages only record that the recipient has unseen messages. The first
+record schedules a digest job, later records postpone it until no message
+has been received for MESSAGE_DIGEST_QUIET_WINDOW seconds. The job adds
+one email to the outbox with the chats and collaborate rooms that have
+unread messages since the previous digest, and no more than one digest per
+user is sent every MESSAGE_DIGEST_RATE_LIMIT seconds.
+"""
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+# Models
+from api.users.models import User
+from api.notifications.models import Notification, NotificationUser
+
+# Utils
+from api.notifications import outbox
+from datetime import timedelta
+
+
+DIGEST_TIMEOUT = 60 * 60 * 24
+
+# The scheduled marker outlives the job countdown by this much, a job that
+# is lost or rolled back only holds the next digest back until then
+SCHEDULED_MARGIN = 60 * 5
+
+
+def get_scheduled_key(user_id):
+    return "message-digest-%s" % user_id
+
+
+def get_activity_key(user_id):
+    return "message-digest-activity-%s" % user_id
+
+
+def get_sent_key(user_id):
+    return "message-digest-sent-%s" % user_id
+
+
+def get_delay(user_id, now):
+    """Return the seconds to wait before the user digest can be sent."""
+    values = cache.get_many([get_activity_key(user_id), get_sent_key(user_id)])
+    delays = [0]
+    activity = values.get(get_activity_key(user_id))
+    if activity:
+        delays.append(settings.MESSAGE_DIGEST_QUIET_WINDOW - (now - activity).total_seconds())
+    sent = values.get(get_sent_key(user_id))
+    if sent:
+        delays.append(settings.MESSAGE_DIGEST_RATE_LIMIT - (now - sent).total_seconds())
+    return max(delays)
+
+
+def schedule(user_id, countdown):
+    from api.taskapp.tasks import send_message_digest
+
+    cache.set(get_scheduled_key(user_id), True, countdown + SCHEDULED_MARGIN)
+    transaction.on_commit(lambda: send_message_digest.apply_async((user_id,), countdown=countdown))
+
+
+def record(user_ids):
+    """Record that the users have unseen messages."""
+    now = timezone.now()
+    for user_id in user_ids:
+        cache.set(get_activity_key(user_id), now, DIGEST_TIMEOUT)
+        # The delay is never longer than the quiet window or the rate limit
+        timeout = max(settings.MESSAGE_DIGEST_QUIET_WINDOW, settings.MESSAGE_DIGEST_RATE_LIMIT) + SCHEDULED_MARGIN
+        if cache.add(get_scheduled_key(user_id), True, timeout):
+            schedule(user_id, get_delay(user_id, now))
+
+
+def get_entries(user_id, since):
+    user_notifications = NotificationUser.objects.filter(
+        user=user_id,
+        is_read=False,
+        notification__type__in=[Notification.MESSAGES, Notification.POST_MESSAGES],
+        notification__modified__gte=since,
+    ).select_related('notification__actor', 'notification__post').annotate(
+        messages_count=Count('notification__messages', distinct=True),
+        post_messages_count=Count('notification__post_messages', distinct=True),
+    ).order_by('-notification__modified')
+
+    entries = []
+    for user_notification in user_notifications:
+        notification = user_notification.notification
+        if notification.type == Notification.POST_MESSAGES:
+            url = "https://talendy.com/collaborate-room/%s" % notification.post_id
+        else:
+            url = "https://talendy.com/dashboard/messages/"
+        entries.append({
+            'sent_by': notification.actor,
+            'post': notification.post,
+            'count': user_notification.messages_count + user_notification.post_messages_count,
+            'url': url,
+        })
+    return entries
+
+
+def send_digest(user_id):
+    """Send the user digest if it is due, postpone it otherwise."""
+    if not cache.get(get_scheduled_key(user_id)):
+        return False
+
+    now = timezone.now()
+    delay = get_delay(user_id, now)
+    if delay > 0:
+        schedule(user_id, delay)
+        return False
+
+    # Messages received from now on schedule a new digest
+    cache.delete(get_scheduled_key(user_id))
+
+    user = User.objects.filter(id=user_id, email_notifications_allowed=True).first()
+    if not user:
+        return False
+    since = cache.get(get_sent_key(user_id)) or now - timedelta(seconds=DIGEST_TIMEOUT)
+    entries = get_entries(user_id, since)
+    if not entries:
+        return False
+
+    outbox.enqueue('message_digest', [user], user=user, since=since.isoformat())
+
+    cache.set(get_sent_key(user_id), now, DIGEST_TIMEOUT)
+    return True
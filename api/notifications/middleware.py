@@ -0,0 +1,15 @@
+"""Realtime events middleware."""
+
+# Utils
+from api.notifications import realtime
+
+
+class RealtimeEventsMiddleware:
+    """Send the realtime events of the request together once it ends."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with realtime.collect():
+            return self.get_response(request)
@@ -1 +1,2 @@
 from .notifications import Notification, NotificationUser
+from .emails import OutboxEmail
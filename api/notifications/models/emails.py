@@ -0,0 +1,48 @@
+from api.utils.models import CModel
+from django.contrib.gis.db import models
+from django.contrib.postgres.fields import JSONField
+from django.db.models import Q
+from django.utils import timezone
+
+
+class OutboxEmail(CModel):
+    """Transactional email waiting to be delivered.
+
+    Rendered by the worker from the registered email name and the
+    JSON context, see api.notifications.outbox.
+    """
+
+    PENDING = 'PE'
+    SENT = 'SE'
+    FAILED = 'FA'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+    status = models.CharField(
+        max_length=2,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+
+    name = models.CharField(max_length=100)
+    user = models.ForeignKey("users.User", on_delete=models.CASCADE, null=True, blank=True)
+    email = models.EmailField(max_length=254)
+    context = JSONField(default=dict, blank=True)
+
+    # Same email, recipient and context
+    dedup_key = models.CharField(max_length=40)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    send_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta(CModel.Meta):
+        indexes = [
+            models.Index(fields=['status', 'send_at'], name='outbox_email_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'], condition=Q(status='PE'), name='outbox_email_pending_dedup'),
+        ]
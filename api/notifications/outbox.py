@@ -0,0 +1,245 @@
+"""Transactional emails outbox.
+
+Producers enqueue a registered email name, the recipients and a JSON
+context (model instances are stored as references). A worker drains the due
+emails in batches: the referenced objects are loaded in bulk, equal emails
+are rendered once and every batch is delivered over a single backend
+connection. Failed deliveries are retried with exponential backoff and an
+email already pending for the same recipient and context is not enqueued
+again.
+"""
+
+# Django
+from django.apps import apps
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Models
+from api.users.models import User
+from api.notifications.models import OutboxEmail
+
+# Utils
+from api.utils import helpers
+from datetime import timedelta
+import hashlib
+import json
+
+
+FROM_EMAIL = 'Talendy <no-reply@talendy.com>'
+
+OUTBOX_BATCH_SIZE = 100
+
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Seconds before the first retry, doubled on every attempt
+OUTBOX_RETRY_DELAY = 60
+
+EMAILS = {}
+
+
+def register(name, template):
+    """Register the builder of an email.
+
+    The builder receives the decoded context and returns the subject and
+    the template context.
+    """
+    def decorator(build):
+        EMAILS[name] = (template, build)
+        return build
+    return decorator
+
+
+@register('feedback', 'emails/users/feedback_email.html')
+def feedback(data):
+    return 'Feedback from {}'.format(data.get('email')), {'data': data}
+
+
+@register('account_verification', 'emails/users/account_verification.html')
+def account_verification(user):
+    subject = 'Welcome @{}! Verify your account to start using Talendy'.format(user.username)
+    return subject, {'token': helpers.gen_verification_token(user), 'user': user}
+
+
+@register('change_email', 'emails/users/change_email.html')
+def change_email(user, new_email):
+    subject = 'Welcome @{}! Change your email'.format(user.username)
+    return subject, {'token': helpers.gen_new_email_token(user, new_email), 'user': user}
+
+
+@register('reset_password', 'emails/users/reset_password.html')
+def reset_password(user):
+    return 'Reset your password', {'token': helpers.gen_verification_token(user), 'user': user}
+
+
+@register('connect_invitation', 'emails/users/connect_invitation.html')
+def connect_invitation(user):
+    return 'Welcome! @{} has invited you '.format(user.username), {'user': user}
+
+
+@register('new_post', 'emails/users/new_post.html')
+def new_post(user, post):
+    return '@{} has just created new post'.format(user.username), {'user': user, 'post': post}
+
+
+@register('connection_accepted', 'emails/users/connection_accepted.html')
+def connection_accepted(user):
+    return '@{} is your new connection'.format(user.username), {'user': user}
+
+
+@register('collaborate_request', 'emails/users/collaborate_request.html')
+def collaborate_request(user):
+    return 'New collaborate request from @{}'.format(user.username), {'user': user}
+
+
+@register('collaborate_request_accepted', 'emails/users/collaborate_request_accepted.html')
+def collaborate_request_accepted(post):
+    return 'Collaborate request accepted by @{}'.format(post.user.username), {'post': post}
+
+
+@register('post_finalized', 'emails/users/post_finalized.html')
+def post_finalized(user, post):
+    return '@{} has finalized the post'.format(user.username), {'user': user, 'post': post}
+
+
+@register('new_donation', 'emails/users/new_donation.html')
+def new_donation(user, is_anonymous):
+    if is_anonymous:
+        subject = 'You recieved new donation from anonymous user'
+    else:
+        subject = 'You recieved new donation from @{}'.format(user.username)
+    return subject, {'user': user, 'is_anonymous': is_anonymous}
+
+
+@register('message_digest', 'emails/users/message_digest.html')
+def message_digest(user, since):
+    from api.notifications import digests
+
+    entries = digests.get_entries(user.id, parse_datetime(since))
+    return 'You have unseen messages on Talendy', {'user': user, 'entries': entries}
+
+
+def encode_context(context):
+    return {
+        key: {'model': value._meta.label, 'pk': str(value.pk)} if isinstance(value, models.Model) else value
+        for key, value in context.items()
+    }
+
+
+def is_reference(value):
+    return isinstance(value, dict) and set(value) == {'model', 'pk'}
+
+
+def load_contexts(emails):
+    """Decode the emails contexts loading the referenced objects in bulk."""
+    references = {}
+    for email in emails:
+        for value in email.context.values():
+            if is_reference(value):
+                references.setdefault(value['model'], set()).add(value['pk'])
+
+    objects = {}
+    for label, pks in references.items():
+        for pk, obj in apps.get_model(label).objects.in_bulk(pks).items():
+            objects[(label, str(pk))] = obj
+
+    return [
+        {
+            key: objects.get((value['model'], value['pk'])) if is_reference(value) else value
+            for key, value in email.context.items()
+        } for email in emails
+    ]
+
+
+def get_dedup_key(name, address, context):
+    return hashlib.sha1(json.dumps([name, address, context], sort_keys=True).encode()).hexdigest()
+
+
+def enqueue(name, recipients, **context):
+    """Add the email to the outbox for every recipient.
+
+    Recipients are users or email addresses.
+    """
+    if name not in EMAILS:
+        raise ValueError('Email %s is not registered' % name)
+
+    context = encode_context(context)
+    emails = []
+    for recipient in recipients:
+        user = recipient if isinstance(recipient, User) else None
+        address = user.email if user else recipient
+        emails.append(OutboxEmail(
+            name=name,
+            user=user,
+            email=address,
+            context=context,
+            dedup_key=get_dedup_key(name, address, context),
+        ))
+
+    # The pending dedup constraint skips the duplicates
+    OutboxEmail.objects.bulk_create(emails, ignore_conflicts=True)
+
+    from api.taskapp.tasks import send_outbox_emails
+    transaction.on_commit(lambda: send_outbox_emails.delay())
+
+
+def render(email, context, rendered):
+    """Return the email subject and content, equal emails are rendered once."""
+    key = (email.name, json.dumps(email.context, sort_keys=True))
+    if key not in rendered:
+        template, build = EMAILS[email.name]
+        subject, template_context = build(**context)
+        rendered[key] = (subject, render_to_string(template, template_context))
+    return rendered[key]
+
+
+def deliver(batch_size=OUTBOX_BATCH_SIZE):
+    """Deliver a batch of due emails over a single connection.
+
+    Return the number of processed and sent emails.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+                status=OutboxEmail.PENDING, send_at__lte=now).order_by('send_at')[:batch_size]
+        )
+        if not emails:
+            return 0, 0
+
+        rendered = {}
+        sent = 0
+        connection = get_connection()
+        with connection:
+            for email, context in zip(emails, load_contexts(emails)):
+                email.attempts += 1
+                try:
+                    subject, content = render(email, context, rendered)
+                    msg = EmailMultiAlternatives(subject, content, FROM_EMAIL, [email.email], connection=connection)
+                    msg.attach_alternative(content, "text/html")
+                    connection.send_messages([msg])
+                except Exception as error:
+                    email.error = repr(error)
+                    if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+                        email.status = OutboxEmail.FAILED
+                    else:
+                        email.send_at = now + timedelta(seconds=OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1))
+                else:
+                    email.status = OutboxEmail.SENT
+                    email.sent_at = now
+                    sent += 1
+
+        OutboxEmail.objects.bulk_update(emails, ['status', 'attempts', 'send_at', 'sent_at', 'error'])
+    return len(emails), sent
+
+
+def drain(batch_size=OUTBOX_BATCH_SIZE):
+    """Deliver every due email, return the number of sent emails."""
+    sent = 0
+    while True:
+        processed, batch_sent = deliver(batch_size)
+        sent += batch_sent
+        if processed < batch_size:
+            return sent
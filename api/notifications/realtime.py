@@ -0,0 +1,151 @@
+"""Realtime events helpers.
+
+Events dispatched inside a transaction are collected and sent together
+once it commits, so a rolled back transaction sends nothing. Events of a
+savepoint are collected apart and dropped with it. Inside a collect block,
+which RealtimeEventsMiddleware opens for every request, the committed
+events are sent together when the block ends, so a request pays one
+channel layer round trip instead of one per event. Otherwise the events are
+sent right away.
+
+Every flush is counted in the cache, get_metrics reports the events per
+flush and the flush latency.
+"""
+
+# Django
+from django.core.cache import cache
+from django.db import transaction
+
+# Channels
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+
+# Utils
+from contextlib import contextmanager
+import asyncio
+import threading
+import time
+
+
+REALTIME_BATCH_SIZE = 500
+
+METRICS_KEYS = {
+    "flushes": "realtime-flushes",
+    "events": "realtime-events",
+    # Microseconds, the cache counters are integers
+    "latency": "realtime-flush-latency",
+}
+
+METRICS_TIMEOUT = None
+
+_local = threading.local()
+
+
+async def _group_send_batch(channel_layer, events):
+    await asyncio.gather(*[channel_layer.group_send(group, event) for group, event in events])
+
+
+def group_send_many(events):
+    """Send (group, event) pairs to the channel layer concurrently, in batches."""
+    channel_layer = get_channel_layer()
+    events = list(events)
+    for start in range(0, len(events), REALTIME_BATCH_SIZE):
+        async_to_sync(_group_send_batch)(channel_layer, events[start:start + REALTIME_BATCH_SIZE])
+
+
+def record(events, latency):
+    for name, amount in (("flushes", 1), ("events", events), ("latency", int(latency * 1000000))):
+        try:
+            cache.incr(METRICS_KEYS[name], amount)
+        except ValueError:
+            if not cache.add(METRICS_KEYS[name], amount, METRICS_TIMEOUT):
+                cache.incr(METRICS_KEYS[name], amount)
+
+
+def get_metrics():
+    """Return the flushes, events, events per flush and mean flush latency in ms."""
+    values = cache.get_many(METRICS_KEYS.values())
+    flushes, events, latency = (values.get(METRICS_KEYS[name], 0) for name in ("flushes", "events", "latency"))
+    return {
+        "flushes": flushes,
+        "events": events,
+        "events_per_flush": events / flushes if flushes else 0,
+        "flush_latency_ms": latency / flushes / 1000 if flushes else 0,
+    }
+
+
+def reset_metrics():
+    cache.delete_many(METRICS_KEYS.values())
+
+
+def flush(events):
+    """Send the events at once and record the flush."""
+    if not events:
+        return
+    started = time.perf_counter()
+    group_send_many(events)
+    record(len(events), time.perf_counter() - started)
+
+
+def send(events):
+    """Add the events to the current collect block or flush them."""
+    scopes = getattr(_local, "scopes", None)
+    if scopes:
+        scopes[-1].extend(events)
+    else:
+        flush(events)
+
+
+@contextmanager
+def collect():
+    """Send the events dispatched in the block together when it ends."""
+    scopes = getattr(_local, "scopes", None)
+    if scopes is None:
+        scopes = _local.scopes = []
+    events = []
+    scopes.append(events)
+    try:
+        yield events
+    finally:
+        scopes.pop()
+        send(events)
+
+
+class Batch:
+    """Events dispatched in a transaction, sent when it commits."""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self):
+        send(self.events)
+
+
+def dispatch_many(events, using=None):
+    """Send (group, event) pairs once the current transaction commits."""
+    events = list(events)
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        send(events)
+        return
+
+    batches = getattr(_local, "batches", None)
+    if batches is None:
+        batches = _local.batches = {}
+    savepoint_ids = tuple(connection.savepoint_ids)
+    key = (connection.alias, savepoint_ids)
+    batch = batches.get(key)
+    # A committed or rolled back batch is no longer in the commit hooks
+    if batch is None or not any(func is batch for sids, func in connection.run_on_commit):
+        # Forget the batches of the savepoints already released
+        _local.batches = batches = {
+            (alias, sids): value for (alias, sids), value in batches.items()
+            if alias != connection.alias or savepoint_ids[:len(sids)] == sids
+        }
+        batch = batches[key] = Batch()
+        transaction.on_commit(batch, using=using)
+    batch.events.extend(events)
+
+
+def dispatch(group, event, using=None):
+    dispatch_many([(group, event)], using)
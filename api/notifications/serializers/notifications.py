@@ -8,6 +8,7 @@ from django.conf import settings
 from django.contrib.auth import password_validation, authenticate
 from django.core.validators import RegexValidator
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 
 # Serializers
 from api.users.serializers import UserModelSerializer, ConnectionModelSerializer, ReviewModelSerializer
@@ -16,9 +17,15 @@ from api.posts.serializers import CollaborateRequestModelSerializer, PostModelSe
 from api.donations.serializers import DonationModelSerializer
 
 # Models
-from api.users.models import User
+from api.users.models import User, Connection, Review
+from api.chats.models import Message
+from api.posts.models import Post, PostMessage, CollaborateRequest
+from api.donations.models import Donation
 from api.notifications.models import NotificationUser, Notification
 
+# Counters
+from api.notifications import counters
+
 
 class NotificationModelSerializer(serializers.ModelSerializer):
     """User model serializer."""
@@ -111,10 +118,242 @@ class NotificationUserModelSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class ActorModelSerializer(serializers.ModelSerializer):
+    """Compact user serializer for the notifications list."""
+
+    class Meta:
+        """Meta class."""
+
+        model = User
+        fields = (
+            "id",
+            "username",
+            "first_name",
+            "last_name",
+            "picture",
+        )
+
+
+class NotificationMessageModelSerializer(serializers.ModelSerializer):
+    """Compact message serializer for the notifications list."""
+
+    class Meta:
+        """Meta class."""
+
+        model = Message
+        fields = (
+            "id",
+            "text",
+            "created",
+        )
+
+
+class NotificationPostMessageModelSerializer(serializers.ModelSerializer):
+    """Compact post message serializer for the notifications list."""
+
+    class Meta:
+        """Meta class."""
+
+        model = PostMessage
+        fields = (
+            "id",
+            "text",
+            "created",
+        )
+
+
+class NotificationPostModelSerializer(serializers.ModelSerializer):
+    """Compact post serializer for the notifications list."""
+
+    class Meta:
+        """Meta class."""
+
+        model = Post
+        fields = (
+            "id",
+            "title",
+            "status",
+        )
+
+
+class NotificationConnectionModelSerializer(serializers.ModelSerializer):
+    """Compact connection serializer for the notifications list."""
+
+    requester = ActorModelSerializer(read_only=True)
+    addressee = ActorModelSerializer(read_only=True)
+
+    class Meta:
+        """Meta class."""
+
+        model = Connection
+        fields = (
+            "id",
+            "requester",
+            "addressee",
+        )
+
+
+class NotificationCollaborateRequestModelSerializer(serializers.ModelSerializer):
+    """Compact collaborate request serializer for the notifications list."""
+
+    user = ActorModelSerializer(read_only=True)
+    post = NotificationPostModelSerializer(read_only=True)
+
+    class Meta:
+        """Meta class."""
+
+        model = CollaborateRequest
+        fields = (
+            "id",
+            "user",
+            "post",
+            "reason",
+        )
+
+
+class NotificationReviewModelSerializer(serializers.ModelSerializer):
+    """Compact review serializer for the notifications list."""
+
+    review_user = ActorModelSerializer(read_only=True)
+
+    class Meta:
+        """Meta class."""
+
+        model = Review
+        fields = (
+            "id",
+            "rating",
+            "comment",
+            "from_post",
+            "review_user",
+        )
+
+
+class NotificationDonationModelSerializer(serializers.ModelSerializer):
+    """Compact donation serializer for the notifications list."""
+
+    from_user = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        """Meta class."""
+
+        model = Donation
+        fields = (
+            "id",
+            "from_user",
+            "is_anonymous",
+            "message",
+            "gross_amount",
+        )
+
+    def get_from_user(self, obj):
+        if obj.is_anonymous or not obj.from_user:
+            return None
+        return ActorModelSerializer(obj.from_user).data
+
+
+class NotificationSummaryModelSerializer(serializers.ModelSerializer):
+    """Notification list serializer.
+
+    Render only the fields of the notification type, from the rows
+    loaded by NotificationUserListSerializer.setup_queryset.
+    """
+
+    actor = ActorModelSerializer(read_only=True)
+    messages = NotificationMessageModelSerializer(many=True, read_only=True)
+    post_messages = NotificationPostMessageModelSerializer(many=True, read_only=True)
+    post = NotificationPostModelSerializer(read_only=True)
+    member_joined = ActorModelSerializer(read_only=True)
+    connection = NotificationConnectionModelSerializer(read_only=True)
+    collaborate_request = NotificationCollaborateRequestModelSerializer(read_only=True)
+    review = NotificationReviewModelSerializer(read_only=True)
+    donation = NotificationDonationModelSerializer(read_only=True)
+
+    TYPE_FIELDS = {
+        Notification.MESSAGES: ("actor", "chat", "messages"),
+        Notification.NEW_INVITATION: ("connection",),
+        Notification.NEW_CONNECTION: ("connection",),
+        Notification.NEW_COLLABORATE_REQUEST: ("collaborate_request",),
+        Notification.JOINED_MEMBERSHIP: ("post", "member_joined"),
+        Notification.COLLABORATE_REQUEST_ACCEPTED: ("post", "member_joined"),
+        Notification.POST_MESSAGES: ("actor", "post", "post_messages"),
+        Notification.POST_FINALIZED: ("post",),
+        Notification.NEW_REVIEW: ("review",),
+        Notification.NEW_DONATION: ("donation",),
+        Notification.POST_CREATED_BY_A_USER_FOLLOWED: ("post",),
+    }
+
+    class Meta:
+        """Meta class."""
+
+        model = Notification
+        fields = (
+            "id",
+            "type",
+            "modified",
+            "actor",
+            "chat",
+            "messages",
+            "connection",
+            "post",
+            "member_joined",
+            "post_messages",
+            "collaborate_request",
+            "review",
+            "donation",
+        )
+
+    def to_representation(self, instance):
+        data = super(NotificationSummaryModelSerializer, self).to_representation(instance)
+        type_fields = ("id", "type", "modified") + self.TYPE_FIELDS.get(instance.type, ())
+        for field in list(data):
+            if field not in type_fields:
+                data.pop(field)
+        return data
+
+
+class NotificationUserListSerializer(serializers.ModelSerializer):
+    """Notification user list serializer."""
+
+    notification = NotificationSummaryModelSerializer(read_only=True)
+
+    class Meta:
+        """Meta class."""
+
+        model = NotificationUser
+        fields = (
+            "id",
+            "notification",
+            "is_read",
+        )
+
+        read_only_fields = ("id",)
+
+    @staticmethod
+    def setup_queryset(queryset):
+        """Load every row rendered by the list in a fixed number of queries."""
+        return queryset.select_related(
+            "notification__actor",
+            "notification__post",
+            "notification__member_joined",
+            "notification__connection__requester",
+            "notification__connection__addressee",
+            "notification__collaborate_request__user",
+            "notification__collaborate_request__post",
+            "notification__review__review_user",
+            "notification__donation__from_user",
+        ).prefetch_related(
+            Prefetch("notification__messages", queryset=Message.objects.only("id", "text", "created")),
+            Prefetch("notification__post_messages", queryset=PostMessage.objects.only("id", "text", "created")),
+        )
+
+
 class ReadNotificationSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
-        instance.is_read = True
-        instance.save()
+        if not instance.is_read:
+            instance.is_read = True
+            instance.save()
+            counters.decrement([instance.user_id], counters.get_counter(instance.notification.type))
 
         return instance
@@ -1,7 +1,6 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.utils import timezone
 
 # Models
 from api.chats.models import Message, Chat
@@ -10,7 +9,8 @@ from api.notifications.models import Notification, NotificationUser
 
 # Utils
 from api.utils import helpers
-from api.taskapp.tasks import send_have_collaborate_room_messages_from_email, send_have_messages_from_email
+from api.notifications import counters, digests, realtime
+from api.users import presence
 
 
 @receiver(post_save, sender=Message)
@@ -33,9 +33,6 @@ def announce_update_on_messages_model(sender, instance, created, **kwargs):
         ).first()
 
         if not user_notification:
-            # Insert here the send new message email notification
-            if not sent_to.is_online and sent_to.email_notifications_allowed:
-                async_to_sync(send_have_messages_from_email(sent_to, sent_by))
             notification = Notification.objects.create(
                 type=Notification.MESSAGES,
                 chat=chat,
@@ -50,11 +47,12 @@ def announce_update_on_messages_model(sender, instance, created, **kwargs):
         user_notification.notification.messages.add(instance)
         user_notification.notification.save()
 
-        sent_to.pending_messages = True
-        sent_to.save()
+        # The email is sent in the next digest of the user
+        if sent_to.email_notifications_allowed and not presence.is_online(sent_to.id):
+            digests.record([sent_to.id])
+
         # Send the event of message to user websocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % sent_to.id, {
                 "type": "message.sent",
                 "event": "MESSAGE_RECEIVED",
@@ -72,55 +70,75 @@ def announce_update_on_messages_model(sender, instance, created, **kwargs):
 @receiver(post_save, sender=PostMessage)
 def announce_update_on_post_messages_model(sender, instance, created, **kwargs):
 
+    if not created:
+        return
+
     post = instance.post
-    members = post.members.all()
     sent_by = instance.sent_by
-    sent_to_users = members.exclude(pk=sent_by.pk)
-
-    if created:
-        # Get or Create the notification user
-        for sent_to in sent_to_users:
-            user_notification = NotificationUser.objects.filter(
-                user=sent_to,
-                is_read=False,
-                notification__type=Notification.POST_MESSAGES,
-                notification__post=post,
-                notification__actor=sent_by,
-            ).first()
-
-            if not user_notification:
-                # Insert here the send new message email notification
-                if not sent_to.is_online and sent_to.email_notifications_allowed:
-                    async_to_sync(send_have_collaborate_room_messages_from_email(sent_to, sent_by, post))
-                notification = Notification.objects.create(
-                    type=Notification.POST_MESSAGES,
-                    post=post,
-                    actor=sent_by,
-                )
-
-                user_notification = NotificationUser.objects.create(
-                    notification=notification,
-                    user=sent_to
-                )
-
-            user_notification.notification.post_messages.add(instance)
-            user_notification.notification.save()
-
-            # Send the event of message to user websocket
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "user-%s" % sent_to.id, {
-                    "type": "message.sent",
-                    "event": "POST_MESSAGE_RECEIVED",
-                    "post__pk": str(post.pk),
-                    "notification__pk": str(user_notification.pk),
-                }
-            )
+    sent_to_users = {user.id: user for user in post.members.exclude(pk=sent_by.pk)}
+    if not sent_to_users:
+        return
+
+    # Get the unread notifications of every member at once
+    user_notifications = {
+        user_notification.user_id: user_notification for user_notification in NotificationUser.objects.filter(
+            user__in=sent_to_users.keys(),
+            is_read=False,
+            notification__type=Notification.POST_MESSAGES,
+            notification__post=post,
+            notification__actor=sent_by,
+        )
+    }
+
+    # Create the missing ones in bulk
+    missing_user_ids = [user_id for user_id in sent_to_users if user_id not in user_notifications]
+    if missing_user_ids:
+        notifications = Notification.objects.bulk_create([
+            Notification(type=Notification.POST_MESSAGES, post=post, actor=sent_by)
+            for user_id in missing_user_ids
+        ])
+        created_user_notifications = NotificationUser.objects.bulk_create([
+            NotificationUser(notification=notification, user_id=user_id)
+            for notification, user_id in zip(notifications, missing_user_ids)
+        ])
+        user_notifications.update(zip(missing_user_ids, created_user_notifications))
+
+        # bulk_create does not send post_save, count them here
+        counters.increment(missing_user_ids, counters.NOTIFICATIONS)
+
+    # Add the message to every notification with a single insert
+    notification_ids = [user_notification.notification_id for user_notification in user_notifications.values()]
+    Notification.post_messages.through.objects.bulk_create([
+        Notification.post_messages.through(notification_id=notification_id, postmessage_id=instance.id)
+        for notification_id in notification_ids
+    ])
+    Notification.objects.filter(id__in=notification_ids).update(modified=timezone.now())
+
+    # The emails are sent in the next digest of the members
+    online = presence.are_online(sent_to_users.keys())
+    digests.record([
+        user.id for user in sent_to_users.values()
+        if user.email_notifications_allowed and not online[user.id]
+    ])
+
+    # Send the event of message to the members websockets
+    realtime.dispatch_many(
+        ("user-%s" % user_id, {
+            "type": "message.sent",
+            "event": "POST_MESSAGE_RECEIVED",
+            "post__pk": str(post.pk),
+            "notification__pk": str(user_notification.pk),
+        }) for user_id, user_notification in user_notifications.items()
+    )
 
 
 @receiver(post_save, sender=NotificationUser)
 def announce_update_on_notificaitons_model(sender, instance, created, **kwargs):
-    user = instance.user
-    if instance.notification.type != Notification.MESSAGES:
-        user.pending_notifications = True
-        user.save()
+    if created and not instance.is_read:
+        counters.increment([instance.user_id], counters.get_counter(instance.notification.type))
+
+
+@receiver(post_delete, sender=NotificationUser)
+def announce_delete_on_notificaitons_model(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.decrement([instance.user_id], counters.get_counter(instance.notification.type))
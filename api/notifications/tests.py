@@ -1,3 +1,448 @@
-from django.test import TestCase
+# Django
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-# Create your tests here.
+# Django REST Framework
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User, Connection, Follow
+from api.posts.models import Post, PostMember, PostMessage
+from api.notifications.models import Notification, NotificationUser, OutboxEmail
+
+# Channels
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from asgiref.sync import async_to_sync
+from config.routing import application
+
+# Utils
+from api.notifications import counters, digests, outbox, realtime
+from api.taskapp.tasks import fan_out_post_created_notifications
+from datetime import timedelta
+from unittest import mock
+
+
+class SetupNotificationsInitialData(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create(
+            username="alex",
+            email="alex@gmail.com",
+            first_name="Alex",
+            last_name="Hernandez",
+        )
+        self.actor = User.objects.create(
+            username="ivan",
+            email="ivan@gmail.com",
+            first_name="Ivan",
+            last_name="Herms",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_notifications(self, count):
+        for index in range(count):
+            post = Post.objects.create(user=self.actor, title="Post %s" % index, members_count=1)
+            notification = Notification.objects.create(type=Notification.POST_CREATED_BY_A_USER_FOLLOWED, post=post)
+            NotificationUser.objects.create(notification=notification, user=self.user)
+
+            invitation = Connection.objects.create(requester=self.actor, addressee=self.user)
+            notification = Notification.objects.create(type=Notification.NEW_INVITATION, connection=invitation)
+            NotificationUser.objects.create(notification=notification, user=self.user)
+
+    def list_notifications(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/notifications/", {"limit": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(context.captured_queries)
+
+
+class NotificationsListAPITestCase(SetupNotificationsInitialData):
+
+    def test_list_queries(self):
+        """Notifications list should not query per notification"""
+        self.create_notifications(2)
+        response, few_queries = self.list_notifications()
+        self.create_notifications(8)
+        response, many_queries = self.list_notifications()
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_list_response_size(self):
+        """Notifications list should render compact payloads"""
+        self.create_notifications(10)
+        response, queries = self.list_notifications()
+        self.assertLess(len(response.content) / len(response.data['results']), 1024)
+
+    def test_list_payload_fields(self):
+        """Notifications should only render the fields of their type"""
+        self.create_notifications(1)
+        response, queries = self.list_notifications()
+        for user_notification in response.data['results']:
+            notification = user_notification['notification']
+            if notification['type'] == Notification.NEW_INVITATION:
+                self.assertEqual(set(notification), {"id", "type", "modified", "connection"})
+            else:
+                self.assertEqual(set(notification), {"id", "type", "modified", "post"})
+
+    def test_unread_counters(self):
+        """Unread counters should follow the unread notifications"""
+        self.create_notifications(2)
+        self.assertEqual(counters.get_counters(self.user.id), {counters.NOTIFICATIONS: 4, counters.MESSAGES: 0})
+        user_notification = NotificationUser.objects.filter(user=self.user).first()
+        response = self.client.patch("/api/notifications/%s/read/" % user_notification.id)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(counters.get_counters(self.user.id)[counters.NOTIFICATIONS], 3)
+
+    def test_reconcile_unread_counters(self):
+        """Reconcile should correct the drifted unread counters"""
+        self.create_notifications(1)
+        counters.increment([self.user.id], counters.NOTIFICATIONS, 5)
+        self.assertEqual(counters.reconcile([self.user.id]), 1)
+        self.assertEqual(counters.get_counters(self.user.id)[counters.NOTIFICATIONS], 2)
+
+
+class SetupPostMessagesInitialData(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.sent_by = User.objects.create(
+            username="alex",
+            email="alex@gmail.com",
+            first_name="Alex",
+            last_name="Hernandez",
+        )
+
+    def create_post(self, members_count):
+        post = Post.objects.create(user=self.sent_by, title="Post", members_count=members_count + 1)
+        PostMember.objects.create(post=post, user=self.sent_by, role=PostMember.ADMIN)
+        for index in range(members_count):
+            member = User.objects.create(
+                username="member-%s-%s" % (post.id, index),
+                email="member-%s-%s@gmail.com" % (post.id, index),
+            )
+            PostMember.objects.create(post=post, user=member)
+        return post
+
+    def send_message(self, post):
+        with CaptureQueriesContext(connection) as context:
+            PostMessage.objects.create(post=post, sent_by=self.sent_by, text="Hello")
+        return len(context.captured_queries)
+
+
+class PostMessagesNotificationsTestCase(SetupPostMessagesInitialData):
+
+    def test_fan_out_queries(self):
+        """Post messages notifications should not query per member"""
+        few_members = self.create_post(2)
+        many_members = self.create_post(8)
+        self.assertEqual(self.send_message(few_members), self.send_message(many_members))
+        self.assertEqual(self.send_message(few_members), self.send_message(many_members))
+
+    def test_fan_out_reuses_unread_notifications(self):
+        """Post messages should be grouped in the unread notification of each member"""
+        post = self.create_post(3)
+        self.send_message(post)
+        self.send_message(post)
+        user_notifications = NotificationUser.objects.filter(notification__post=post)
+        self.assertEqual(user_notifications.count(), 3)
+        for user_notification in user_notifications:
+            self.assertEqual(user_notification.notification.post_messages.count(), 2)
+            self.assertEqual(counters.get_counters(user_notification.user_id)[counters.NOTIFICATIONS], 1)
+
+
+class PostCreatedFanOutTestCase(SetupPostMessagesInitialData):
+
+    def create_followers(self, count):
+        followers = []
+        for index in range(count):
+            follower = User.objects.create(username="follower-%s" % index, email="follower-%s@gmail.com" % index)
+            Follow.objects.create(from_user=follower, followed_user=self.sent_by)
+            followers.append(follower)
+        return followers
+
+    def get_notified(self, post):
+        return sorted(NotificationUser.objects.filter(
+            notification__post=post, notification__type=Notification.POST_CREATED_BY_A_USER_FOLLOWED,
+        ).values_list('user__username', flat=True))
+
+    def test_fan_out_notifies_followers(self):
+        """Every follower should be notified once, in batches"""
+        followers = self.create_followers(5)
+        post = Post.objects.create(user=self.sent_by, title="Post")
+        self.assertEqual(fan_out_post_created_notifications(post.id, batch_size=2), 5)
+        self.assertEqual(self.get_notified(post), sorted(follower.username for follower in followers))
+        self.assertEqual(counters.get_counters(followers[0].id)[counters.NOTIFICATIONS], 1)
+
+    def test_fan_out_runs_again_without_duplicates(self):
+        """Running the fan-out again should only notify the new followers"""
+        self.create_followers(2)
+        post = Post.objects.create(user=self.sent_by, title="Post")
+        fan_out_post_created_notifications(post.id)
+        follower = User.objects.create(username="late", email="late@gmail.com")
+        Follow.objects.create(from_user=follower, followed_user=self.sent_by)
+
+        self.assertEqual(fan_out_post_created_notifications(post.id), 1)
+        self.assertEqual(len(self.get_notified(post)), 3)
+
+    def test_fan_out_connections_only(self):
+        """Connections only posts should only notify the connected followers"""
+        connected, other = self.create_followers(2)
+        Connection.objects.create(requester=connected, addressee=self.sent_by, accepted=True)
+        post = Post.objects.create(user=self.sent_by, title="Post", privacity=Post.CONNECTIONS_ONLY)
+        fan_out_post_created_notifications(post.id)
+        self.assertEqual(self.get_notified(post), [connected.username])
+
+
+class PostCreatedFanOutRetryTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.author = User.objects.create(username="alex", email="alex@gmail.com")
+        self.follower = User.objects.create(username="ivan", email="ivan@gmail.com")
+        Follow.objects.create(from_user=self.follower, followed_user=self.author)
+        self.post = Post.objects.create(user=self.author, title="Post")
+
+    def test_failed_batch_is_not_counted(self):
+        """The counters should only be incremented for the committed batches"""
+        with mock.patch.object(counters, "increment") as increment:
+            with mock.patch("api.taskapp.tasks.dispatch_many", side_effect=ConnectionError):
+                with self.assertRaises(ConnectionError):
+                    fan_out_post_created_notifications(self.post.id)
+            increment.assert_not_called()
+
+            self.assertEqual(fan_out_post_created_notifications(self.post.id), 1)
+        increment.assert_called_once_with([self.follower.id], counters.NOTIFICATIONS)
+
+
+class MessageDigestsTestCase(SetupPostMessagesInitialData):
+
+    def send_messages(self, member, posts_count):
+        for index in range(posts_count):
+            post = Post.objects.create(user=self.sent_by, title="Post %s" % index, members_count=2)
+            PostMember.objects.create(post=post, user=self.sent_by, role=PostMember.ADMIN)
+            PostMember.objects.create(post=post, user=member)
+            PostMessage.objects.create(post=post, sent_by=self.sent_by, text="Hello")
+            PostMessage.objects.create(post=post, sent_by=self.sent_by, text="Are you there?")
+
+    def test_post_messages_schedule_a_digest(self):
+        """Post messages should schedule a digest instead of sending emails"""
+        member = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.send_messages(member, 1)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(cache.get(digests.get_scheduled_key(member.id)))
+
+    def test_digest_coalesces_messages(self):
+        """Digest should send the unseen messages of every room in one email"""
+        member = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.send_messages(member, 2)
+        self.assertTrue(digests.send_digest(member.id))
+        self.assertFalse(digests.send_digest(member.id))
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(len(digests.get_entries(member.id, timezone.now() - timedelta(days=1))), 2)
+
+    @override_settings(MESSAGE_DIGEST_RATE_LIMIT=60 * 60)
+    def test_digest_rate_limit(self):
+        """Digest should not be sent twice inside the rate limit"""
+        member = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.send_messages(member, 1)
+        cache.set(digests.get_sent_key(member.id), timezone.now() - timedelta(minutes=1))
+        self.assertFalse(digests.send_digest(member.id))
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_lost_digest_job_expires(self):
+        """A digest job that never runs should not hold back the next digest for long"""
+        member = User.objects.create(username="ivan", email="ivan@gmail.com")
+        with mock.patch.object(digests, "SCHEDULED_MARGIN", 0), mock.patch.object(digests, "schedule") as schedule:
+            digests.record([member.id])
+            digests.record([member.id])
+        self.assertEqual(schedule.call_count, 2)
+
+
+class OutboxEmailsTestCase(SetupPostMessagesInitialData):
+
+    def create_users(self, count):
+        return [
+            User.objects.create(username="user-%s" % index, email="user-%s@gmail.com" % index)
+            for index in range(count)
+        ]
+
+    def test_enqueue_deduplicates(self):
+        """Pending emails should not be enqueued twice"""
+        user = self.create_users(1)[0]
+        outbox.enqueue('connection_accepted', [user], user=self.sent_by)
+        outbox.enqueue('connection_accepted', [user], user=self.sent_by)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_drain_sends_emails(self):
+        """Outbox should deliver every due email"""
+        post = Post.objects.create(user=self.sent_by, title="Post", members_count=1)
+        users = self.create_users(3)
+        outbox.enqueue('new_post', users, user=self.sent_by, post=post)
+        self.assertEqual(outbox.drain(batch_size=2), 3)
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), sorted(user.email for user in users))
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 3)
+
+    def test_failed_delivery_is_retried(self):
+        """Failed emails should be retried later"""
+        post = Post.objects.create(user=self.sent_by, title="Post", members_count=1)
+        outbox.enqueue('collaborate_request_accepted', self.create_users(1), post=post)
+        post.delete()
+        self.assertEqual(outbox.drain(), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.send_at, timezone.now())
+
+
+class RealtimeDispatcherTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.channel_layer = get_channel_layer()
+        self.channel_name = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)("user-1", self.channel_name)
+
+    def get_batches(self):
+        return [func for sids, func in connection.run_on_commit if isinstance(func, realtime.Batch)]
+
+    def test_events_wait_for_the_commit(self):
+        """The events of a transaction should be sent together once it commits"""
+        with transaction.atomic():
+            realtime.dispatch("user-1", {"type": "send.notification", "event": "FIRST"})
+            realtime.dispatch("user-1", {"type": "send.notification", "event": "SECOND"})
+
+        # The test transaction is never committed
+        batches = self.get_batches()
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0].events), 2)
+
+        batches[0]()
+        self.assertEqual(async_to_sync(self.channel_layer.receive)(self.channel_name)["event"], "FIRST")
+        self.assertEqual(async_to_sync(self.channel_layer.receive)(self.channel_name)["event"], "SECOND")
+        metrics = realtime.get_metrics()
+        self.assertEqual(metrics["flushes"], 1)
+        self.assertEqual(metrics["events_per_flush"], 2)
+
+    def test_rolled_back_events_are_dropped(self):
+        """The events of a rolled back savepoint should not be sent"""
+        try:
+            with transaction.atomic():
+                realtime.dispatch("user-1", {"type": "send.notification", "event": "ROLLED_BACK"})
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.get_batches(), [])
+
+    def test_collect_sends_once(self):
+        """The events of a collect block should be sent when it ends"""
+        with realtime.collect() as events:
+            realtime.send([("user-1", {"type": "send.notification", "event": "FIRST"})])
+            realtime.send([("user-1", {"type": "send.notification", "event": "SECOND"})])
+            self.assertEqual(len(events), 2)
+            self.assertEqual(realtime.get_metrics()["flushes"], 0)
+        self.assertEqual(realtime.get_metrics()["flushes"], 1)
+
+
+# The sockets only accept the allowed hosts origins
+HEADERS = [(b"origin", b"http://localhost")]
+
+
+class UserConsumerTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.member = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.post = Post.objects.create(user=self.user, title="Post", members_count=2)
+        PostMember.objects.create(post=self.post, user=self.user, role=PostMember.ADMIN)
+        PostMember.objects.create(post=self.post, user=self.member)
+        self.other_post = Post.objects.create(user=self.member, title="Other post", members_count=1)
+        PostMember.objects.create(post=self.other_post, user=self.member, role=PostMember.ADMIN)
+        self.tokens = {user.id: Token.objects.create(user=user).key for user in (self.user, self.member)}
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(application, "/ws/user/?token=%s" % self.tokens[user.id], HEADERS)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def subscribe(self, communicator, post):
+        await communicator.send_json_to({"action": "subscribe", "topic": "post", "id": str(post.id)})
+        response = await communicator.receive_json_from()
+        if response["event"] == "SUBSCRIBED":
+            # The room snapshots follow
+            await communicator.receive_json_from()
+            await communicator.receive_json_from()
+        return response
+
+    def test_anonymous_is_rejected(self):
+        """Sockets without a valid token should be closed"""
+        async def run():
+            for path in ("/ws/user/", "/ws/user/?token=invalid"):
+                connected, code = await WebsocketCommunicator(application, path, HEADERS).connect()
+                self.assertFalse(connected)
+                self.assertEqual(code, 4001)
+        async_to_sync(run)()
+
+    def test_subscribe_permission(self):
+        """Only the post members should subscribe to the post room"""
+        async def run():
+            communicator = await self.connect(self.user)
+            await communicator.send_json_to({"action": "subscribe", "topic": "post", "id": str(self.post.id)})
+            events = [(await communicator.receive_json_from())["event"] for _ in range(3)]
+            self.assertEqual(events, ["SUBSCRIBED", "NOTES_SNAPSHOT", "DRAWING_SNAPSHOT"])
+
+            response = await self.subscribe(communicator, self.other_post)
+            self.assertEqual((response["event"], response["detail"]), ("ERROR", "Not allowed"))
+            await communicator.disconnect()
+        async_to_sync(run)()
+
+    def test_publish_routing(self):
+        """Published events should reach the other subscribers until they unsubscribe"""
+        async def run():
+            publisher = await self.connect(self.user)
+            subscriber = await self.connect(self.member)
+            await self.subscribe(publisher, self.post)
+            await self.subscribe(subscriber, self.post)
+
+            event = {"action": "publish", "topic": "post", "id": str(self.post.id),
+                     "event": "cursor", "data": {"x": 1}}
+            await publisher.send_json_to(event)
+            received = await subscriber.receive_json_from()
+            self.assertEqual((received["event"], received["data"]), ("cursor", {"x": 1}))
+            self.assertEqual(received["sent_by"], str(self.user.id))
+            self.assertTrue(await publisher.receive_nothing())
+
+            await subscriber.send_json_to({"action": "unsubscribe", "topic": "post", "id": str(self.post.id)})
+            self.assertEqual((await subscriber.receive_json_from())["event"], "UNSUBSCRIBED")
+            await publisher.send_json_to(event)
+            self.assertTrue(await subscriber.receive_nothing())
+
+            await publisher.disconnect()
+            await subscriber.disconnect()
+        async_to_sync(run)()
+
+    def test_invalid_messages(self):
+        """Malformed messages should be answered with an error and keep the socket open"""
+        async def run():
+            communicator = await self.connect(self.user)
+            for content in ([], 1, "subscribe"):
+                await communicator.send_json_to(content)
+                response = await communicator.receive_json_from()
+                self.assertEqual(response, {"event": "ERROR", "detail": "Invalid message"})
+            for id in (["x"], {"id": "x"}, 1, "", "a b", "x" * 100):
+                await communicator.send_json_to({"action": "subscribe", "topic": "post", "id": id})
+                response = await communicator.receive_json_from()
+                self.assertEqual(response, {"event": "ERROR", "detail": "Invalid topic"})
+
+            self.assertEqual((await self.subscribe(communicator, self.post))["event"], "SUBSCRIBED")
+            await communicator.disconnect()
+        async_to_sync(run)()
@@ -25,15 +25,23 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from api.users.permissions import IsAccountOwner
 
 # Models
+from api.users.models import User
 from api.notifications.models import NotificationUser
 
 # Serializers
-from api.notifications.serializers import NotificationUserModelSerializer, ReadNotificationSerializer
+from api.notifications.serializers import (
+    NotificationUserModelSerializer,
+    NotificationUserListSerializer,
+    ReadNotificationSerializer
+)
 
 # Filters
 from rest_framework.filters import SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
+# Utils
+from api.utils.paginations import KeysetPagination
+
 
 class NotificationViewSet(
     mixins.ListModelMixin,
@@ -49,6 +57,7 @@ class NotificationViewSet(
     lookup_field = "id"
     serializer_class = NotificationUserModelSerializer
     filter_backends = (SearchFilter, DjangoFilterBackend)
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         """Assign permissions based on action."""
@@ -56,13 +65,19 @@ class NotificationViewSet(
         permissions = [IsAuthenticated]
         return [p() for p in permissions]
 
+    def get_serializer_class(self):
+        """Return serializer based on action."""
+        if self.action == "list":
+            return NotificationUserListSerializer
+        return NotificationUserModelSerializer
+
     def get_queryset(self):
         """Restrict list to public-only."""
         user = self.request.user
-        user.pending_notifications = False
 
-        user.save()
         queryset = NotificationUser.objects.filter(user=user, is_read=False)
+        if self.action == "list":
+            queryset = NotificationUserListSerializer.setup_queryset(queryset)
 
         return queryset
 
@@ -8,3 +8,6 @@ class PostsAppConfig(AppConfig):
     """Post app config."""
     name = 'api.posts'
     verbose_name = 'Posts'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,56 @@
+"""Posts feeds response cache.
+
+Anonymous feed pages are cached under a key that includes the feed
+version. The version is bumped every time a change to a post, a post
+member or a post image commits, so a stale page is never read after it.
+"""
+
+# Django
+from django.core.cache import cache
+
+# Django REST Framework
+from rest_framework import status
+from rest_framework.response import Response
+
+# Utils
+import hashlib
+
+
+FEED_VERSION_KEY = "posts-feed-version"
+
+# Bound the staleness of the rendered authors, they do not bump the version
+FEED_CACHE_TIMEOUT = 60
+
+
+def get_feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, 1, None)
+        version = cache.get(FEED_VERSION_KEY, 1)
+    return version
+
+
+def bump_feed_version():
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.add(FEED_VERSION_KEY, 1, None)
+
+
+def get_feed_cache_key(action, request):
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(repr((request.get_host(), params)).encode()).hexdigest()
+    return "posts-feed-%s-%s-%s" % (get_feed_version(), action, digest)
+
+
+def get_cached_feed_response(action, request, get_response):
+    """Return the cached feed page or render and cache it."""
+    key = get_feed_cache_key(action, request)
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, FEED_CACHE_TIMEOUT)
+    return response
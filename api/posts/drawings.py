@@ -0,0 +1,181 @@
+"""Collaborate rooms whiteboard.
+
+The whiteboard is an append-only log of strokes numbered by the post
+strokes_count, a stroke is a few points instead of the whole canvas:
+
+    {"tool": "pen", "points": [[10, 10], [20, 15]], "color": "#000000", "width": 2}
+    {"tool": "clear"}
+
+The first stroke schedules a snapshot job, later strokes postpone it until no
+stroke has been appended for DRAWING_SNAPSHOT_QUIET_WINDOW seconds, and every
+DRAWING_SNAPSHOT_STROKES strokes it runs right away. The job rasterizes the
+strokes over the previous snapshot into Post.drawing, records the last
+included revision and deletes the included strokes. Joiners load the
+snapshot and replay the strokes after its revision, the replaced snapshot
+file is kept for SNAPSHOT_GRACE_PERIOD seconds so the joiners that just
+received its URL can still load it.
+"""
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+# Models
+from api.posts.models import Post, PostStroke
+
+# Utils
+from PIL import Image, ImageColor, ImageDraw
+import io
+
+
+DRAWING_SIZE = (1920, 1080)
+
+SNAPSHOT_TIMEOUT = 60 * 60
+
+SNAPSHOT_GRACE_PERIOD = 60 * 10
+
+
+def get_scheduled_key(post_id):
+    return "drawing-snapshot-%s" % post_id
+
+
+def get_activity_key(post_id):
+    return "drawing-snapshot-activity-%s" % post_id
+
+
+def schedule(post_id, countdown, force=False):
+    from api.taskapp.tasks import snapshot_drawing
+
+    transaction.on_commit(lambda: snapshot_drawing.apply_async((str(post_id), force), countdown=countdown))
+
+
+def schedule_delete(name):
+    from api.taskapp.tasks import delete_drawing
+
+    transaction.on_commit(lambda: delete_drawing.apply_async((name,), countdown=SNAPSHOT_GRACE_PERIOD))
+
+
+def delete(name):
+    """Delete a replaced snapshot file."""
+    Post._meta.get_field('drawing').storage.delete(name)
+
+
+def serialize(stroke):
+    return dict(stroke.data, revision=stroke.revision, sent_by=str(stroke.user_id) if stroke.user_id else None)
+
+
+def append(post_id, user_id, data):
+    """Append a stroke to the post whiteboard.
+
+    Return the serialized stroke, None if the post is finalized.
+    """
+    with transaction.atomic():
+        post = Post.objects.select_for_update().only('status', 'strokes_count', 'drawing_revision').filter(
+            id=post_id).first()
+        if post is None or post.status == Post.SOLVED:
+            return None
+        post.strokes_count += 1
+        Post.objects.filter(id=post_id).update(strokes_count=post.strokes_count)
+        stroke = PostStroke.objects.create(post_id=post_id, user_id=user_id, revision=post.strokes_count, data=data)
+
+    cache.set(get_activity_key(post_id), timezone.now(), SNAPSHOT_TIMEOUT)
+    if (post.strokes_count - post.drawing_revision) % settings.DRAWING_SNAPSHOT_STROKES == 0:
+        schedule(post_id, 0, force=True)
+    elif cache.add(get_scheduled_key(post_id), True, SNAPSHOT_TIMEOUT):
+        schedule(post_id, settings.DRAWING_SNAPSHOT_QUIET_WINDOW)
+    return serialize(stroke)
+
+
+def get_strokes(post):
+    """Return the strokes that are not in the post drawing snapshot."""
+    return [serialize(stroke) for stroke in PostStroke.objects.filter(post=post.id, revision__gt=post.drawing_revision)]
+
+
+def get_snapshot(post_id):
+    """Return the post drawing URL, its revision and the strokes after it."""
+    post = Post.objects.only('drawing', 'drawing_revision').filter(id=post_id).first()
+    if post is None:
+        return None
+    return {
+        "drawing": post.drawing.url if post.drawing else None,
+        "revision": post.drawing_revision,
+        "strokes": get_strokes(post),
+    }
+
+
+def get_delay(post_id):
+    """Return the seconds to wait before the post drawing is rasterized."""
+    activity = cache.get(get_activity_key(post_id))
+    if not activity:
+        return 0
+    return settings.DRAWING_SNAPSHOT_QUIET_WINDOW - (timezone.now() - activity).total_seconds()
+
+
+def draw(image, stroke):
+    """Draw the stroke on the image, return the image."""
+    if stroke["tool"] == "clear":
+        return Image.new("RGBA", image.size)
+
+    # The eraser makes the pixels transparent again
+    fill = (0, 0, 0, 0) if stroke["tool"] == "eraser" else ImageColor.getrgb(stroke["color"])
+    points = [tuple(point) for point in stroke["points"]]
+    canvas = ImageDraw.Draw(image)
+    if len(points) > 1:
+        canvas.line(points, fill=fill, width=stroke["width"], joint="curve")
+    radius = stroke["width"] / 2
+    for x, y in (points[0], points[-1]):
+        canvas.ellipse([x - radius, y - radius, x + radius, y + radius], fill=fill)
+    return image
+
+
+def rasterize(post_id):
+    """Draw the pending strokes over the post drawing, return if stored."""
+    post = Post.objects.only('drawing', 'drawing_revision').filter(id=post_id).first()
+    if post is None:
+        return False
+    strokes = list(PostStroke.objects.filter(post=post_id, revision__gt=post.drawing_revision))
+    if not strokes:
+        return False
+
+    if post.drawing:
+        with post.drawing.open() as drawing:
+            image = Image.open(drawing).convert("RGBA")
+    else:
+        image = Image.new("RGBA", DRAWING_SIZE)
+    for stroke in strokes:
+        image = draw(image, stroke.data)
+
+    content = io.BytesIO()
+    image.save(content, "PNG", optimize=True)
+    previous = post.drawing.name
+    revision = strokes[-1].revision
+    # Versioned so an overwriting storage never reuses the previous snapshot name
+    post.drawing.save("%s-%s.png" % (post_id, revision), ContentFile(content.getvalue()), save=False)
+
+    storage = post.drawing.storage
+    if not Post.objects.filter(id=post_id, drawing_revision=post.drawing_revision).update(
+            drawing=post.drawing.name, drawing_revision=revision):
+        # Stored meanwhile by another job, keep its file if it has the same name
+        if Post.objects.filter(id=post_id).values_list('drawing', flat=True).first() != post.drawing.name:
+            storage.delete(post.drawing.name)
+        return False
+
+    PostStroke.objects.filter(post=post_id, revision__lte=revision).delete()
+    if previous and previous != post.drawing.name:
+        schedule_delete(previous)
+    return True
+
+
+def snapshot(post_id, force=False):
+    """Rasterize the post drawing if it is due, postpone it otherwise."""
+    if not force:
+        delay = get_delay(post_id)
+        if delay > 0:
+            schedule(post_id, delay)
+            return False
+        # Strokes appended from now on schedule a new snapshot
+        cache.delete(get_scheduled_key(post_id))
+    return rasterize(post_id)
@@ -4,9 +4,15 @@ import django_filters
 
 # Django
 from django.contrib.gis.db.models.functions import GeometryDistance
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 
 # Models
 from api.posts.models import Post
+from api.posts.models.posts import SEARCH_CONFIG
+
+# Utils
+import re
 
 
 class PostFilter(django_filters.FilterSet):
@@ -14,3 +20,28 @@ class PostFilter(django_filters.FilterSet):
     class Meta:
         model = Post
         fields = ['community', 'status']
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """Post full text search filter.
+
+    Match the ?search= terms as prefixes against the stored post
+    search vector. Feeds without an explicit ordering are ordered
+    by rank.
+    """
+
+    def get_search_query(self, request):
+        terms = re.findall(r'\w+', request.query_params.get(self.search_param, ''))
+        if not terms:
+            return None
+        return SearchQuery(' & '.join('%s:*' % term for term in terms), config=SEARCH_CONFIG, search_type='raw')
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if query is None:
+            return queryset
+
+        queryset = queryset.filter(search_vector=query)
+        if queryset.query.order_by:
+            return queryset
+        return queryset.annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank', '-created')
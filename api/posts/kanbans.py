@@ -0,0 +1,243 @@
+"""Collaborate rooms kanban ordering.
+
+Kanban lists and cards are sorted by a rank key, a string of base 36 digits
+compared as a fraction: a key can always be made between two others, so a
+card is moved or inserted writing its own row only. The inserts at the ends
+step the key by one unit of its RANK_WIDTH digit instead of halving the
+gap, so appending does not make the keys longer.
+
+    between("i", "r") == "m"
+    between("i", "j") == "ii"
+    between("i", None) == "i001"
+    between(None, "i") == "hzzz"
+
+The keys never end with "0" and only use digits and lowercase letters, so
+they sort the same in any collation. Moving many times into the same gap
+makes the keys longer, a key longer than RANK_REBALANCE_LENGTH schedules
+a job that spreads the keys of the list or board evenly again.
+
+The moves lock the list or the post the rows are sorted in, so concurrent
+moves and the rebalance do not compute keys from stale neighbours.
+"""
+
+# Django
+from django.core.cache import cache
+from django.db import transaction
+
+# Models
+from api.posts.models import Post, KanbanList, KanbanCard
+
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+BASE = len(DIGITS)
+
+# Digits of the keys stepped by the inserts at the ends
+RANK_WIDTH = 4
+
+RANK_REBALANCE_LENGTH = 16
+
+# Length of the rank columns
+RANK_MAX_LENGTH = 255
+
+REBALANCE_TIMEOUT = 60 * 60
+
+REBALANCE_BATCH_SIZE = 500
+
+
+def encode(value, width):
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits)).rstrip(DIGITS[0])
+
+
+def step(key, amount):
+    """Return the key moved by amount units of the last RANK_WIDTH digit, None if out of range."""
+    value = 0
+    for digit in key[:RANK_WIDTH].ljust(RANK_WIDTH, DIGITS[0]):
+        value = value * BASE + DIGITS.index(digit)
+    value += amount
+    if not 0 < value < BASE ** RANK_WIDTH:
+        return None
+    return encode(value, RANK_WIDTH)
+
+
+def increment(key):
+    """Return the shortest key sorting after the key."""
+    for index, digit in enumerate(key):
+        if digit != DIGITS[-1]:
+            return key[:index] + DIGITS[DIGITS.index(digit) + 1]
+    return key + DIGITS[BASE // 2]
+
+
+def between(before, after):
+    """Return a key sorting after the before key and before the after key.
+
+    None is the start or the end of the list.
+    """
+    before = before or ""
+    if after is None:
+        if not before:
+            # Leave room at both ends
+            return DIGITS[BASE // 2]
+        # Stepping keeps the keys short when appending many times
+        return step(before, 1) or increment(before)
+    if not before and step(after, -1):
+        return step(after, -1)
+
+    # Keep the common prefix, the shorter key is padded with zeros
+    length = 0
+    while length < len(after) and (before[length:length + 1] or DIGITS[0]) == after[length]:
+        length += 1
+    prefix, before, after = after[:length], before[length:], after[length:]
+
+    start = DIGITS.index(before[0]) if before else 0
+    end = DIGITS.index(after[0])
+    if end - start > 1:
+        return prefix + DIGITS[(start + end) // 2]
+    if len(after) > 1:
+        return prefix + after[0]
+    return prefix + DIGITS[start] + increment(before[1:])
+
+
+def spread(count):
+    """Return count evenly spaced keys of the same length at most."""
+    width = RANK_WIDTH
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    size = BASE ** width // (count + 1)
+    return [encode(size * position, width) for position in range(1, count + 1)]
+
+
+def lock(model, ids, **filters):
+    """Lock the rows the moved rows are sorted in, return how many exist."""
+    return len(model.objects.select_for_update().filter(id__in=ids, **filters).order_by('id').values_list('id', flat=True))
+
+
+def get_at(queryset, position):
+    """Return the row at the position of the queryset, None if there is none."""
+    rows = list(queryset.order_by('rank', 'id').only('id', 'rank')[position:position + 1])
+    return rows[0] if rows else None
+
+
+def get_neighbours(queryset, position):
+    """Return the keys around the position of the queryset."""
+    ranks = list(queryset.order_by('rank', 'id').values_list('rank', flat=True)[max(position - 1, 0):position + 1])
+    if position == 0:
+        return None, ranks[0] if ranks else None
+    if not ranks:
+        # Past the end
+        return queryset.order_by('-rank', '-id').values_list('rank', flat=True).first(), None
+    return ranks[0], ranks[1] if len(ranks) > 1 else None
+
+
+def get_scheduled_key(model, id):
+    return "kanban-rebalance-%s-%s" % (model.__name__.lower(), id)
+
+
+def schedule(model, id, rank):
+    """Schedule a rebalance if the key is too long."""
+    from api.taskapp.tasks import rebalance_kanban
+
+    if len(rank) <= RANK_REBALANCE_LENGTH:
+        return
+    name = model.__name__
+
+    def enqueue():
+        # Marked once the key is committed, a rolled back move does not hold off the job
+        if cache.add(get_scheduled_key(model, id), True, REBALANCE_TIMEOUT):
+            rebalance_kanban.delay(name, str(id))
+
+    transaction.on_commit(enqueue)
+
+
+def get_rank(queryset, position, parent, id):
+    """Return a key for the position of the queryset sorted in the parent."""
+    rank = between(*get_neighbours(queryset, position))
+    if len(rank) > RANK_MAX_LENGTH:
+        # The rebalance job did not run in time
+        rebalance(parent.__name__, id)
+        return between(*get_neighbours(queryset, position))
+    schedule(parent, id, rank)
+    return rank
+
+
+def create_list(post, **fields):
+    """Create a kanban list at the end of the post board."""
+    with transaction.atomic():
+        lock(Post, [post.id])
+        last = KanbanList.objects.filter(post=post.id).order_by('-rank').values_list('rank', flat=True).first()
+        kanban_list = KanbanList.objects.create(post=post, rank=between(last, None), **fields)
+        schedule(Post, post.id, kanban_list.rank)
+    return kanban_list
+
+
+def create_card(kanban_list, **fields):
+    """Create a kanban card at the end of the list."""
+    with transaction.atomic():
+        lock(KanbanList, [kanban_list.id])
+        last = KanbanCard.objects.filter(kanban_list=kanban_list.id).order_by('-rank').values_list(
+            'rank', flat=True).first()
+        card = KanbanCard.objects.create(kanban_list=kanban_list, rank=between(last, None), **fields)
+        schedule(KanbanList, kanban_list.id, card.rank)
+    return card
+
+
+def move_list(post_id, start, end):
+    """Move the list at the start position of the board to the end position.
+
+    Return the new key, None if there is no list at the start position.
+    """
+    with transaction.atomic():
+        lock(Post, [post_id])
+        lists = KanbanList.objects.filter(post=post_id)
+        kanban_list = get_at(lists, start)
+        if kanban_list is None:
+            return None
+
+        rank = get_rank(lists.exclude(id=kanban_list.id), end, Post, post_id)
+        KanbanList.objects.filter(id=kanban_list.id).update(rank=rank)
+    return rank
+
+
+def move_card(post_id, list_start_id, list_end_id, start, end):
+    """Move the card at the start position of a list to the end position of a list.
+
+    Return the new key, None if there is no card at the start position or
+    the lists are not in the post.
+    """
+    list_ids = {list_start_id, list_end_id}
+    with transaction.atomic():
+        if lock(KanbanList, list_ids, post=post_id) != len(list_ids):
+            return None
+        card = get_at(KanbanCard.objects.filter(kanban_list=list_start_id), start)
+        if card is None:
+            return None
+
+        cards = KanbanCard.objects.filter(kanban_list=list_end_id).exclude(id=card.id)
+        rank = get_rank(cards, end, KanbanList, list_end_id)
+        KanbanCard.objects.filter(id=card.id).update(kanban_list=list_end_id, rank=rank)
+    return rank
+
+
+def rebalance(model_name, id):
+    """Spread the keys of the lists of a post or the cards of a list, return how many changed."""
+    parent, model, field = {
+        Post.__name__: (Post, KanbanList, 'post'),
+        KanbanList.__name__: (KanbanList, KanbanCard, 'kanban_list'),
+    }[model_name]
+    # Keys made from now on schedule a new rebalance
+    cache.delete(get_scheduled_key(parent, id))
+    with transaction.atomic():
+        lock(parent, [id])
+        rows = list(model.objects.select_for_update().filter(**{field: id}).order_by('rank', 'id').only('id', 'rank'))
+
+        changed = []
+        for row, rank in zip(rows, spread(len(rows))):
+            if row.rank != rank:
+                row.rank = rank
+                changed.append(row)
+        model.objects.bulk_update(changed, ['rank'], batch_size=REBALANCE_BATCH_SIZE)
+    return len(changed)
@@ -0,0 +1,41 @@
+"""Posts batch loaders."""
+
+# Models
+from api.posts.models import PostImage, PostMember, CollaborateRequest
+
+# Utils
+from collections import defaultdict
+
+
+class PostBatchLoader:
+    """Post page batch loader.
+
+    Fetch the images, members and the viewer collaborate requests
+    of a whole page of posts at once, so PostModelSerializer can
+    render every post of the page without querying per row.
+    """
+
+    def __init__(self, posts, user=None):
+        post_ids = [post.id for post in posts]
+
+        self.images = defaultdict(list)
+        for image in PostImage.objects.filter(post__in=post_ids):
+            self.images[image.post_id].append(image)
+
+        self.members = defaultdict(list)
+        for member in PostMember.objects.filter(post__in=post_ids).select_related('user'):
+            self.members[member.post_id].append(member)
+
+        self.collaborate_requested = set()
+        if user and user.id:
+            self.collaborate_requested = set(CollaborateRequest.objects.filter(
+                post__in=post_ids, user=user).values_list('post_id', flat=True))
+
+    def get_images(self, post):
+        return self.images[post.id]
+
+    def get_members(self, post):
+        return self.members[post.id]
+
+    def is_collaborate_requested(self, post):
+        return post.id in self.collaborate_requested
@@ -0,0 +1,36 @@
+# Generated by Django 3.0.3 on 2021-06-08 10:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20210531_1557'),
+        ('posts', '0010_auto_20210607_0726'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE posts_post SET search_vector =
+                setweight(to_tsvector('english', coalesce(posts_post.title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(posts_post.text, '')), 'B') ||
+                setweight(to_tsvector('english', concat_ws(' ', users_user.username,
+                    users_user.first_name, users_user.last_name)), 'C')
+            FROM users_user WHERE users_user.id = posts_post.user_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.3 on 2021-06-08 12:40
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20210531_1557'),
+        ('posts', '0011_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE posts_post SET location = users_user.geolocation
+            FROM users_user WHERE users_user.id = posts_post.user_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
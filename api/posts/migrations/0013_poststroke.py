@@ -0,0 +1,49 @@
+# Generated by Django 3.0.3 on 2021-06-09 10:15
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_post_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='drawing_revision',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='strokes_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PostStroke',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='Date time on which the object was created.', verbose_name='created at')),
+                ('modified', models.DateTimeField(auto_now=True, help_text='Date time on which the object was last modified.', verbose_name='modified at')),
+                ('revision', models.PositiveIntegerField()),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='strokes', to='posts.Post')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['revision'],
+                'get_latest_by': 'created',
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='poststroke',
+            constraint=models.UniqueConstraint(fields=('post', 'revision'), name='post_stroke_revision'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.3 on 2021-06-10 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_poststroke'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postmessage',
+            index=models.Index(fields=['post', 'created', 'id'], name='post_message_history_idx'),
+        ),
+    ]
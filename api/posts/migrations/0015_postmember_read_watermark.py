@@ -0,0 +1,38 @@
+# Generated by Django 3.0.3 on 2021-06-11 10:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_postmessage_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmember',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='postmember',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.PostMessage'),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE posts_postmember SET
+                last_read_message_id = posts_postmessage.id,
+                last_read_at = posts_postmessage.created
+            FROM posts_postseenby JOIN posts_postmessage ON posts_postmessage.id = posts_postseenby.message_id
+            WHERE posts_postseenby.post_id = posts_postmember.post_id
+            AND posts_postseenby.user_id = posts_postmember.user_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.DeleteModel(
+            name='PostSeenBy',
+        ),
+    ]
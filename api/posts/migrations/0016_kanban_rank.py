@@ -0,0 +1,82 @@
+# Generated by Django 3.0.3 on 2021-06-11 15:40
+
+from django.db import migrations, models
+
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def spread(count):
+    # Same keys as api.posts.kanbans.spread when this migration was written
+    width = 4
+    while len(DIGITS) ** width < (count + 1) * len(DIGITS):
+        width += 1
+    size = len(DIGITS) ** width // (count + 1)
+
+    keys = []
+    for position in range(1, count + 1):
+        value, digits = size * position, []
+        for _ in range(width):
+            value, digit = divmod(value, len(DIGITS))
+            digits.append(DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
+
+
+def set_ranks(apps, schema_editor):
+    for model_name, field in (("KanbanList", "post_id"), ("KanbanCard", "kanban_list_id")):
+        model = apps.get_model("posts", model_name)
+        groups = {}
+        for row in model.objects.order_by(field, "order", "created").only("id", field):
+            groups.setdefault(getattr(row, field), []).append(row)
+        for rows in groups.values():
+            for row, rank in zip(rows, spread(len(rows))):
+                row.rank = rank
+            model.objects.bulk_update(rows, ["rank"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_postmember_read_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kanbancard',
+            name='rank',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='kanbanlist',
+            name='rank',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_ranks, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='kanbancard',
+            options={'ordering': ['rank', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='kanbanlist',
+            options={'ordering': ['rank', 'id']},
+        ),
+        migrations.RemoveField(
+            model_name='kanbancard',
+            name='order',
+        ),
+        migrations.RemoveField(
+            model_name='kanbanlist',
+            name='order',
+        ),
+        migrations.AddIndex(
+            model_name='kanbancard',
+            index=models.Index(fields=['kanban_list', 'rank', 'id'], name='kanban_card_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kanbanlist',
+            index=models.Index(fields=['post', 'rank', 'id'], name='kanban_list_rank_idx'),
+        ),
+    ]
@@ -2,7 +2,7 @@ from .posts import Post, PostImage
 from .collaborate_requests import CollaborateRequest
 from .post_members import PostMember
 from .post_messages import PostMessage, PostMessageFile
-from .post_seen_by import PostSeenBy
 from .post_kanbans import KanbanList, KanbanCard
 from .post_files import PostFile
 from .post_folders import PostFolder
+from .post_strokes import PostStroke
@@ -9,12 +9,16 @@ class KanbanList(CModel):
 
     post = models.ForeignKey("posts.Post", on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
-    order = models.IntegerField()
+    # Sort key, see api.posts.kanbans
+    rank = models.CharField(max_length=255)
 
     class Meta:
         """Meta option."""
 
-        ordering = ['order']
+        ordering = ['rank', 'id']
+        indexes = [
+            models.Index(fields=['post', 'rank', 'id'], name='kanban_list_rank_idx'),
+        ]
 
 
 class KanbanCard(CModel):
@@ -22,9 +26,13 @@ class KanbanCard(CModel):
 
     kanban_list = models.ForeignKey("posts.KanbanList", on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
-    order = models.IntegerField()
+    # Sort key, see api.posts.kanbans
+    rank = models.CharField(max_length=255)
 
     class Meta:
         """Meta option."""
 
-        ordering = ['order']
+        ordering = ['rank', 'id']
+        indexes = [
+            models.Index(fields=['kanban_list', 'rank', 'id'], name='kanban_card_rank_idx'),
+        ]
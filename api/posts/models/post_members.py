@@ -25,3 +25,8 @@ class PostMember(CModel):
     )
     # Comment
     draft_comment = models.TextField(null=True, blank=True)
+
+    # Read watermark, the messages after it are unread
+    last_read_message = models.ForeignKey("posts.PostMessage", on_delete=models.SET_NULL, null=True, blank=True,
+                                          related_name="+")
+    last_read_at = models.DateTimeField(null=True, blank=True)
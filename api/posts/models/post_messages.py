@@ -11,6 +11,9 @@ class PostMessage(CModel):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'], name='post_message_history_idx'),
+        ]
 
 
 class PostMessageFile(CModel):
@@ -0,0 +1,22 @@
+from api.utils.models import CModel
+from django.contrib.gis.db import models
+from django.contrib.postgres.fields import JSONField
+
+
+class PostStroke(CModel):
+    """Whiteboard stroke of a collaborate room.
+
+    Strokes are numbered by the post strokes_count and the ones included in
+    the post drawing snapshot are deleted, see api.posts.drawings.
+    """
+
+    post = models.ForeignKey("posts.Post", on_delete=models.CASCADE, related_name="strokes")
+    user = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True, blank=True)
+    revision = models.PositiveIntegerField()
+    data = JSONField(default=dict)
+
+    class Meta(CModel.Meta):
+        ordering = ['revision']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'revision'], name='post_stroke_revision'),
+        ]
@@ -1,5 +1,20 @@
 from api.utils.models import CModel
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models import Value
+
+
+SEARCH_CONFIG = 'english'
+
+
+def get_search_vector(author):
+    """Return the search vector of a post of the author."""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('text', weight='B', config=SEARCH_CONFIG) +
+        SearchVector(Value(author), weight='C', config=SEARCH_CONFIG)
+    )
 
 
 class Post(CModel):
@@ -21,6 +36,9 @@ class Post(CModel):
     drawing = models.FileField(verbose_name="Drawing File",
                                upload_to='posts/drawings/',
                                max_length=500, null=True, blank=True)
+    # Strokes appended to the whiteboard and the ones included in the drawing
+    strokes_count = models.IntegerField(default=0)
+    drawing_revision = models.IntegerField(default=0)
     ANYONE = 'AN'
     CONNECTIONS_ONLY = 'CO'
     PRIVACITY_TYPES = [
@@ -51,6 +69,36 @@ class Post(CModel):
 
     files_size = models.IntegerField(default=0)
 
+    # Author geolocation when the post was created
+    location = models.PointField(null=True, blank=True)
+
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta(CModel.Meta):
+        """Meta option."""
+
+        indexes = [GinIndex(fields=['search_vector'], name='post_search_vector_idx')]
+
+    def __init__(self, *args, **kwargs):
+        super(Post, self).__init__(*args, **kwargs)
+        # New posts and posts never indexed have no indexed document yet,
+        # a deferred search vector is taken as indexed
+        indexed = self.__dict__.get('search_vector', True) is not None
+        self._indexed_document = self.get_search_document() if indexed else None
+
+    def get_search_document(self):
+        # Read from __dict__ so deferred fields are not loaded
+        return tuple(self.__dict__.get(field) for field in ('title', 'text', 'user_id'))
+
+    def save(self, **kwargs):
+        super(Post, self).save(**kwargs)
+
+        # Only update the search vector when the indexed fields change
+        document = self.get_search_document()
+        if document != self._indexed_document:
+            Post.objects.filter(pk=self.pk).update(search_vector=get_search_vector(self.user.get_search_author()))
+            self._indexed_document = document
+
 
 class PostImage(CModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
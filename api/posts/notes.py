@@ -0,0 +1,316 @@
+"""Collaborate rooms shared notes buffer.
+
+The latest shared notes of a post are held in a Redis hash with a version
+that is incremented on every write, and the post is marked as dirty. The
+flush_shared_notes task writes the dirty notes to Post.shared_notes every
+SHARED_NOTES_FLUSH_INTERVAL seconds, and the notes of a room are flushed as
+soon as a member leaves it. Reads prefer the buffer.
+
+Editors send insert/delete ops based on the revision they have seen:
+
+    {"position": 10, "insert": "text"}
+    {"position": 10, "delete": 4}
+
+The ops applied since that revision are kept in a capped list, the op is
+transformed against them, applied to the buffered document and stored with
+the new revision so the peers can apply it too. Every flush keeps the stored
+text as the snapshot of its revision, late joiners receive the snapshot and
+the ops applied after it. A full text write drops the ops, the editors based
+on older revisions have to load the snapshot again.
+
+Positions and lengths are UTF-16 code units, the string offsets of the
+browser editors, so the characters out of the BMP like emojis count as two.
+
+When the cache is not Redis the notes are written to the post directly.
+"""
+
+# Django
+from django_redis import get_redis_connection
+
+# Models
+from api.posts.models import Post
+
+# Utils
+from redis import WatchError
+import json
+
+
+SHARED_NOTES_FLUSH_INTERVAL = 10
+
+SHARED_NOTES_TIMEOUT = 60 * 60 * 24
+
+SHARED_NOTES_DIRTY_KEY = "shared-notes-dirty"
+
+# Ops kept to transform the ops of stale editors and replay to late joiners
+SHARED_NOTES_OPS_LENGTH = 500
+
+
+def get_connection():
+    """Return the Redis connection or None if the cache is not Redis."""
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
+
+
+def get_notes_key(post_id):
+    return "shared-notes-%s" % post_id
+
+
+def get_ops_key(post_id):
+    return "shared-notes-ops-%s" % post_id
+
+
+def encode(text):
+    return text.encode("utf-16-le", "surrogatepass")
+
+
+def get_length(text):
+    """Return the length of the text in UTF-16 code units."""
+    return len(encode(text)) // 2
+
+
+def is_valid_text(text):
+    try:
+        # Lone surrogates can not be stored
+        text.encode()
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def is_valid_op(op):
+    if not isinstance(op, dict) or type(op.get("position")) is not int or op["position"] < 0:
+        return False
+    if "insert" in op:
+        return isinstance(op["insert"], str) and op["insert"] != "" and is_valid_text(op["insert"])
+    return type(op.get("delete")) is int and op["delete"] > 0
+
+
+def get_offset(units, position):
+    """Return the byte offset of the UTF-16 position, clamped to the end and the characters start."""
+    offset = min(position * 2, len(units))
+    if offset < len(units) and 0xDC00 <= int.from_bytes(units[offset:offset + 2], "little") <= 0xDFFF:
+        # A position between the two halves of a surrogate pair
+        offset -= 2
+    return offset
+
+
+def apply(text, op):
+    """Return the text with the op applied, positions past the end are clamped."""
+    units = encode(text)
+    start = get_offset(units, op["position"])
+    if "insert" in op:
+        units = units[:start] + encode(op["insert"]) + units[start:]
+    else:
+        units = units[:start] + units[get_offset(units, op["position"] + op["delete"]):]
+    return units.decode("utf-16-le", "surrogatepass")
+
+
+def transform(op, applied):
+    """Return the op rebased on an op applied before it, None if nothing is left.
+
+    Both ops are based on the same revision, on equal positions the applied
+    insert goes first and the text inserted in a deleted range is deleted too.
+    """
+    position = op["position"]
+    start = applied["position"]
+    if "insert" in applied:
+        length = get_length(applied["insert"])
+        if position >= start:
+            return dict(op, position=position + length)
+        if "delete" in op and position + op["delete"] > start:
+            # The deleted range includes the inserted text
+            return dict(op, delete=op["delete"] + length)
+        return op
+
+    end = start + applied["delete"]
+    if "insert" in op:
+        if position <= start:
+            return op
+        if position >= end:
+            return dict(op, position=position - applied["delete"])
+        # Inserted in the deleted text
+        return None
+
+    op_end = position + op["delete"]
+    if op_end <= start:
+        return op
+    if position >= end:
+        return dict(op, position=position - applied["delete"])
+    # Part of the range is already deleted
+    length = op["delete"] - (min(op_end, end) - max(position, start))
+    if not length:
+        return None
+    return {"position": min(position, start), "delete": length}
+
+
+def load_ops(pipeline, post_id, revision):
+    """Return the stored ops applied after the revision."""
+    ops = (json.loads(op) for op in pipeline.lrange(get_ops_key(post_id), 0, -1))
+    return [op for op in ops if op["revision"] > revision]
+
+
+def init(connection, post_id):
+    """Buffer the stored notes of the post if they are not buffered."""
+    key = get_notes_key(post_id)
+    if connection.exists(key):
+        return
+    text = Post.objects.filter(id=post_id).values_list("shared_notes", flat=True).first() or ""
+    if connection.hsetnx(key, "text", text):
+        connection.hset(key, "snapshot", text)
+        connection.hsetnx(key, "version", 0)
+        connection.hsetnx(key, "flushed", 0)
+    connection.expire(key, SHARED_NOTES_TIMEOUT)
+
+
+def write(post_id, text):
+    """Buffer the post shared notes, return the notes version."""
+    connection = get_connection()
+    if connection is None:
+        Post.objects.filter(id=post_id).update(shared_notes=text)
+        return None
+
+    key = get_notes_key(post_id)
+    pipeline = connection.pipeline()
+    pipeline.hset(key, "text", text)
+    pipeline.hincrby(key, "version", 1)
+    pipeline.expire(key, SHARED_NOTES_TIMEOUT)
+    pipeline.delete(get_ops_key(post_id))
+    pipeline.sadd(SHARED_NOTES_DIRTY_KEY, str(post_id))
+    return pipeline.execute()[1]
+
+
+def apply_op(post_id, revision, op):
+    """Apply an op based on the revision to the buffered notes.
+
+    Return the transformed op, None if it was fully overridden, and the
+    resulting revision. Return None if the ops since the revision are no
+    longer kept and the editor has to load the snapshot again.
+    """
+    connection = get_connection()
+    if connection is None:
+        post = Post.objects.filter(id=post_id).only("shared_notes").first()
+        if post is not None:
+            Post.objects.filter(id=post_id).update(shared_notes=apply(post.shared_notes or "", op))
+        return op, None
+
+    init(connection, post_id)
+    key = get_notes_key(post_id)
+    ops_key = get_ops_key(post_id)
+    with connection.pipeline() as pipeline:
+        while True:
+            try:
+                pipeline.watch(key, ops_key)
+                text, version = pipeline.hmget(key, "text", "version")
+                version = int(version or 0)
+                if text is None or revision > version:
+                    return None
+
+                transformed = op
+                if revision < version:
+                    ops = load_ops(pipeline, post_id, revision)
+                    if len(ops) != version - revision:
+                        return None
+                    for applied in ops:
+                        transformed = transform(transformed, applied["op"])
+                        if transformed is None:
+                            return None, version
+
+                version += 1
+                pipeline.multi()
+                pipeline.hset(key, "text", apply(text.decode(), transformed))
+                pipeline.hset(key, "version", version)
+                pipeline.rpush(ops_key, json.dumps({"revision": version, "op": transformed}))
+                pipeline.ltrim(ops_key, -SHARED_NOTES_OPS_LENGTH, -1)
+                pipeline.expire(key, SHARED_NOTES_TIMEOUT)
+                pipeline.expire(ops_key, SHARED_NOTES_TIMEOUT)
+                pipeline.sadd(SHARED_NOTES_DIRTY_KEY, str(post_id))
+                pipeline.execute()
+                return transformed, version
+            except WatchError:
+                # Another op was applied meanwhile, transform against it too
+                continue
+
+
+def get_snapshot(post_id):
+    """Return the notes snapshot, its revision and the ops applied after it."""
+    connection = get_connection()
+    if connection is None:
+        text = Post.objects.filter(id=post_id).values_list("shared_notes", flat=True).first()
+        return {"text": text or "", "revision": None, "ops": []}
+
+    init(connection, post_id)
+    key = get_notes_key(post_id)
+    pipeline = connection.pipeline()
+    pipeline.hmget(key, "text", "version", "snapshot", "flushed")
+    pipeline.lrange(get_ops_key(post_id), 0, -1)
+    (text, version, snapshot, flushed), ops = pipeline.execute()
+    version = int(version or 0)
+    flushed = int(flushed or 0)
+
+    ops = [op for op in map(json.loads, ops) if op["revision"] > flushed]
+    if snapshot is None or len(ops) != version - flushed:
+        # The snapshot is older than the kept ops
+        return {"text": (text or b"").decode(), "revision": version, "ops": []}
+    return {"text": snapshot.decode(), "revision": flushed, "ops": ops}
+
+
+def get_text(post_id):
+    """Return the buffered notes text and its revision."""
+    connection = get_connection()
+    if connection is None:
+        text = Post.objects.filter(id=post_id).values_list("shared_notes", flat=True).first()
+        return {"text": text or "", "revision": None}
+
+    init(connection, post_id)
+    text, version = connection.hmget(get_notes_key(post_id), "text", "version")
+    return {"text": (text or b"").decode(), "revision": int(version or 0)}
+
+
+def read(post):
+    """Return the buffered shared notes of the post or the stored ones."""
+    connection = get_connection()
+    if connection is not None:
+        text = connection.hget(get_notes_key(post.id), "text")
+        if text is not None:
+            return text.decode()
+    return post.shared_notes
+
+
+def flush(post_id):
+    """Store the buffered notes of the post if they changed, return if stored."""
+    connection = get_connection()
+    if connection is None:
+        return False
+
+    key = get_notes_key(post_id)
+    with connection.pipeline() as pipeline:
+        try:
+            pipeline.watch(key)
+            text, version, flushed = pipeline.hmget(key, "text", "version", "flushed")
+            if text is None or version == flushed:
+                pipeline.multi()
+                pipeline.srem(SHARED_NOTES_DIRTY_KEY, str(post_id))
+                pipeline.execute()
+                return False
+
+            Post.objects.filter(id=post_id).update(shared_notes=text.decode())
+
+            pipeline.multi()
+            pipeline.hset(key, "flushed", version)
+            pipeline.hset(key, "snapshot", text)
+            pipeline.srem(SHARED_NOTES_DIRTY_KEY, str(post_id))
+            pipeline.execute()
+        except WatchError:
+            # Written meanwhile, the post stays dirty for the next flush
+            pass
+    return True
+
+
+def flush_dirty():
+    """Store the notes of every dirty post, return how many were stored."""
+    connection = get_connection()
+    if connection is None:
+        return 0
+    return sum(flush(post_id.decode()) for post_id in connection.smembers(SHARED_NOTES_DIRTY_KEY))
@@ -9,9 +9,8 @@ from django.contrib.auth import password_validation, authenticate
 from django.core.validators import RegexValidator
 from django.shortcuts import get_object_or_404
 
-# Channels
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+# Realtime
+from api.notifications import realtime
 
 # Serializers
 from api.users.serializers import UserModelSerializer
@@ -26,6 +25,9 @@ from api.notifications.models import Notification, NotificationUser
 # Celery
 from api.taskapp.tasks import send_collaborate_request, send_collaborate_request_accepted
 
+# Presence
+from api.users import presence
+
 
 class CollaborateRequestModelSerializer(serializers.ModelSerializer):
     """User model serializer."""
@@ -85,8 +87,7 @@ class RequestCollaborateSerializer(serializers.Serializer):
             user=post.user
         )
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % post.user.id, {
                 "type": "send.notification",
                 "event": "NEW_COLLABORATE_REQUEST",
@@ -94,7 +95,7 @@ class RequestCollaborateSerializer(serializers.Serializer):
                 "collaborate_request__pk": str(collaborate_request.pk),
             }
         )
-        if not post.user.is_online and post.user.email_notifications_allowed:
+        if post.user.email_notifications_allowed and not presence.is_online(post.user.id):
             send_collaborate_request(user, post.user)
 
         return collaborate_request
@@ -147,8 +148,7 @@ class AcceptCollaborateRequestSerializer(serializers.Serializer):
             user=post.user
         )
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % post.user.id, {
                 "type": "send.notification",
                 "event": "JOINED_MEMBERSHIP",
@@ -167,14 +167,13 @@ class AcceptCollaborateRequestSerializer(serializers.Serializer):
             user=requester_user
         )
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % requester_user.id, {
                 "type": "send.notification",
                 "event": "COLLABORATE_REQUEST_ACCEPTED",
                 "notification__pk": str(user_notification.pk),
             }
         )
-        if not requester_user.is_online and requester_user.email_notifications_allowed:
+        if requester_user.email_notifications_allowed and not presence.is_online(requester_user.id):
             send_collaborate_request_accepted(post, requester_user)
         return instance
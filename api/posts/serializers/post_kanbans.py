@@ -21,10 +21,11 @@ from .post_members import PostMemberModelSerializer
 
 # Models
 from api.users.models import User, Review, Follow, Connection
-from api.posts.models import Post, KanbanCard, KanbanList, PostMember, CollaborateRequest, PostSeenBy
+from api.posts.models import Post, KanbanCard, KanbanList, PostMember, CollaborateRequest
 from api.notifications.models import Notification, NotificationUser
 
 # Utils
+from api.posts import kanbans
 import json
 
 
@@ -56,13 +57,7 @@ class KanbanCardModelSerializer(serializers.ModelSerializer):
         kanban_list = self.context['kanban_list']
         title = validated_data["title"]
         id = validated_data["id"]
-        # Get the kanban card higher order number
-        order = 0
-        if KanbanCard.objects.filter(kanban_list=kanban_list).order_by("-order").exists():
-            last_kanban_card = KanbanCard.objects.filter(kanban_list=kanban_list).order_by("-order").first()
-            order = last_kanban_card.order + 1
-
-        card = KanbanCard.objects.create(id=id, title=title, kanban_list=kanban_list, order=order)
+        card = kanbans.create_card(kanban_list, id=id, title=title)
 
         return card
 
@@ -101,12 +96,6 @@ class KanbanListModelSerializer(serializers.ModelSerializer):
         post = self.context['post']
         title = validated_data["title"]
         id = validated_data["id"]
-        # Get the kanban list higher order number
-        order = 0
-        if KanbanList.objects.filter(post=post).order_by("-order").exists():
-            last_kanban_list = KanbanList.objects.filter(post=post).order_by("-order").first()
-
-            order = last_kanban_list.order + 1
-        list = KanbanList.objects.create(id=id, title=title, post=post, order=order)
+        list = kanbans.create_list(post, id=id, title=title)
 
         return list
@@ -35,8 +35,8 @@ class PostMessageModelSerializer(serializers.ModelSerializer):
     def get_files(self, obj):
 
         from api.posts.serializers import PostMessageFileModelSerializer
-        files = PostMessageFile.objects.filter(message=obj.id)
-        return PostMessageFileModelSerializer(files, many=True).data
+        # Prefetched by the messages list
+        return PostMessageFileModelSerializer(obj.postmessagefile_set.all(), many=True).data
 
 
 class CreatePostMessageSerializer(serializers.Serializer):
@@ -2,22 +2,30 @@
 from rest_framework import serializers
 
 # Models
-from api.posts.models import PostSeenBy
+from api.posts.models import PostMember
+
+# Utils
+from api.posts import watermarks
 
 # Serializers
 from api.users.serializers import UserModelSerializer
 
 
 class PostSeenByModelSerializer(serializers.ModelSerializer):
-    """User model serializer."""
+    """Read watermark of a collaborate room member."""
+
+    post = serializers.UUIDField(source="post_id", read_only=True)
+    message = serializers.UUIDField(source="last_read_message_id", read_only=True)
+    user = serializers.UUIDField(source="user_id", read_only=True)
+    modified = serializers.DateTimeField(source="last_read_at", read_only=True)
 
     class Meta:
         """Meta class."""
 
-        model = PostSeenBy
+        model = PostMember
         fields = ("id", "post", "message", "user", "modified")
 
-        read_only_fields = ("id",)
+        read_only_fields = fields
 
 
 class CreatePostSeenBySerializer(serializers.Serializer):
@@ -33,9 +41,5 @@ class CreatePostSeenBySerializer(serializers.Serializer):
         user = self.context["request"].user
         post = self.context["post"]
 
-        seen_by, created = PostSeenBy.objects.get_or_create(post=post, user=user)
-        if seen_by.message != post.last_message:
-
-            seen_by.message = post.last_message
-            seen_by.save()
-        return seen_by
+        watermarks.mark_read(post, user.id)
+        return PostMember.objects.filter(post=post, user=user).first()
@@ -2,7 +2,7 @@
 
 # Django REST Framework
 from api.posts.serializers.post_kanbans import KanbanListModelSerializer
-from api.taskapp.tasks import send_post_finalized, send_post_to_followers
+from api.taskapp.tasks import send_post_finalized, send_post_to_followers, fan_out_post_created_notifications
 from rest_framework import serializers
 
 # Django
@@ -11,11 +11,7 @@ from django.contrib.auth import password_validation, authenticate
 from django.core.validators import RegexValidator
 from django.shortcuts import get_object_or_404
 from django.db.models import Avg, Sum, Q
-from django.core.files.base import ContentFile
-
-# Channels
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.db import transaction
 
 # Serializers
 from api.users.serializers import UserModelSerializer
@@ -23,12 +19,14 @@ from .post_members import PostMemberModelSerializer
 
 # Models
 from api.users.models import User, Review, Follow, Connection
-from api.posts.models import Post, PostImage, PostMember, CollaborateRequest, PostSeenBy, KanbanList, KanbanCard, PostFile
+from api.posts.models import Post, PostImage, PostMember, CollaborateRequest, KanbanList, KanbanCard, PostFile
 from api.notifications.models import Notification, NotificationUser
 
 # Utils
+from api.notifications import counters, realtime
+from api.users import presence
+from api.posts import drawings, kanbans, notes, watermarks
 import json
-import base64
 
 
 class PostImageModelSerializer(serializers.ModelSerializer):
@@ -79,13 +77,22 @@ class PostModelSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created")
 
     def get_images(self, obj):
-        return PostImageModelSerializer(PostImage.objects.filter(post=obj.id), many=True).data
+        if 'post_loader' in self.context:
+            images = self.context['post_loader'].get_images(obj)
+        else:
+            images = PostImage.objects.filter(post=obj.id)
+        return PostImageModelSerializer(images, many=True).data
 
     def get_members(self, obj):
-        members = PostMember.objects.filter(post=obj.id)
+        if 'post_loader' in self.context:
+            members = self.context['post_loader'].get_members(obj)
+        else:
+            members = PostMember.objects.filter(post=obj.id)
         return PostMemberModelSerializer(members, many=True).data
 
     def get_is_collaborate_requested(self, obj):
+        if 'post_loader' in self.context:
+            return self.context['post_loader'].is_collaborate_requested(obj)
         if 'request' in self.context:
             request = self.context['request']
             if request.user.id:
@@ -104,7 +111,7 @@ class PostModelSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = self.context['request'].user
         images = self.context["images"]
-        post = Post.objects.create(user=user, **validated_data, members_count=1)
+        post = Post.objects.create(user=user, **validated_data, members_count=1, location=user.geolocation)
 
         user.karma_amount = user.karma_amount - post.karma_offered
         user.posts_count += 1
@@ -121,31 +128,9 @@ class PostModelSerializer(serializers.ModelSerializer):
             )
         PostMember.objects.create(post=post, user=user, role=PostMember.ADMIN)
 
-        users_following = Follow.objects.filter(followed_user=user)
-        for user_following in users_following:
-            # Create the notification for the user
-            if post.privacity == Post.CONNECTIONS_ONLY and not Connection.objects.filter(
-                    Q(requester=user, addressee=user_following.from_user) |
-                    Q(requester=user_following.from_user, addressee=user),
-                    accepted=True).exists():
-                break
-            notification = Notification.objects.create(
-                type=Notification.POST_CREATED_BY_A_USER_FOLLOWED,
-                post=post,
-            )
-            user_notification = NotificationUser.objects.create(
-                notification=notification,
-                user=user_following.from_user
-            )
-
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "user-%s" % user_following.from_user.id, {
-                    "type": "send.notification",
-                    "event": "POST_CREATED_BY_A_USER_FOLLOWED",
-                    "notification__pk": str(user_notification.pk),
-                }
-            )
+        # Notify the followers in background once the post is committed
+        post_id = str(post.id)
+        transaction.on_commit(lambda: fan_out_post_created_notifications.delay(post_id))
 
         return post
 
@@ -176,6 +161,8 @@ class RetrieveCollaborateRoomModelSerializer(serializers.ModelSerializer):
     members = serializers.SerializerMethodField(read_only=True)
     kanban = serializers.SerializerMethodField(read_only=True)
     is_last_message_seen = serializers.SerializerMethodField(read_only=True)
+    shared_notes = serializers.SerializerMethodField(read_only=True)
+    strokes = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         """Meta class."""
@@ -200,6 +187,8 @@ class RetrieveCollaborateRoomModelSerializer(serializers.ModelSerializer):
             "draft_solution",
             "karma_winner",
             "drawing",
+            "drawing_revision",
+            "strokes",
             "created",
         )
 
@@ -215,13 +204,18 @@ class RetrieveCollaborateRoomModelSerializer(serializers.ModelSerializer):
         members = PostMember.objects.filter(post=obj.id)
         return PostMemberModelSerializer(members, many=True).data
 
+    def get_shared_notes(self, obj):
+        return notes.read(obj)
+
+    def get_strokes(self, obj):
+        return drawings.get_strokes(obj)
+
     def get_is_last_message_seen(self, obj):
         if "request" in self.context and self.context["request"].user.id:
 
             user = self.context["request"].user
-            return NotificationUser.objects.filter(
-                notification__post=obj, notification__type=Notification.POST_MESSAGES, is_read=False,
-                user=user).exists()
+            # True while there are unread messages, as the frontend expects
+            return watermarks.has_unread(obj, user.id)
         return None
 
 
@@ -229,14 +223,10 @@ class ClearPostChatNotificationSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         user = self.context['request'].user
+        watermarks.mark_read(instance, user.id)
         notifications = NotificationUser.objects.filter(
             notification__post=instance, notification__type=Notification.POST_MESSAGES, is_read=False, user=user)
-
-        for notification in notifications:
-            notification.is_read = True
-            notification.save()
-
-        user.save()
+        counters.decrement([user.id], counters.NOTIFICATIONS, notifications.update(is_read=True))
 
         return instance
 
@@ -252,7 +242,7 @@ class UpdatePostSharedNotesSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         instance.shared_notes = validated_data['shared_notes']
-        instance.save()
+        notes.write(instance.id, instance.shared_notes)
 
         return instance
 
@@ -268,8 +258,8 @@ class UpdatePostSolutionSerializer(serializers.Serializer):
 
 
 class UpdateKanbanListOrderSerializer(serializers.Serializer):
-    droppable_index_start = serializers.IntegerField()
-    droppable_index_end = serializers.IntegerField()
+    droppable_index_start = serializers.IntegerField(min_value=0)
+    droppable_index_end = serializers.IntegerField(min_value=0)
 
     def validate(self, data):
         post = self.instance
@@ -280,23 +270,16 @@ class UpdateKanbanListOrderSerializer(serializers.Serializer):
     def update(self, instance, validated_data):
         droppable_index_start = validated_data['droppable_index_start']
         droppable_index_end = validated_data['droppable_index_end']
-        kanban_lists = KanbanList.objects.filter(post=instance)
-        kanban_list_start = kanban_lists.get(order=droppable_index_start)
-        kanban_list_start.order = droppable_index_end
-
-        kanban_list_end = kanban_lists.get(order=droppable_index_end)
-        kanban_list_end.order = droppable_index_start
-
-        kanban_list_start.save()
-        kanban_list_end.save()
+        if kanbans.move_list(instance.id, droppable_index_start, droppable_index_end) is None:
+            raise serializers.ValidationError("The list does not exist")
 
         return instance
 
 
 class UpdateKanbanCardOrderSerializer(serializers.Serializer):
     list_id = serializers.UUIDField()
-    droppable_index_start = serializers.IntegerField()
-    droppable_index_end = serializers.IntegerField()
+    droppable_index_start = serializers.IntegerField(min_value=0)
+    droppable_index_end = serializers.IntegerField(min_value=0)
 
     def validate(self, data):
         post = self.instance
@@ -308,15 +291,8 @@ class UpdateKanbanCardOrderSerializer(serializers.Serializer):
         list_id = validated_data['list_id']
         droppable_index_start = validated_data['droppable_index_start']
         droppable_index_end = validated_data['droppable_index_end']
-        kanban_cards = KanbanCard.objects.filter(kanban_list__id=list_id)
-        kanban_card_start = kanban_cards.get(order=droppable_index_start)
-        kanban_card_start.order = droppable_index_end
-
-        kanban_card_end = kanban_cards.get(order=droppable_index_end)
-        kanban_card_end.order = droppable_index_start
-
-        kanban_card_start.save()
-        kanban_card_end.save()
+        if kanbans.move_card(instance.id, list_id, list_id, droppable_index_start, droppable_index_end) is None:
+            raise serializers.ValidationError("The card does not exist")
 
         return instance
 
@@ -324,8 +300,8 @@ class UpdateKanbanCardOrderSerializer(serializers.Serializer):
 class UpdateKanbanCardOrderBetweenListsSerializer(serializers.Serializer):
     list_start_id = serializers.UUIDField()
     list_end_id = serializers.UUIDField()
-    droppable_index_start = serializers.IntegerField()
-    droppable_index_end = serializers.IntegerField()
+    droppable_index_start = serializers.IntegerField(min_value=0)
+    droppable_index_end = serializers.IntegerField(min_value=0)
 
     def validate(self, data):
         post = self.instance
@@ -339,28 +315,9 @@ class UpdateKanbanCardOrderBetweenListsSerializer(serializers.Serializer):
         list_end_id = validated_data['list_end_id']
         droppable_index_start = validated_data['droppable_index_start']
         droppable_index_end = validated_data['droppable_index_end']
-
-        kanban_cards_start = KanbanCard.objects.filter(kanban_list__id=list_start_id)
-
-        kanban_card_start = kanban_cards_start.get(order=droppable_index_start)
-        # Substract 1 order starting on droppable_index_start next
-        for card in kanban_cards_start:
-
-            if card.order > droppable_index_start:
-                card.order = card.order - 1
-                card.save()
-
-        kanban_cards_end = KanbanCard.objects.filter(kanban_list__id=list_end_id)
-
-        # Add 1 order starting on droppable_index_end
-        for card in kanban_cards_end:
-
-            if card.order >= droppable_index_end:
-                card.order = card.order + 1
-                card.save()
-        kanban_card_start.kanban_list = get_object_or_404(KanbanList, id=list_end_id)
-        kanban_card_start.order = droppable_index_end
-        kanban_card_start.save()
+        if kanbans.move_card(
+                instance.id, list_start_id, list_end_id, droppable_index_start, droppable_index_end) is None:
+            raise serializers.ValidationError("The card does not exist")
 
         return instance
 
@@ -384,26 +341,44 @@ class UpdatePostWinnerKarmaSerializer(serializers.Serializer):
 
 
 class UpdatePostDrawingSerializer(serializers.Serializer):
-    drawing = serializers.CharField()
+    """Append a stroke to the post whiteboard."""
+    TOOLS = ("pen", "eraser", "clear")
+
+    revision = serializers.IntegerField(read_only=True)
+    tool = serializers.ChoiceField(choices=TOOLS, required=False)
+    points = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2),
+        max_length=5000,
+        required=False
+    )
+    color = serializers.CharField(
+        required=False,
+        validators=[RegexValidator(regex=r'^#[0-9a-fA-F]{6}$', message="Color must be a hex color")]
+    )
+    width = serializers.IntegerField(min_value=1, max_value=200, required=False)
 
     def validate(self, data):
         post = self.instance
-        if post.status == Post.SOLVED:
+        if post is not None and post.status == Post.SOLVED:
             raise serializers.ValidationError("This post has already been finalized")
-        return data
+        tool = data.get('tool', "pen")
+        if tool == "clear":
+            return {'tool': tool}
+        if not data.get('points'):
+            raise serializers.ValidationError("The stroke has no points")
+        return {
+            'tool': tool,
+            'points': data['points'],
+            'color': data.get('color', "#000000"),
+            'width': data.get('width', 2),
+        }
 
     def update(self, instance, validated_data):
-        drawing = validated_data.get('drawing')
-        format, imgstr = drawing.split(';base64,')
-
-        ext = format.split('/')[-1]
-
-        # You can save this as file instance.
-        data = ContentFile(base64.b64decode(imgstr), name=str(instance.id)+"." + ext)
-        instance.drawing = data
-        instance.save()
+        stroke = drawings.append(instance.id, self.context['request'].user.id, validated_data)
+        if stroke is None:
+            raise serializers.ValidationError("This post has already been finalized")
 
-        return instance
+        return stroke
 
 
 class ClearPostDrawingSerializer(serializers.Serializer):
@@ -414,10 +389,7 @@ class ClearPostDrawingSerializer(serializers.Serializer):
         return data
 
     def update(self, instance, validated_data):
-
-        # You can save this as file instance.
-        instance.drawing = None
-        instance.save()
+        drawings.append(instance.id, self.context['request'].user.id, {'tool': "clear"})
 
         return instance
 
@@ -439,6 +411,10 @@ class FinalizePostSerializer(serializers.Serializer):
         post = instance
         admin = post.user
 
+        # Store the buffered shared notes, the post is saved below
+        notes.flush(post.id)
+        post.shared_notes = notes.read(post)
+
         # Save the draft_solution to post
         post.solution = post.draft_solution
 
@@ -498,15 +474,14 @@ class FinalizePostSerializer(serializers.Serializer):
                 user=user
             )
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
+            realtime.dispatch(
                 "user-%s" % user.id, {
                     "type": "send.notification",
                     "event": "POST_FINALIZED",
                     "notification__pk": str(user_notification.pk),
                 }
             )
-            if not user.is_online and user.email_notifications_allowed:
+            if user.email_notifications_allowed and not presence.is_online(user.id):
                 send_post_finalized(admin, user, post)
             user.save()
 
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+# Models
+from api.users.models import User, Follow
+from api.posts.models import Post, PostMember, PostImage
+from api.posts.models.posts import get_search_vector
+
+# Tasks
+from api.taskapp.tasks import push_timeline_post
+
+# Utils
+from api.posts import timelines, caches
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        # Fanned out once the post is committed, out of the request
+        post_id = instance.id
+        transaction.on_commit(lambda: push_timeline_post.delay(post_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostMember)
+@receiver(post_delete, sender=PostMember)
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+def bump_feed_version(sender, instance, **kwargs):
+    # Bumped before the commit, a reader could cache the old rows under the new version
+    transaction.on_commit(caches.bump_feed_version)
+
+
+@receiver(post_save, sender=User)
+def index_author_posts(sender, instance, created, **kwargs):
+    # The posts keep matching the old name until their vectors are refreshed
+    author = instance.get_search_author()
+    if not created and author != instance._indexed_author:
+        Post.objects.filter(user=instance).update(search_vector=get_search_vector(author))
+    instance._indexed_author = author
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def drop_follower_timeline(sender, instance, **kwargs):
+    timelines.drop_timeline(instance.from_user_id)
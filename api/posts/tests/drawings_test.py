@@ -0,0 +1,90 @@
+# Django
+from django.test import TestCase, override_settings
+
+# Models
+from api.users.models import User
+from api.posts.models import Post, PostStroke
+
+# Utils
+from api.posts import drawings
+from api.taskapp.tasks import delete_drawing
+from PIL import Image
+from unittest import mock
+import tempfile
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DrawingsTestCase(TestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.post = Post.objects.create(user=self.user, title="Post")
+
+    def append(self, x):
+        return drawings.append(self.post.id, self.user.id, {
+            "tool": "pen",
+            "points": [[x, 10], [x, 20]],
+            "color": "#ff0000",
+            "width": 4,
+        })
+
+    def test_append_strokes(self):
+        """Strokes should be numbered in order without storing the drawing"""
+        self.assertEqual([self.append(x)["revision"] for x in (10, 20, 30)], [1, 2, 3])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.strokes_count, 3)
+        self.assertFalse(self.post.drawing)
+        self.assertEqual([stroke["points"][0][0] for stroke in drawings.get_strokes(self.post)], [10, 20, 30])
+
+    def test_finalized_post(self):
+        """Finalized posts should not accept strokes"""
+        Post.objects.filter(id=self.post.id).update(status=Post.SOLVED)
+        self.assertIsNone(self.append(10))
+
+    def test_rasterize(self):
+        """The snapshot should include the strokes, joiners replay the later ones"""
+        self.append(10)
+        self.append(20)
+        self.assertTrue(drawings.rasterize(self.post.id))
+        self.append(30)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.drawing_revision, 2)
+        self.assertEqual(PostStroke.objects.filter(post=self.post).count(), 1)
+        self.assertEqual([stroke["revision"] for stroke in drawings.get_strokes(self.post)], [3])
+        with self.post.drawing.open() as drawing:
+            image = Image.open(drawing).convert("RGBA")
+        self.assertEqual(image.getpixel((10, 15)), (255, 0, 0, 255))
+        self.assertEqual(image.getpixel((30, 15)), (0, 0, 0, 0))
+
+    def test_rasterize_replaces_snapshot(self):
+        """A new snapshot should be stored apart and the previous one deleted later"""
+        self.append(10)
+        drawings.rasterize(self.post.id)
+        self.post.refresh_from_db()
+        previous = self.post.drawing.name
+
+        self.append(20)
+        with mock.patch.object(drawings, "schedule_delete") as schedule_delete:
+            drawings.rasterize(self.post.id)
+        self.post.refresh_from_db()
+        storage = self.post.drawing.storage
+        self.assertNotEqual(self.post.drawing.name, previous)
+        self.assertTrue(storage.exists(self.post.drawing.name))
+
+        # Joiners that received the previous URL can still load it
+        schedule_delete.assert_called_once_with(previous)
+        self.assertTrue(storage.exists(previous))
+        delete_drawing(previous)
+        self.assertFalse(storage.exists(previous))
+
+    def test_clear(self):
+        """A clear stroke should blank the snapshot"""
+        self.append(10)
+        drawings.append(self.post.id, self.user.id, {"tool": "clear"})
+        drawings.rasterize(self.post.id)
+
+        self.post.refresh_from_db()
+        with self.post.drawing.open() as drawing:
+            image = Image.open(drawing).convert("RGBA")
+        self.assertEqual(image.getpixel((10, 15)), (0, 0, 0, 0))
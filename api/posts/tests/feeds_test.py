@@ -0,0 +1,104 @@
+# Django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Django REST Framework
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User
+from api.posts.models import Post, PostImage, PostMember, CollaborateRequest
+
+# Utils
+
+
+class SetupPostsInitialData(APITestCase):
+    def setUp(self):
+
+        self.author = User.objects.create(
+            username="alex",
+            email="alex@gmail.com",
+            first_name="Alex",
+            last_name="Hernandez",
+        )
+        self.member = User.objects.create(
+            username="ivan",
+            email="ivan@gmail.com",
+            first_name="Ivan",
+            last_name="Herms",
+        )
+
+        for index in range(12):
+            post = Post.objects.create(user=self.author, title="Post %s" % index, members_count=2)
+            PostMember.objects.create(post=post, user=self.author, role=PostMember.ADMIN)
+            PostMember.objects.create(post=post, user=self.member)
+            PostImage.objects.create(post=post, name="image.png", image="posts/images/image.png", size=1)
+            CollaborateRequest.objects.create(post=post, user=self.member, reason="")
+
+    def count_queries(self, url, limit):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"limit": limit})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), limit)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.assertEqual(self.count_queries(url, 3), self.count_queries(url, 12))
+
+
+class PostFeedsQueriesAPITestCase(SetupPostsInitialData):
+
+    def test_list_queries(self):
+        """Posts feed should not query per post"""
+        self.assertConstantQueries("/api/posts/")
+
+    def test_list_most_karma_posts_queries(self):
+        """Most karma posts feed should not query per post"""
+        self.assertConstantQueries("/api/posts/list_most_karma_posts/")
+
+    def test_list_user_posts_queries(self):
+        """User posts feed should not query per post"""
+        self.assertConstantQueries("/api/posts/%s/list_user_posts/" % self.author.id)
+
+    def test_list_user_created_queries(self):
+        """User created posts feed should not query per post"""
+        self.assertConstantQueries("/api/posts/%s/list_user_created/" % self.author.id)
+
+    def test_list_user_collaborated_queries(self):
+        """User collaborated posts feed should not query per post"""
+        self.assertConstantQueries("/api/posts/%s/list_user_collaborated/" % self.member.id)
+
+    def test_is_collaborate_requested(self):
+        """Collaborate requested flag should come from the batch loader"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get("/api/posts/")
+        self.assertTrue(all(post['is_collaborate_requested'] for post in response.data['results']))
+
+
+class AuthenticatedPostFeedsQueriesAPITestCase(SetupPostsInitialData):
+
+    def test_list_queries(self):
+        """Posts feed should not query the viewer relationships per post"""
+        self.client.force_authenticate(user=self.member)
+        self.assertConstantQueries("/api/posts/")
+
+    def test_list_my_posts_queries(self):
+        """My posts feed should not query per post"""
+        self.client.force_authenticate(user=self.author)
+        self.assertConstantQueries("/api/posts/list_my_posts/")
+
+    def test_list_my_active_posts_queries(self):
+        """My active posts feed should not query per post"""
+        self.client.force_authenticate(user=self.author)
+        self.assertConstantQueries("/api/posts/list_my_active_posts/")
+
+    def test_list_collaborated_posts_queries(self):
+        """Collaborated posts feed should not query per post"""
+        self.client.force_authenticate(user=self.member)
+        self.assertConstantQueries("/api/posts/list_collaborated_posts/")
+
+    def test_list_collaborated_active_posts_queries(self):
+        """Collaborated active posts feed should not query per post"""
+        self.client.force_authenticate(user=self.member)
+        self.assertConstantQueries("/api/posts/list_collaborated_active_posts/")
@@ -0,0 +1,86 @@
+# Django
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+# Models
+from api.users.models import User
+from api.posts.models import Post, KanbanList, KanbanCard
+
+# Utils
+from api.posts import kanbans
+import random
+
+
+class KanbanRanksTestCase(TestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.post = Post.objects.create(user=self.user, title="Post")
+        self.todo = kanbans.create_list(self.post, title="To do")
+        self.done = kanbans.create_list(self.post, title="Done")
+        for title in ("a", "b", "c", "d"):
+            kanbans.create_card(self.todo, title=title)
+
+    def titles(self, kanban_list):
+        return list(KanbanCard.objects.filter(kanban_list=kanban_list).values_list("title", flat=True))
+
+    def test_between(self):
+        """Keys made between random neighbours should keep the keys sorted"""
+        random.seed(0)
+        keys = kanbans.spread(10)
+        for _ in range(1000):
+            position = random.randint(0, len(keys))
+            keys.insert(position, kanbans.between(
+                keys[position - 1] if position else None,
+                keys[position] if position < len(keys) else None,
+            ))
+        self.assertEqual(keys, sorted(set(keys)))
+        self.assertFalse([key for key in keys if key.endswith("0")])
+
+    def test_append_keeps_keys_short(self):
+        """Appending and prepending should not make the keys longer"""
+        keys = [kanbans.between(None, None)]
+        for _ in range(1000):
+            keys.append(kanbans.between(keys[-1], None))
+            keys.insert(0, kanbans.between(None, keys[0]))
+        self.assertEqual(keys, sorted(keys))
+        self.assertLessEqual(max(len(key) for key in keys), kanbans.RANK_WIDTH)
+
+    def test_move_card(self):
+        """Moving a card should write its row only"""
+        with CaptureQueriesContext(connection) as queries:
+            kanbans.move_card(self.post.id, self.todo.id, self.todo.id, 0, 2)
+        self.assertEqual(self.titles(self.todo), ["b", "c", "a", "d"])
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("UPDATE")]), 1)
+
+        kanbans.move_card(self.post.id, self.todo.id, self.done.id, 3, 0)
+        kanbans.move_card(self.post.id, self.todo.id, self.done.id, 0, 1)
+        self.assertEqual(self.titles(self.todo), ["c", "a"])
+        self.assertEqual(self.titles(self.done), ["d", "b"])
+
+    def test_move_to_missing_position(self):
+        """Moving from an empty position or to a list of another post should do nothing"""
+        other = kanbans.create_list(Post.objects.create(user=self.user, title="Other"), title="Other")
+        self.assertIsNone(kanbans.move_card(self.post.id, self.todo.id, self.todo.id, 10, 0))
+        self.assertIsNone(kanbans.move_card(self.post.id, self.todo.id, other.id, 0, 0))
+        self.assertEqual(self.titles(self.todo), ["a", "b", "c", "d"])
+
+    def test_move_list(self):
+        """Moving a list should reorder the board"""
+        kanbans.move_list(self.post.id, 1, 0)
+        self.assertEqual(list(KanbanList.objects.filter(post=self.post).values_list("title", flat=True)),
+                         ["Done", "To do"])
+
+    def test_rebalance(self):
+        """The rebalance should shorten the keys and keep the order"""
+        for _ in range(100):
+            kanbans.move_card(self.post.id, self.todo.id, self.todo.id, 3, 1)
+        ranks = KanbanCard.objects.filter(kanban_list=self.todo).values_list("rank", flat=True)
+        self.assertGreater(max(len(rank) for rank in ranks), kanbans.RANK_REBALANCE_LENGTH)
+        titles = self.titles(self.todo)
+
+        kanbans.rebalance(KanbanList.__name__, self.todo.id)
+        ranks = KanbanCard.objects.filter(kanban_list=self.todo).values_list("rank", flat=True)
+        self.assertLessEqual(max(len(rank) for rank in ranks), kanbans.RANK_WIDTH)
+        self.assertEqual(self.titles(self.todo), titles)
@@ -0,0 +1,54 @@
+# Django
+from django.contrib.gis.geos import Point
+from django.db import connection
+from unittest import skipUnless
+
+# Django REST Framework
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User
+from api.posts.models import Post
+
+
+@skipUnless(connection.vendor == 'postgresql', "The nearest posts are ordered by PostGIS")
+class NearestPostsAPITestCase(APITestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com", geolocation=Point(-99.13, 19.43))
+        self.author = User.objects.create(username="ivan", email="ivan@gmail.com")
+
+        # About 111 km per degree of latitude
+        for title, latitude in (("Far", 20.33), ("Near", 19.44), ("Middle", 19.48)):
+            Post.objects.create(user=self.author, title=title, members_count=1, location=Point(-99.13, latitude))
+        Post.objects.create(user=self.author, title="Full", members_count=6, location=Point(-99.13, 19.43))
+        Post.objects.create(user=self.author, title="Unknown", members_count=1)
+        Post.objects.create(user=self.user, title="Own", members_count=1, location=Point(-99.13, 19.43))
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, **params):
+        response = self.client.get("/api/posts/list_nearest_posts/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["title"] for post in response.data["results"]]
+
+    def test_ordered_by_distance(self):
+        """The nearest posts of the other users should come first"""
+        self.assertEqual(self.get(), ["Near", "Middle", "Far"])
+
+    def test_radius(self):
+        """Only the posts within the radius in km should be listed"""
+        self.assertEqual(self.get(radius=10), ["Near", "Middle"])
+        self.assertEqual(self.get(radius=2), ["Near"])
+
+    def test_max_results(self):
+        """The nearest posts should be bounded by max_results"""
+        self.assertEqual(self.get(max_results=2), ["Near", "Middle"])
+        self.assertEqual(self.get(max_results=0.5), ["Near"])
+
+    def test_invalid_params(self):
+        """Params that are not finite positive numbers should be rejected"""
+        for name in ("radius", "max_results"):
+            for value in ("nan", "inf", "-inf", "-1", "0", "abc"):
+                response = self.client.get("/api/posts/list_nearest_posts/", {name: value})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (name, value))
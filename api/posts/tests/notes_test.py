@@ -0,0 +1,203 @@
+# Django
+from django.test import SimpleTestCase, TestCase
+
+# Channels
+from asgiref.sync import async_to_sync
+
+# Models
+from api.users.models import User
+from api.posts.models import Post
+
+# Consumers
+from api.notifications.consumers import UserConsumer
+
+# Utils
+from api.posts import notes
+from api.utils.testing import FakeRedis
+from unittest import mock
+
+
+class SharedNotesOpsTestCase(SimpleTestCase):
+    def converge(self, text, first, second):
+        """Apply two concurrent ops in both orders, return both results"""
+        one = notes.transform(second, first)
+        two = notes.transform(first, second)
+        first_then_second = notes.apply(notes.apply(text, first), one) if one else notes.apply(text, first)
+        second_then_first = notes.apply(notes.apply(text, second), two) if two else notes.apply(text, second)
+        return first_then_second, second_then_first
+
+    def test_apply(self):
+        """Ops should insert and delete at their position"""
+        self.assertEqual(notes.apply("hello", {"position": 5, "insert": " world"}), "hello world")
+        self.assertEqual(notes.apply("hello world", {"position": 5, "delete": 6}), "hello")
+        self.assertEqual(notes.apply("hello", {"position": 50, "insert": "!"}), "hello!")
+
+    def test_concurrent_inserts(self):
+        """The first applied insert should go first on equal positions"""
+        result, _ = self.converge("ac", {"position": 1, "insert": "b"}, {"position": 1, "insert": "x"})
+        self.assertEqual(result, "abxc")
+
+    def test_concurrent_ops_converge(self):
+        """Concurrent ops should give the same text in both orders"""
+        text = "the quick brown fox"
+        ops = [
+            {"position": 4, "insert": "very "},
+            {"position": 4, "delete": 6},
+            {"position": 8, "delete": 8},
+            {"position": 10, "insert": "red "},
+            {"position": 0, "delete": 19},
+        ]
+        for first in ops:
+            for second in ops:
+                # Equal inserts positions are ordered by the server
+                if first is not second and not ("insert" in first and "insert" in second):
+                    first_then_second, second_then_first = self.converge(text, first, second)
+                    self.assertEqual(first_then_second, second_then_first, (first, second))
+
+    def test_equal_positions(self):
+        """Concurrent ops at the same position should be transformed by the table"""
+        insert, other_insert = {"position": 2, "insert": "xy"}, {"position": 2, "insert": "z"}
+        delete, long_delete = {"position": 2, "delete": 2}, {"position": 2, "delete": 3}
+        cases = [
+            (other_insert, insert, {"position": 4, "insert": "z"}),
+            (delete, insert, {"position": 4, "delete": 2}),
+            (insert, delete, insert),
+            (delete, delete, None),
+            (long_delete, delete, {"position": 2, "delete": 1}),
+            (delete, long_delete, None),
+        ]
+        for op, applied, transformed in cases:
+            self.assertEqual(notes.transform(op, applied), transformed, (op, applied))
+            if "insert" not in op or "insert" not in applied:
+                first_then_second, second_then_first = self.converge("abcdef", applied, op)
+                self.assertEqual(first_then_second, second_then_first, (op, applied))
+
+    def test_utf16_positions(self):
+        """Positions should count the characters out of the BMP as two units"""
+        self.assertEqual(notes.apply("a😀b", {"position": 3, "insert": "c"}), "a😀cb")
+        self.assertEqual(notes.apply("a😀b", {"position": 1, "delete": 2}), "ab")
+        self.assertEqual(
+            notes.transform({"position": 1, "insert": "c"}, {"position": 0, "insert": "😀"}),
+            {"position": 3, "insert": "c"},
+        )
+        # Positions between the halves of a pair do not split it
+        self.assertEqual(notes.apply("a😀b", {"position": 2, "insert": "c"}), "ac😀b")
+        self.assertFalse(notes.is_valid_op({"position": 0, "insert": "\ud83d"}))
+
+    def test_overlapping_deletes(self):
+        """Text deleted by both ops should only be deleted once"""
+        self.assertEqual(
+            notes.transform({"position": 2, "delete": 4}, {"position": 4, "delete": 4}),
+            {"position": 2, "delete": 2},
+        )
+        self.assertIsNone(notes.transform({"position": 4, "delete": 2}, {"position": 2, "delete": 6}))
+
+    def test_invalid_ops(self):
+        """Malformed ops should be rejected"""
+        self.assertTrue(notes.is_valid_op({"position": 0, "insert": "a"}))
+        self.assertFalse(notes.is_valid_op({"position": -1, "insert": "a"}))
+        self.assertFalse(notes.is_valid_op({"position": 0, "delete": 0}))
+        self.assertFalse(notes.is_valid_op({"position": "0", "insert": "a"}))
+
+
+class SharedNotesConsumerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.consumer = UserConsumer()
+        self.consumer.user_id = "1"
+        self.consumer.channel_name = "channel"
+        self.consumer.channel_layer = mock.Mock()
+        self.sent = []
+        self.group_sent = []
+
+        async def send_json(content, close=False):
+            self.sent.append(content)
+
+        async def group_send(group, message):
+            self.group_sent.append(message)
+
+        self.consumer.send_json = send_json
+        self.consumer.channel_layer.group_send = group_send
+
+    def apply(self, applied):
+        op = {"position": 4, "insert": "x"}
+        with mock.patch.object(notes, "apply_op", return_value=applied), \
+                mock.patch.object(notes, "get_text", return_value={"text": "abc", "revision": 5}):
+            async_to_sync(self.consumer.apply_notes_op)("post-1", "1", {"revision": 3, "op": op})
+
+    def test_applied_op_is_acked(self):
+        """The editor should get an ack and the peers the op"""
+        self.apply(({"position": 4, "insert": "x"}, 4))
+        self.assertEqual([message["event"] for message in self.sent], ["NOTES_ACK"])
+        self.assertEqual(self.sent[0]["data"], {"revision": 4})
+        self.assertEqual([message["event"] for message in self.group_sent], ["NOTES_OP"])
+
+    def test_dropped_op_is_rejected(self):
+        """An op with nothing left should be rejected with the current text"""
+        self.apply((None, 5))
+        self.assertEqual([message["event"] for message in self.sent], ["NOTES_REJECT"])
+        self.assertEqual(self.sent[0]["data"], {"text": "abc", "revision": 5})
+        self.assertEqual(self.group_sent, [])
+
+
+class SharedNotesBufferTestCase(TestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.post = Post.objects.create(user=self.user, title="Post", shared_notes="stored")
+        self.post_id = str(self.post.id)
+        self.connection = FakeRedis()
+        patch = mock.patch.object(notes, "get_connection", return_value=self.connection)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def get_stored(self):
+        return Post.objects.get(id=self.post.id).shared_notes
+
+    def is_dirty(self):
+        return self.post_id.encode() in self.connection.smembers(notes.SHARED_NOTES_DIRTY_KEY)
+
+    def test_read_prefers_buffer(self):
+        """Reads should return the buffered notes before they are stored"""
+        self.assertEqual(notes.read(self.post), "stored")
+        notes.write(self.post_id, "buffered")
+        self.assertEqual(notes.read(self.post), "buffered")
+        self.assertEqual(self.get_stored(), "stored")
+
+    def test_flush_stores_once(self):
+        """A flush should store the notes once and clear the dirty post"""
+        notes.write(self.post_id, "buffered")
+        self.assertTrue(self.is_dirty())
+        with self.assertNumQueries(1):
+            self.assertEqual(notes.flush_dirty(), 1)
+        self.assertEqual(self.get_stored(), "buffered")
+        self.assertFalse(self.is_dirty())
+
+        with self.assertNumQueries(0):
+            self.assertFalse(notes.flush(self.post_id))
+            self.assertEqual(notes.flush_dirty(), 0)
+
+    def test_flush_raced_by_write(self):
+        """Notes written while flushing should keep the post dirty"""
+        notes.write(self.post_id, "buffered")
+        filter = Post.objects.filter
+
+        def write_meanwhile(*args, **kwargs):
+            notes.write(self.post_id, "newer")
+            return filter(*args, **kwargs)
+
+        with mock.patch.object(Post.objects, "filter", side_effect=write_meanwhile):
+            notes.flush(self.post_id)
+        self.assertTrue(self.is_dirty())
+
+        notes.flush_dirty()
+        self.assertEqual(self.get_stored(), "newer")
+        self.assertFalse(self.is_dirty())
+
+    def test_write_through_without_redis(self):
+        """Without Redis the notes should be stored directly"""
+        with mock.patch.object(notes, "get_connection", return_value=None):
+            self.assertIsNone(notes.write(self.post_id, "written"))
+            self.assertEqual(self.get_stored(), "written")
+            self.assertFalse(notes.flush(self.post_id))
+            self.assertEqual(notes.flush_dirty(), 0)
+            self.assertEqual(notes.read(Post.objects.get(id=self.post.id)), "written")
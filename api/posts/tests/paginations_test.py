@@ -0,0 +1,76 @@
+# Django
+from django.core.cache import cache
+from django.utils import timezone
+
+# Django REST Framework
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User
+from api.posts.models import Post
+
+# Utils
+from datetime import timedelta
+import base64
+import json
+
+
+class PostFeedKeysetAPITestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        now = timezone.now()
+        for index in range(5):
+            post = Post.objects.create(user=self.user, title="Post %s" % index, members_count=1)
+            Post.objects.filter(id=post.id).update(created=now + timedelta(minutes=index))
+
+    def get(self, url, data=None):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def titles(self, data):
+        return [post["title"] for post in data["results"]]
+
+    def test_first_page(self):
+        """An empty cursor should start from the top of the feed without counting"""
+        data = self.get("/api/posts/", {"after": "", "limit": 2})
+        self.assertEqual(self.titles(data), ["Post 4", "Post 3"])
+        self.assertNotIn("count", data)
+        self.assertIsNotNone(data["next"])
+        self.assertIsNone(data["previous"])
+
+    def test_next_and_previous(self):
+        """Following the next links should walk the feed and previous should come back"""
+        first = self.get("/api/posts/", {"after": "", "limit": 2})
+        second = self.get(first["next"])
+        third = self.get(second["next"])
+        self.assertEqual(self.titles(second), ["Post 2", "Post 1"])
+        self.assertEqual(self.titles(third), ["Post 0"])
+        self.assertIsNone(third["next"])
+
+        self.assertEqual(self.titles(self.get(third["previous"])), ["Post 2", "Post 1"])
+        self.assertEqual(self.titles(self.get(second["previous"])), ["Post 4", "Post 3"])
+
+    def test_tie_on_created(self):
+        """Posts created at the same time should be paged by id without gaps"""
+        Post.objects.update(created=timezone.now())
+        titles = []
+        data = self.get("/api/posts/", {"after": "", "limit": 2})
+        while True:
+            titles += self.titles(data)
+            if not data["next"]:
+                break
+            data = self.get(data["next"])
+        self.assertEqual(sorted(titles), ["Post %s" % index for index in range(5)])
+
+    def test_invalid_cursor(self):
+        """Malformed cursors should be not found"""
+        for values in ("not a cursor", ["abc", "x"], ["abc"], [None, None], {"created": 1}):
+            cursor = values if isinstance(values, str) else (
+                base64.urlsafe_b64encode(json.dumps(values).encode()).decode())
+            for param in ("after", "before"):
+                response = self.client.get("/api/posts/", {param: cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, (param, values))
@@ -0,0 +1,46 @@
+# Django
+from django.core.cache import cache
+from django.db import connection
+from unittest import skipUnless
+
+# Django REST Framework
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User
+from api.posts.models import Post
+
+
+@skipUnless(connection.vendor == 'postgresql', "Full text search needs PostgreSQL")
+class PostSearchAPITestCase(APITestCase):
+    def setUp(self):
+        # The feed version is only bumped on commit
+        cache.clear()
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com", first_name="Alex")
+
+    def search(self, terms):
+        response = self.client.get("/api/posts/", {"search": terms})
+        return [post["title"] for post in response.data["results"]]
+
+    def test_created_post_is_found(self):
+        """A new post should be searchable without being edited"""
+        Post.objects.create(user=self.user, title="Django channels question")
+        self.assertEqual(self.search("channels"), ["Django channels question"])
+
+    def test_edited_post_is_found(self):
+        """Editing the indexed fields should update the search vector"""
+        post = Post.objects.create(user=self.user, title="Django question")
+        post.title = "Celery question"
+        post.save()
+        self.assertEqual(self.search("celery"), ["Celery question"])
+        self.assertEqual(self.search("django"), [])
+
+    def test_renamed_author_is_found(self):
+        """Renaming the author should update the search vectors of their posts"""
+        Post.objects.create(user=self.user, title="Django question")
+        self.user.username = "sasha"
+        self.user.first_name = "Sasha"
+        self.user.save()
+        self.assertEqual(self.search("sasha"), ["Django question"])
+        self.assertEqual(self.search("alex"), [])
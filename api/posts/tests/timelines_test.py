@@ -0,0 +1,99 @@
+# Django
+from django.test import TestCase
+from django.utils import timezone
+
+# Models
+from api.users.models import User, Follow
+from api.posts.models import Post
+
+# Utils
+from api.posts import timelines
+from api.utils.testing import FakeRedis
+from datetime import timedelta
+from unittest import mock
+
+
+def push(connection, keys, args):
+    """The timelines push script"""
+    key, (id, score, length, timeout) = keys[0], args
+    if connection.exists(key):
+        connection.zadd(key, {id: score})
+        connection.zremrangebyrank(key, 1, -int(length) - 1)
+
+
+class TimelinesTestCase(TestCase):
+    def setUp(self):
+
+        self.follower = User.objects.create(username="alex", email="alex@gmail.com")
+        self.author = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.famous_author = User.objects.create(username="maria", email="maria@gmail.com",
+                                                 followed_count=timelines.TIMELINE_FANOUT_LIMIT + 1)
+        self.connection = FakeRedis(scripts={timelines.PUSH_SCRIPT: push})
+        self.now = timezone.now()
+        patch = mock.patch.object(timelines, "get_connection", return_value=self.connection)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        Follow.objects.create(from_user=self.follower, followed_user=self.author)
+        Follow.objects.create(from_user=self.follower, followed_user=self.famous_author)
+
+    def create_post(self, user, minutes, members_count=1):
+        post = Post.objects.create(user=user, title="Post %s" % minutes, members_count=members_count)
+        Post.objects.filter(id=post.id).update(created=self.now + timedelta(minutes=minutes))
+        return Post.objects.get(id=post.id)
+
+    def read(self, offset=0, limit=10):
+        posts, count = timelines.read_timeline(self.follower, offset, limit)
+        return [post.title for post in posts], count
+
+    def test_build_timeline(self):
+        """Built timelines should only hold the listed posts"""
+        self.create_post(self.author, 1)
+        self.create_post(self.author, 2, members_count=6)
+        self.create_post(self.author, 3)
+        self.assertEqual(self.read(), (["Post 3", "Post 1"], 2))
+        self.assertEqual(self.read(0, 1), (["Post 3"], 2))
+        self.assertEqual(self.read(1, 1), (["Post 1"], 2))
+
+    def test_empty_timeline_is_built_once(self):
+        """A timeline without posts should not be built on every read"""
+        with mock.patch.object(timelines, "build_timeline", wraps=timelines.build_timeline) as build_timeline:
+            self.assertEqual(self.read(), ([], 0))
+            self.assertEqual(self.read(), ([], 0))
+        self.assertEqual(build_timeline.call_count, 1)
+
+    def test_push_post(self):
+        """New posts should be added to the built timelines only"""
+        other_follower = User.objects.create(username="john", email="john@gmail.com")
+        Follow.objects.create(from_user=other_follower, followed_user=self.author)
+        self.create_post(self.author, 1)
+        self.read()
+
+        timelines.push_post(self.create_post(self.author, 2).id)
+        timelines.push_post(self.create_post(self.author, 3, members_count=6).id)
+        self.assertEqual(self.read(), (["Post 2", "Post 1"], 2))
+        self.assertFalse(self.connection.exists(timelines.get_timeline_key(other_follower.id)))
+
+    def test_push_trims_timeline(self):
+        """Pushed posts should trim the oldest posts and keep the timeline built"""
+        self.read()
+        with mock.patch.object(timelines, "TIMELINE_LENGTH", 2):
+            for minutes in range(3):
+                timelines.push_post(self.create_post(self.author, minutes).id)
+        self.assertEqual(self.read(), (["Post 2", "Post 1"], 2))
+
+    def test_merge_pulled_posts(self):
+        """The posts of the authors not fanned out should be merged by creation"""
+        for minutes in range(4):
+            self.create_post(self.author if minutes % 2 else self.famous_author, minutes)
+        self.create_post(self.famous_author, 4, members_count=6)
+        self.assertEqual(self.read(0, 3), (["Post 3", "Post 2", "Post 1"], 4))
+        self.assertEqual(self.read(3, 3), (["Post 0"], 4))
+
+    def test_merge_pushed_pulled_posts(self):
+        """Posts pushed before the author passed the limit should be listed once"""
+        post = self.create_post(self.famous_author, 1)
+        self.create_post(self.author, 2)
+        self.read()
+        self.connection.zadd(timelines.get_timeline_key(self.follower.id), {str(post.id): post.created.timestamp()})
+        self.assertEqual(self.read(), (["Post 2", "Post 1"], 2))
@@ -0,0 +1,90 @@
+# Django
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from unittest import skipUnless
+
+# Django REST Framework
+from rest_framework.test import APITestCase
+
+# Models
+from api.users.models import User
+from api.posts.models import Post, PostMember, PostMessage
+
+# Utils
+from api.posts import watermarks
+
+
+class PostWatermarksTestCase(APITestCase):
+    def setUp(self):
+
+        self.owner = User.objects.create(username="alex", email="alex@gmail.com")
+        self.member = User.objects.create(username="ivan", email="ivan@gmail.com")
+        self.post = Post.objects.create(user=self.owner, title="Post", members_count=2)
+        PostMember.objects.create(post=self.post, user=self.owner, role=PostMember.ADMIN)
+        PostMember.objects.create(post=self.post, user=self.member)
+
+    def send_message(self, sent_by, text):
+        message = PostMessage.objects.create(post=self.post, sent_by=sent_by, text=text)
+        Post.objects.filter(id=self.post.id).update(last_message=message)
+        self.post.refresh_from_db()
+        return message
+
+    def get_member(self, user):
+        return PostMember.objects.get(post=self.post, user=user)
+
+    def test_retrieve_collaborate_room_marks_read(self):
+        """Opening the room should move the read watermark to the last message"""
+        message = self.send_message(self.owner, "Hello")
+        self.client.force_authenticate(user=self.member)
+        self.client.get("/api/posts/%s/retrieve_collaborate_room/" % self.post.id)
+
+        member = self.get_member(self.member)
+        self.assertEqual(member.last_read_message, message)
+        self.assertEqual(member.last_read_at, message.created)
+
+    def test_unread_count(self):
+        """Only the messages of the other members after the watermark should be unread"""
+        self.send_message(self.owner, "Hello")
+        self.send_message(self.owner, "Are you there?")
+        self.send_message(self.member, "Yes")
+        self.assertEqual(watermarks.get_unread_count(self.post, self.member.id), 2)
+        self.assertEqual(watermarks.get_unread_count(self.post, self.owner.id), 1)
+
+        self.assertTrue(watermarks.has_unread(self.post, self.member.id))
+
+        watermarks.mark_read(self.post, self.member.id)
+        self.assertEqual(watermarks.get_unread_count(self.post, self.member.id), 0)
+        self.assertFalse(watermarks.has_unread(self.post, self.member.id))
+        self.send_message(self.owner, "Great")
+        self.assertEqual(watermarks.get_unread_count(self.post, self.member.id), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', "The migration copies the rows with UPDATE ... FROM")
+class PostSeenByMigrationTestCase(TransactionTestCase):
+    migrate_from = [('posts', '0014_postmessage_history_idx')]
+    migrate_to = [('posts', '0015_postmember_read_watermark')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_seen_by_rows_become_watermarks(self):
+        """The seen by rows should be copied to the members watermarks"""
+        apps = self.migrate(self.migrate_from)
+        user = apps.get_model('users', 'User').objects.create(username="alex", email="alex@gmail.com")
+        post = apps.get_model('posts', 'Post').objects.create(user=user, title="Post")
+        member = apps.get_model('posts', 'PostMember').objects.create(post=post, user=user)
+        message = apps.get_model('posts', 'PostMessage').objects.create(post=post, sent_by=user, text="Hello")
+        apps.get_model('posts', 'PostSeenBy').objects.create(post=post, user=user, message=message)
+
+        apps = self.migrate(self.migrate_to)
+        member = apps.get_model('posts', 'PostMember').objects.get(id=member.id)
+        self.assertEqual(member.last_read_message_id, message.id)
+        self.assertEqual(member.last_read_at, message.created)
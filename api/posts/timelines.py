@@ -0,0 +1,152 @@
+"""Followed users posts timelines.
+
+Each user timeline is a Redis sorted set of post ids scored by the post
+creation time. Posts are pushed to the followers timelines when they are
+created (fan-out on write) and the timelines are trimmed to TIMELINE_LENGTH.
+Authors with more than TIMELINE_FANOUT_LIMIT followers are not fanned out,
+their posts are pulled from the database on read and merged.
+
+Built timelines hold a TIMELINE_BUILT member scored below every post, so a
+user without posts to read does not build the timeline again on every read.
+"""
+
+# Django
+from django_redis import get_redis_connection
+
+# Models
+from api.users.models import Follow
+from api.posts.models import Post
+
+
+TIMELINE_LENGTH = 800
+
+TIMELINE_FANOUT_LIMIT = 5000
+
+TIMELINE_TIMEOUT = 60 * 60 * 24 * 7
+
+TIMELINE_BUILT = "built"
+
+# Only add to built timelines, a key expiring meanwhile must not come back
+# holding the post alone and without expiration. The trim keeps the built
+# member, the lowest ranked.
+PUSH_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('zadd', KEYS[1], ARGV[2], ARGV[1])
+    redis.call('zremrangebyrank', KEYS[1], 1, -tonumber(ARGV[3]) - 1)
+    redis.call('expire', KEYS[1], ARGV[4])
+end
+"""
+
+
+def get_connection():
+    """Return the Redis connection or None if the cache is not Redis."""
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
+
+
+def get_timeline_key(user_id):
+    return "timeline-%s" % user_id
+
+
+def get_posts():
+    """Return the posts listed in the timelines, full posts are not listed."""
+    return Post.objects.filter(members_count__lte=5)
+
+
+def push_post(post_id):
+    """Add the post to the already built timelines of the author followers."""
+    connection = get_connection()
+    if connection is None:
+        return
+
+    post = get_posts().filter(id=post_id).select_related('user').first()
+    if post is None or post.user.followed_count > TIMELINE_FANOUT_LIMIT:
+        return
+
+    keys = [
+        get_timeline_key(follower_id) for follower_id in
+        Follow.objects.filter(followed_user=post.user_id).order_by().values_list('from_user', flat=True)
+    ]
+    if not keys:
+        return
+
+    # Not built timelines are built from the database on read
+    push = connection.register_script(PUSH_SCRIPT)
+    pipeline = connection.pipeline(transaction=False)
+    for key in keys:
+        push(keys=[key], args=[str(post.id), post.created.timestamp(), TIMELINE_LENGTH, TIMELINE_TIMEOUT],
+             client=pipeline)
+    pipeline.execute()
+
+
+def drop_timeline(user_id):
+    """Remove the user timeline so it is built again on the next read."""
+    connection = get_connection()
+    if connection is not None:
+        connection.delete(get_timeline_key(user_id))
+
+
+def build_timeline(user, connection):
+    posts = get_posts().filter(
+        user__in=Follow.objects.filter(
+            from_user=user, followed_user__followed_count__lte=TIMELINE_FANOUT_LIMIT).values('followed_user')
+    ).order_by('-created').values_list('id', 'created')[:TIMELINE_LENGTH]
+
+    mapping = {str(id): created.timestamp() for id, created in posts}
+    mapping[TIMELINE_BUILT] = 0
+    key = get_timeline_key(user.id)
+    pipeline = connection.pipeline()
+    pipeline.zadd(key, mapping)
+    pipeline.expire(key, TIMELINE_TIMEOUT)
+    pipeline.execute()
+
+
+def read_timeline(user, offset, limit):
+    """Return a page of the user timeline and the timeline length.
+
+    Return None when Redis is not available so the caller can fall back
+    to query the followed users posts.
+    """
+    connection = get_connection()
+    if connection is None:
+        return None
+
+    key = get_timeline_key(user.id)
+    end = offset + limit - 1
+    pipeline = connection.pipeline(transaction=False)
+    pipeline.exists(key)
+    pipeline.zrevrange(key, 0, end, withscores=True)
+    pipeline.zcard(key)
+    pipeline.expire(key, TIMELINE_TIMEOUT)
+    exists, entries, count, _ = pipeline.execute()
+
+    if not exists:
+        build_timeline(user, connection)
+        entries = connection.zrevrange(key, 0, end, withscores=True)
+        count = connection.zcard(key)
+
+    # The built member ranks last, it is not a post
+    entries = [(id.decode(), score) for id, score in entries if id != TIMELINE_BUILT.encode()]
+    count -= 1
+
+    # Pull the posts of the authors that are not fanned out
+    pulled_posts = get_posts().filter(
+        user__in=Follow.objects.filter(
+            from_user=user, followed_user__followed_count__gt=TIMELINE_FANOUT_LIMIT).values('followed_user')
+    ).order_by('-created')
+    pulled_entries = [(str(id), created.timestamp())
+                      for id, created in pulled_posts.values_list('id', 'created')[:end + 1]]
+    if pulled_entries:
+        # Posts fanned out before the author passed the limit are in both
+        timeline_ids = {id for id, score in entries}
+        duplicates = len([id for id, score in pulled_entries if id in timeline_ids])
+        pulled_entries = [(id, score) for id, score in pulled_entries if id not in timeline_ids]
+        entries = sorted(entries + pulled_entries, key=lambda entry: entry[1], reverse=True)
+        count += pulled_posts.count() - duplicates
+
+    ids = [id for id, score in entries[offset:end + 1]]
+    # Posts filled after they were pushed are not listed
+    posts = {str(post.id): post for post in get_posts().filter(id__in=ids).select_related('user')}
+    return [posts[id] for id in ids if id in posts], count
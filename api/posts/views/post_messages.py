@@ -39,6 +39,7 @@ from api.posts.serializers import (
 # Utils
 
 from api.utils.mixins import AddPostMixin
+from api.utils.paginations import MessageHistoryPagination
 import os
 from api.utils import helpers
 from asgiref.sync import sync_to_async
@@ -58,6 +59,7 @@ class PostMessageViewSet(
     queryset = PostMessage.objects.all()
     lookup_field = "id"
     serializer_class = PostMessageModelSerializer
+    pagination_class = MessageHistoryPagination
 
     def get_permissions(self):
         """Assign permissions based on action."""
@@ -85,4 +87,5 @@ class PostMessageViewSet(
 
     def get_queryset(self):
 
-        return PostMessage.objects.filter(post=self.post_object)
+        return PostMessage.objects.filter(post=self.post_object).select_related('sent_by').prefetch_related(
+            'postmessagefile_set')
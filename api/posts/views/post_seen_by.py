@@ -26,7 +26,7 @@ from api.users.permissions import IsAccountOwner
 
 # Models
 from api.users.models import User
-from api.posts.models import PostSeenBy, PostSeenBy
+from api.posts.models import PostMember
 
 # Serializers
 from api.users.serializers import UserModelSerializer
@@ -39,7 +39,7 @@ from api.posts.serializers import (
 
 # Utils
 
-from api.utils.mixins import AddChatMixin
+from api.utils.mixins import AddPostMixin
 import os
 from api.utils import helpers
 
@@ -47,12 +47,11 @@ from api.utils import helpers
 class PostSeenByViewSet(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
-    mixins.DestroyModelMixin,
-    AddChatMixin,
+    AddPostMixin,
 ):
-    """PostSeenBy view set."""
+    """Read watermarks view set."""
 
-    queryset = PostSeenBy.objects.all()
+    queryset = PostMember.objects.all()
     lookup_field = "id"
     serializer_class = PostSeenByModelSerializer
 
@@ -76,9 +75,9 @@ class PostSeenByViewSet(
             "request": self.request,
             "format": self.format_kwarg,
             "view": self,
-            "chat": self.chat,
+            "post": self.post_object,
         }
 
     def get_queryset(self):
 
-        return PostSeenBy.objects.filter(chat=self.chat)
+        return PostMember.objects.filter(post=self.post_object).exclude(last_read_at=None)
@@ -5,9 +5,11 @@ from django.http.response import HttpResponse
 from rest_framework import status, viewsets, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from django.db.models import Q
 from django.contrib.gis.db.models.functions import GeometryDistance
+from django.contrib.gis.measure import D
 
 # Permissions
 from rest_framework.permissions import IsAuthenticated
@@ -20,7 +22,6 @@ from api.users.models import Follow, User
 # Serializers
 from api.posts.serializers import (
     PostModelSerializer,
-    CreatePostSeenBySerializer,
     ClearPostChatNotificationSerializer,
     RetrieveCollaborateRoomModelSerializer,
     UpdatePostSharedNotesSerializer,
@@ -36,9 +37,20 @@ from api.posts.serializers import (
 )
 
 # Filters
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from api.posts.filters import PostFilter
+from api.posts.filters import PostFilter, PostSearchFilter
+
+# Loaders
+from api.posts.loaders import PostBatchLoader
+from api.posts import timelines, caches
+
+# Utils
+from api.utils.paginations import KeysetPagination
+import math
+
+
+NEAREST_POSTS_LIMIT = 500
 
 
 class PostViewSet(
@@ -57,16 +69,9 @@ class PostViewSet(
     queryset = Post.objects.all()
     lookup_field = "id"
     serializer_class = PostModelSerializer
-    filter_backends = (SearchFilter, DjangoFilterBackend, OrderingFilter)
+    filter_backends = (PostSearchFilter, DjangoFilterBackend, OrderingFilter)
     filter_class = PostFilter
-    search_fields = (
-        "title",
-        "text",
-        "user__username",
-        "user__email",
-        "user__first_name",
-        "user__last_name",
-    )
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         """Assign permissions based on action."""
@@ -87,6 +92,23 @@ class PostViewSet(
             return RetrieveCollaborateRoomModelSerializer
         return PostModelSerializer
 
+    def get_keyset_ordering(self):
+        """Return the composite key the feed is ordered by."""
+        if self.action == "list_nearest_posts":
+            # Ordered by distance, keep limit/offset
+            return None
+        if self.action == "list_most_karma_posts":
+            return ('-karma_offered', '-id')
+        return ('-created', '-id')
+
+    def get_serializer(self, *args, **kwargs):
+        """Batch load the related rows when serializing a page of posts."""
+        if kwargs.get('many') and args and self.get_serializer_class() == PostModelSerializer:
+            context = self.get_serializer_context()
+            context['post_loader'] = PostBatchLoader(args[0], self.request.user)
+            kwargs['context'] = context
+        return super(PostViewSet, self).get_serializer(*args, **kwargs)
+
     def get_queryset(self):
         """Restrict list to public-only."""
         queryset = Post.objects.all()
@@ -111,9 +133,19 @@ class PostViewSet(
             if self.request.user.id and self.request.user.id:
                 user = self.request.user
                 if user.geolocation:
-
-                    queryset = queryset.filter(members_count__lte=5).exclude(user=user.id).annotate(
-                        distance=GeometryDistance("user__geolocation", user.geolocation)).order_by('distance')
+                    queryset = queryset.filter(members_count__lte=5, location__isnull=False).exclude(user=user.id)
+
+                    radius = self.get_float_param('radius')
+                    if radius:
+                        # Index backed bounding prefilter in degrees, then the exact distance
+                        degrees = radius / (111.32 * max(math.cos(math.radians(user.geolocation.y)), 0.01))
+                        queryset = queryset.filter(
+                            location__dwithin=(user.geolocation, degrees),
+                            location__distance_lte=(user.geolocation, D(km=radius)))
+
+                    # GeometryDistance is the <-> operator, ordered by the location GiST index
+                    queryset = queryset.annotate(
+                        distance=GeometryDistance("location", user.geolocation)).order_by('distance')
                 else:
                     queryset = Post.objects.none()
             else:
@@ -155,10 +187,37 @@ class PostViewSet(
             user = get_object_or_404(User, id=self.kwargs['id'])
             queryset = Post.objects.filter(members=user).exclude(user=user)
 
-        return queryset
+        return queryset.select_related('user')
+
+    def get_float_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValidationError({name: "A valid number is required."})
+        if not math.isfinite(value):
+            # float() accepts nan and inf
+            raise ValidationError({name: "A valid number is required."})
+        if value <= 0:
+            raise ValidationError({name: "Ensure this value is greater than 0."})
+        return value
+
+    def list(self, request, *args, **kwargs):
+        if request.user.id:
+            return super(PostViewSet, self).list(request, *args, **kwargs)
+        return caches.get_cached_feed_response(
+            self.action, request, lambda: super(PostViewSet, self).list(request, *args, **kwargs))
 
     @action(detail=False, methods=['get'])
     def list_most_karma_posts(self, request, *args, **kwargs):
+        if request.user.id:
+            return self.get_most_karma_posts_response(request)
+        return caches.get_cached_feed_response(
+            self.action, request, lambda: self.get_most_karma_posts_response(request))
+
+    def get_most_karma_posts_response(self, request):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -170,6 +229,22 @@ class PostViewSet(
 
     @action(detail=False, methods=['get'])
     def list_followed_users_posts(self, request, *args, **kwargs):
+        # Read the precomputed timeline unless the feed is filtered
+        if request.user.id and not set(request.query_params) - {'limit', 'offset'}:
+            paginator = self.paginator
+            limit = paginator.get_limit(request)
+            offset = paginator.get_offset(request)
+            timeline = timelines.read_timeline(request.user, offset, limit)
+            if timeline is not None:
+                posts, count = timeline
+                paginator.keyset = False
+                paginator.request = request
+                paginator.limit = limit
+                paginator.offset = offset
+                paginator.count = count
+                serializer = self.get_serializer(posts, many=True)
+                return paginator.get_paginated_response(serializer.data)
+
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -182,6 +257,10 @@ class PostViewSet(
     @action(detail=False, methods=['get'])
     def list_nearest_posts(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+
+        # Bound the nearest posts so deep pages never walk the whole table
+        max_results = max(int(min(self.get_float_param('max_results') or NEAREST_POSTS_LIMIT, NEAREST_POSTS_LIMIT)), 1)
+        queryset = queryset[:max_results]
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -292,15 +371,7 @@ class PostViewSet(
     @action(detail=True, methods=['get'])
     def retrieve_collaborate_room(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Create seen by
-        createSeenSerializer = CreatePostSeenBySerializer(
-            data={}, context={"request": request, "post": instance}
-        )
-        is_valid = createSeenSerializer.is_valid(raise_exception=False)
-        if is_valid:
-            createSeenSerializer.save()
-
-        # Clear post notifications
+        # Mark the messages as read and clear post notifications
         clearChatNotification = ClearPostChatNotificationSerializer(
             instance,
             data={},
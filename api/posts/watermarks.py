@@ -0,0 +1,40 @@
+"""Collaborate rooms read watermarks.
+
+The member row of a post holds the last message the member has read and
+its time. The unread messages are the messages of the other members after
+the watermark, looked up over the (post, created, id) index.
+"""
+
+# Django
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Models
+from api.posts.models import PostMember, PostMessage
+
+
+def mark_read(post, user_id):
+    """Move the member read watermark to the post last message."""
+    if not post.last_message_id:
+        return 0
+    return PostMember.objects.filter(post=post.id, user=user_id).exclude(
+        last_read_message=post.last_message_id).update(
+        last_read_message=post.last_message_id,
+        last_read_at=Subquery(PostMessage.objects.filter(id=post.last_message_id).values('created')[:1]),
+    )
+
+
+def get_unread(post, user_id):
+    # Everything since joining the room is unread until the first read
+    since = PostMember.objects.filter(post=post.id, user=user_id).annotate(
+        since=Coalesce('last_read_at', 'created')).values('since')[:1]
+    return PostMessage.objects.filter(post=post.id, created__gt=Subquery(since)).exclude(sent_by=user_id)
+
+
+def get_unread_count(post, user_id):
+    return get_unread(post, user_id).count()
+
+
+def has_unread(post, user_id):
+    """Return if the member has unread messages, stopping at the first one."""
+    return get_unread(post, user_id).exists()
@@ -29,6 +29,22 @@ app.conf.beat_schedule = {
         'task': 'do_backup',
         'schedule': timedelta(days=1),
     },
+    'reconcile_unread_counters': {
+        'task': 'reconcile_unread_counters',
+        'schedule': timedelta(minutes=15),
+    },
+    'flush_shared_notes': {
+        'task': 'flush_shared_notes',
+        'schedule': timedelta(seconds=10),
+    },
+    'sync_presence': {
+        'task': 'sync_presence',
+        'schedule': timedelta(minutes=5),
+    },
+    'send_outbox_emails': {
+        'task': 'send_outbox_emails',
+        'schedule': timedelta(minutes=1),
+    },
 }
 
 app.conf.timezone = 'UTC'
@@ -7,16 +7,25 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.module_loading import import_string
 from django.core import management
+from django.db import transaction
+from django.db.models import Q, Exists, OuterRef
 
 # Models
-from api.users.models import User, Earning
+from api.users.models import User, Earning, Follow, Connection
+from api.posts.models import Post
 from rest_framework.authtoken.models import Token
-from api.notifications.models import NotificationUser, notifications
+from api.notifications.models import Notification, NotificationUser, notifications
 from djmoney.money import Money
 
 # Celery
 from celery.decorators import task
 
+# Realtime
+from api.notifications.realtime import dispatch_many
+from api.notifications import counters, digests, outbox
+from api.users import presence
+from api.posts import drawings, kanbans, notes, timelines
+
 # Utilities
 import jwt
 import time
@@ -27,224 +36,149 @@ import re
 
 @task(name='send_feedback_email', max_retries=3)
 def send_feedback_email(data):
-    """Send account verification link to given user."""
-
-    subject = 'Feedback from'.format(
-        data['email'])
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/feedback_email.html',
-        {'data': data}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, ["ah30456@gmail.com"])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send the feedback to the team."""
+    outbox.enqueue('feedback', ["ah30456@gmail.com"], data=dict(data.items()))
 
 
 @task(name='send_confirmation_email', max_retries=3)
 def send_confirmation_email(user):
     """Send account verification link to given user."""
-
-    verification_token = helpers.gen_verification_token(user)
-    subject = 'Welcome @{}! Verify your account to start using Talendy'.format(
-        user.username)
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/account_verification.html',
-        {'token': verification_token, 'user': user}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [user.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    outbox.enqueue('account_verification', [user], user=user)
 
 
 @task(name='send_change_email_email', max_retries=3)
 def send_change_email_email(user, new_email):
-    """Send account verification link to given user."""
-
-    verification_token = helpers.gen_new_email_token(user, new_email)
-    subject = 'Welcome @{}! Change your email'.format(
-        user.username)
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/change_email.html',
-        {'token': verification_token, 'user': user}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [user.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send change email link to given user."""
+    outbox.enqueue('change_email', [user], user=user, new_email=new_email)
 
 
 @task(name='send_reset_password', max_retries=3)
 def send_reset_password_email(user_email):
-    """Send account verification link to given user."""
+    """Send reset password link to given user."""
     user = User.objects.get(email=user_email)
-    verification_token = helpers.gen_verification_token(user)
-
-    subject = 'Reset your password'
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/reset_password.html',
-        {'token': verification_token, 'user': user}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [user.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    outbox.enqueue('reset_password', [user], user=user)
 
 
 @task(name='send_invitation_email', max_retries=3)
 def send_invitation_email(user, to_user):
-    """Send account verification link to given user."""
-
-    subject = 'Welcome! @{} has invited you '.format(
-        user.username)
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/connect_invitation.html',
-        {'user': user}
-
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [to_user.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send connect invitation to given user."""
+    outbox.enqueue('connect_invitation', [to_user], user=user)
 
 
 @task(name='send_post_to_followers', max_retries=3)
 def send_post_to_followers(user, to_user, post):
-    """Send account verification link to given user."""
-
-    subject = '@{} has just created new post'.format(
-        user.username)
-    from_email = 'Talendy <no-reply@talendy.com>'
-
-    content = render_to_string(
-        'emails/users/new_post.html',
-        {'user': user, 'post': post}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [to_user.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
-
-
-@task(name='send_have_messages_from_email', max_retries=3)
-def send_have_messages_from_email(sent_to, sent_by):
-    """Check if the free trial has ended and turn off"""
+    """Send new post of a followed user."""
+    outbox.enqueue('new_post', [to_user], user=user, post=post)
 
-    subject = 'New messages from @{}'.format(
-        sent_by.username)
 
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/new_messages.html',
-        {'user': sent_by}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
-
-
-@task(name='send_have_collaborate_room_messages_from_email', max_retries=3)
-def send_have_collaborate_room_messages_from_email(sent_to, sent_by, post):
-    """Check if the free trial has ended and turn off"""
-
-    subject = 'New collaborate room messages from @{}'.format(
-        sent_by.username)
-
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/new_room_messages.html',
-        {'user': sent_by, 'post': post}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+@task(name='send_message_digest', max_retries=3)
+def send_message_digest(user_id):
+    """Send the unseen messages digest of the user."""
+    return digests.send_digest(user_id)
 
 
 @task(name='send_connection_accepted', max_retries=3)
 def send_connection_accepted(user, sent_to):
-    """Check if the free trial has ended and turn off"""
-
-    subject = '@{} is your new connection'.format(
-        user.username)
-
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/connection_accepted.html',
-        {'user': user}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send connection accepted to given user."""
+    outbox.enqueue('connection_accepted', [sent_to], user=user)
 
 
 @task(name='send_collaborate_request', max_retries=3)
 def send_collaborate_request(user, sent_to):
-    """Check if the free trial has ended and turn off"""
-
-    subject = 'New collaborate request from @{}'.format(
-        user.username)
-
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/collaborate_request.html',
-        {'user': user}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send new collaborate request to given user."""
+    outbox.enqueue('collaborate_request', [sent_to], user=user)
 
 
 @task(name='send_collaborate_request_accepted', max_retries=3)
 def send_collaborate_request_accepted(post, sent_to):
-    """Check if the free trial has ended and turn off"""
-
-    subject = 'Collaborate request accepted by @{}'.format(
-        post.user.username)
-
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/collaborate_request_accepted.html',
-        {'post': post}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send collaborate request accepted to given user."""
+    outbox.enqueue('collaborate_request_accepted', [sent_to], post=post)
 
 
 @task(name='send_post_finalized', max_retries=3)
 def send_post_finalized(user, sent_to, post):
-    """Check if the free trial has ended and turn off"""
-
-    subject = '@{} has finalized the post'.format(
-        user.username)
-
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/post_finalized.html',
-        {'user': user, 'post': post}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send post finalized to given user."""
+    outbox.enqueue('post_finalized', [sent_to], user=user, post=post)
 
 
 @task(name='send_new_donation', max_retries=3)
 def send_new_donation(user, sent_to, is_anonymous):
-    """Check if the free trial has ended and turn off"""
-
-    if is_anonymous:
-        subject = 'You recieved new donation from anonymous user'
-    else:
-        subject = 'You recieved new donation from @{}'.format(
-            user.username)
-    from_email = 'Talendy <no-reply@talendy.com>'
-    content = render_to_string(
-        'emails/users/new_donation.html',
-        {'user': user, 'is_anonymous': is_anonymous}
-    )
-    msg = EmailMultiAlternatives(subject, content, from_email, [sent_to.email])
-    msg.attach_alternative(content, "text/html")
-    msg.send()
+    """Send new donation to given user."""
+    outbox.enqueue('new_donation', [sent_to], user=user, is_anonymous=is_anonymous)
+
+
+@task(name='send_outbox_emails', max_retries=3)
+def send_outbox_emails():
+    """Deliver the due emails of the outbox."""
+    return outbox.drain()
+
+
+@task(name='fan_out_post_created_notifications', bind=True, max_retries=3)
+def fan_out_post_created_notifications(self, post_id, batch_size=500):
+    """Notify the author followers that a new post has been created.
+
+    The followers already notified are skipped, so the task can be retried
+    or run again without duplicating notifications.
+    """
+    try:
+        post = Post.objects.filter(id=post_id).first()
+        if not post:
+            return 0
+
+        followers = Follow.objects.filter(followed_user=post.user_id)
+        if post.privacity == Post.CONNECTIONS_ONLY:
+            # Resolve the privacity of every follower in the same query
+            connections = Connection.objects.filter(
+                Q(requester=post.user_id, addressee=OuterRef('from_user')) |
+                Q(requester=OuterRef('from_user'), addressee=post.user_id),
+                accepted=True)
+            followers = followers.annotate(is_connection=Exists(connections)).filter(is_connection=True)
+        follower_ids = list(followers.order_by().values_list('from_user', flat=True))
+
+        notified = 0
+        for start in range(0, len(follower_ids), batch_size):
+            with transaction.atomic():
+                user_ids = follower_ids[start:start + batch_size]
+                already_notified = set(NotificationUser.objects.filter(
+                    user__in=user_ids, notification__post=post,
+                    notification__type=Notification.POST_CREATED_BY_A_USER_FOLLOWED,
+                ).values_list('user_id', flat=True))
+                user_ids = [user_id for user_id in user_ids if user_id not in already_notified]
+                if not user_ids:
+                    continue
+
+                notifications = Notification.objects.bulk_create([
+                    Notification(type=Notification.POST_CREATED_BY_A_USER_FOLLOWED, post=post)
+                    for user_id in user_ids
+                ])
+                user_notifications = NotificationUser.objects.bulk_create([
+                    NotificationUser(notification=notification, user_id=user_id)
+                    for notification, user_id in zip(notifications, user_ids)
+                ])
+
+                # bulk_create does not send post_save, count them once the batch is committed
+                transaction.on_commit(
+                    lambda user_ids=user_ids: counters.increment(user_ids, counters.NOTIFICATIONS))
+
+                dispatch_many(
+                    ("user-%s" % user_notification.user_id, {
+                        "type": "send.notification",
+                        "event": "POST_CREATED_BY_A_USER_FOLLOWED",
+                        "notification__pk": str(user_notification.pk),
+                    }) for user_notification in user_notifications
+                )
+                notified += len(user_ids)
+        return notified
+    except Exception as exc:
+        # The batches already stored are skipped by the retry
+        raise self.retry(exc=exc, countdown=60)
+
+
+@task(name='push_timeline_post', max_retries=3)
+def push_timeline_post(post_id):
+    """Add a new post to the timelines of the author followers."""
+    timelines.push_post(post_id)
+
 
 # MESSAGES = 'ME'
 # NEW_INVITATION = 'NI'
@@ -292,3 +226,43 @@ def check_if_pending_clearance_has_ended():
 def do_backup():
     management.call_command('dbbackup', '-z')
     print('Backup completed')
+
+
+@task(name='flush_shared_notes', max_retries=3)
+def flush_shared_notes():
+    """Store the buffered shared notes of the collaborate rooms."""
+    return notes.flush_dirty()
+
+
+@task(name='snapshot_drawing', max_retries=3)
+def snapshot_drawing(post_id, force=False):
+    """Rasterize the whiteboard strokes of the collaborate room."""
+    return drawings.snapshot(post_id, force)
+
+
+@task(name='delete_drawing', max_retries=3)
+def delete_drawing(name):
+    """Delete a replaced whiteboard snapshot file."""
+    drawings.delete(name)
+
+
+@task(name='rebalance_kanban', max_retries=3)
+def rebalance_kanban(model_name, id):
+    """Spread the rank keys of the kanban lists of a post or the cards of a list."""
+    return kanbans.rebalance(model_name, id)
+
+
+@task(name='sync_presence', max_retries=3)
+def sync_presence():
+    """Set offline the users left online by crashed workers."""
+    return presence.sync_presence()
+
+
+@task(name='reconcile_unread_counters', max_retries=3)
+def reconcile_unread_counters(batch_size=1000):
+    """Correct the cached unread counters against the notifications."""
+    user_ids = list(User.objects.order_by().values_list('id', flat=True))
+    corrected = 0
+    for start in range(0, len(user_ids), batch_size):
+        corrected += counters.reconcile(user_ids[start:start + batch_size])
+    return corrected
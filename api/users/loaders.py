@@ -0,0 +1,51 @@
+"""Users batch loaders."""
+
+# Django
+from django.db.models import Q
+
+# Models
+from api.users.models import Follow, Connection
+
+
+class SocialGraphLoader:
+    """Viewer social graph snapshot.
+
+    Load the users followed by the viewer and its accepted, sent and
+    received connections at once, so UserModelSerializer can answer
+    the relationship flags of every rendered user from memory.
+    """
+
+    def __init__(self, user):
+        self.followed = set(Follow.objects.filter(from_user=user).values_list('followed_user', flat=True))
+
+        self.connections = set()
+        self.invitations_sent = set()
+        self.invitations_received = set()
+        connections = Connection.objects.filter(
+            Q(requester=user) | Q(addressee=user)).values_list('requester', 'addressee', 'accepted')
+        for requester, addressee, accepted in connections:
+            if accepted:
+                self.connections.add(addressee if requester == user.id else requester)
+            elif requester == user.id:
+                self.invitations_sent.add(addressee)
+            else:
+                self.invitations_received.add(requester)
+
+    @classmethod
+    def for_request(cls, request):
+        """Return the request social graph, loading it on first use."""
+        if not hasattr(request, '_social_graph'):
+            request._social_graph = cls(request.user)
+        return request._social_graph
+
+    def is_followed(self, user):
+        return user.id in self.followed
+
+    def is_connection(self, user):
+        return user.id in self.connections
+
+    def is_invitation_sent(self, user):
+        return user.id in self.invitations_sent
+
+    def is_invitation_received(self, user):
+        return user.id in self.invitations_received
@@ -0,0 +1,42 @@
+"""Websockets authentication middleware."""
+
+# Django
+from django.contrib.auth.models import AnonymousUser
+
+# Channels
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+
+# Models
+from rest_framework.authtoken.models import Token
+
+# Utils
+from urllib.parse import parse_qs
+
+
+@database_sync_to_async
+def get_token_user(key):
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return AnonymousUser()
+    return token.user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticate the socket with the API token.
+
+    The token is read from the `token` query string param or the `token`
+    cookie, the session user is kept when there is none.
+    """
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        key = query.get("token", [None])[0] or scope.get("cookies", {}).get("token")
+        if key:
+            scope = dict(scope, user=await get_token_user(key))
+        return await super().__call__(scope, receive, send)
+
+
+def TokenAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(TokenAuthMiddleware(inner))
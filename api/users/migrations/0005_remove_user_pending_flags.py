@@ -0,0 +1,21 @@
+# Generated by Django 3.0.3 on 2021-06-02 10:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20210531_1557'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='pending_messages',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='pending_notifications',
+        ),
+    ]
@@ -106,10 +106,6 @@ class User(CModel, AbstractUser):
 
     collaborated_solved_posts_count = models.IntegerField(default=0)
 
-    pending_notifications = models.BooleanField(default=False)
-
-    pending_messages = models.BooleanField(default=False)
-
     karma_amount = models.IntegerField(default=1000)
 
     reputation = models.FloatField(
@@ -154,10 +150,19 @@ class User(CModel, AbstractUser):
 
     is_online = models.BooleanField(default=False)
 
+    def __init__(self, *args, **kwargs):
+        super(User, self).__init__(*args, **kwargs)
+        # The posts search vectors include the author name
+        self._indexed_author = self.get_search_author()
+
     def __str__(self):
         """Return username."""
         return '{} {}'.format(self.first_name, self.last_name)
 
+    def get_search_author(self):
+        # Read from __dict__ so deferred fields are not loaded
+        return ' '.join(self.__dict__.get(field) or '' for field in ('username', 'first_name', 'last_name'))
+
     def save(self, **kwargs):
         try:
             this = User.objects.get(id=self.id)
@@ -0,0 +1,137 @@
+"""Users presence.
+
+Every open socket of a user is a member of the user presence sorted set,
+scored by the time its heartbeat expires. A user is online while any of its
+connections has not expired, so several tabs count as one user and the
+connections of a crashed worker expire by themselves. The User.is_online
+flag is only written when a user goes online or offline. The writers lock
+the user row and read the connections once they hold it, so a disconnect
+racing a reconnect on another worker can not leave a stale flag, and
+sync_presence corrects the flags left behind by crashed workers.
+
+When the cache is not Redis the flag is used as the presence.
+"""
+
+# Django
+from django.db import transaction
+from django_redis import get_redis_connection
+
+# Models
+from api.users.models import User
+
+# Utils
+import time
+
+
+PRESENCE_TTL = 60
+
+# Seconds between the heartbeats of an open connection
+PRESENCE_HEARTBEAT = PRESENCE_TTL // 3
+
+
+def get_connection():
+    """Return the Redis connection or None if the cache is not Redis."""
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
+
+
+def get_presence_key(user_id):
+    return "presence-%s" % user_id
+
+
+def touch(connection, user_id, connection_id):
+    """Renew the connection heartbeat, return the user open connections."""
+    key = get_presence_key(user_id)
+    now = time.time()
+    pipeline = connection.pipeline()
+    pipeline.zremrangebyscore(key, '-inf', now)
+    pipeline.zadd(key, {connection_id: now + PRESENCE_TTL})
+    pipeline.expire(key, PRESENCE_TTL)
+    pipeline.zcard(key)
+    return pipeline.execute()[-1]
+
+
+def set_flags(user_ids):
+    """Write the online flags of the users from their connections, return how many changed."""
+    with transaction.atomic():
+        # The last writer of a flag reads the latest connections
+        flags = dict(User.objects.select_for_update().filter(id__in=user_ids).order_by('id').values_list(
+            'id', 'is_online'))
+        online = are_online(flags)
+        went_online = [user_id for user_id, is_online in flags.items() if online[user_id] and not is_online]
+        went_offline = [user_id for user_id, is_online in flags.items() if not online[user_id] and is_online]
+        if went_online:
+            User.objects.filter(id__in=went_online).update(is_online=True)
+        if went_offline:
+            User.objects.filter(id__in=went_offline).update(is_online=False)
+    return len(went_online) + len(went_offline)
+
+
+def connect(user_id, connection_id):
+    """Add the connection to the user presence."""
+    connection = get_connection()
+    if connection is None:
+        User.objects.filter(id=user_id, is_online=False).update(is_online=True)
+    elif touch(connection, user_id, connection_id) == 1:
+        set_flags([user_id])
+
+
+def heartbeat(user_id, connection_id):
+    connection = get_connection()
+    if connection is not None:
+        touch(connection, user_id, connection_id)
+
+
+def disconnect(user_id, connection_id):
+    """Remove the connection from the user presence."""
+    connection = get_connection()
+    if connection is not None:
+        key = get_presence_key(user_id)
+        pipeline = connection.pipeline()
+        pipeline.zrem(key, connection_id)
+        pipeline.zcount(key, time.time(), '+inf')
+        if not pipeline.execute()[-1]:
+            set_flags([user_id])
+        return
+    User.objects.filter(id=user_id, is_online=True).update(is_online=False)
+
+
+def are_online(user_ids):
+    """Return a dict with the presence of every user."""
+    user_ids = list(user_ids)
+    connection = get_connection()
+    if connection is None:
+        online = set(User.objects.filter(id__in=user_ids, is_online=True).values_list('id', flat=True))
+        return {user_id: user_id in online for user_id in user_ids}
+
+    now = time.time()
+    pipeline = connection.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipeline.zcount(get_presence_key(user_id), now, '+inf')
+    return {user_id: bool(count) for user_id, count in zip(user_ids, pipeline.execute())}
+
+
+def is_online(user_id):
+    return are_online([user_id])[user_id]
+
+
+def sync_presence(batch_size=1000):
+    """Correct the flags of the users left behind by crashed workers, return how many."""
+    connection = get_connection()
+    if connection is None:
+        return 0
+
+    # The flagged users without connections and the connected users flagged offline
+    user_ids = [str(user_id) for user_id in User.objects.filter(is_online=True).values_list('id', flat=True)]
+    prefix = get_presence_key("")
+    connected = [key.decode()[len(prefix):] for key in connection.scan_iter(match=get_presence_key("*"))]
+    for start in range(0, len(connected), batch_size):
+        user_ids += [str(user_id) for user_id in User.objects.filter(
+            id__in=connected[start:start + batch_size], is_online=False).values_list('id', flat=True)]
+
+    changed = 0
+    for start in range(0, len(user_ids), batch_size):
+        changed += set_flags(user_ids[start:start + batch_size])
+    return changed
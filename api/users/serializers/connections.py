@@ -10,8 +10,6 @@ from django.contrib.auth import password_validation, authenticate
 from django.core.validators import RegexValidator
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 
 # Serializers
 from api.users.serializers import UserModelSerializer
@@ -20,6 +18,12 @@ from api.users.serializers import UserModelSerializer
 from api.users.models import Connection, User
 from api.notifications.models import Notification, NotificationUser
 
+# Presence
+from api.users import presence
+
+# Realtime
+from api.notifications import realtime
+
 
 class ConnectionModelSerializer(serializers.ModelSerializer):
     """User model serializer."""
@@ -78,8 +82,7 @@ class ConnectInvitationSerialzer(serializers.Serializer):
             user=addressee
         )
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % addressee.id, {
                 "type": "send.notification",
                 "event": "NEW_INVITATION",
@@ -87,7 +90,7 @@ class ConnectInvitationSerialzer(serializers.Serializer):
             }
         )
 
-        if not addressee.is_online and addressee.email_notifications_allowed:
+        if addressee.email_notifications_allowed and not presence.is_online(addressee.id):
             send_invitation_email(requester, addressee)
 
         return connection
@@ -131,15 +134,14 @@ class AcceptConnectionSerializer(serializers.Serializer):
             user=requester
         )
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % requester.id, {
                 "type": "send.notification",
                 "event": "NEW_CONNECTION",
                 "notification__pk": str(user_notification.pk),
             }
         )
-        if not requester.is_online and requester.email_notifications_allowed:
+        if requester.email_notifications_allowed and not presence.is_online(requester.id):
             send_connection_accepted(addressee, requester)
         return data
 
@@ -189,8 +191,7 @@ class RemoveConnectionSerializer(serializers.Serializer):
         requester.connections_count -= 1
         requester.save()
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % user.id, {
                 "type": "send.notification",
                 "event": "CONNECTION_REMOVED",
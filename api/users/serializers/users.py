@@ -8,10 +8,6 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Sum, Q
 from django.contrib.gis.geos import Point
 
-# Channels
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-
 # Django REST Framework
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
@@ -26,6 +22,15 @@ from api.donations.models import Donation, DonationOption, DonationPayment
 
 # Serializers
 
+# Loaders
+from api.users.loaders import SocialGraphLoader
+
+# Counters
+from api.notifications import counters, realtime
+
+# Presence
+from api.users import presence
+
 # Celery
 from api.taskapp.tasks import (
     send_confirmation_email,
@@ -54,6 +59,8 @@ env = environ.Env()
 
 class DetailedUserModelSerializer(serializers.ModelSerializer):
     """User model serializer."""
+    pending_messages = serializers.SerializerMethodField(read_only=True)
+    pending_notifications = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         """Meta class."""
@@ -105,6 +112,12 @@ class DetailedUserModelSerializer(serializers.ModelSerializer):
             'id',
         )
 
+    def get_pending_messages(self, obj):
+        return counters.get_counters(obj.id)[counters.MESSAGES]
+
+    def get_pending_notifications(self, obj):
+        return counters.get_counters(obj.id)[counters.NOTIFICATIONS]
+
 
 class UserModelSerializer(serializers.ModelSerializer):
     """User model serializer."""
@@ -154,29 +167,33 @@ class UserModelSerializer(serializers.ModelSerializer):
             'id',
         )
 
-    def get_is_followed(self, obj):
+    def get_social_graph(self):
         if 'request' in self.context and self.context['request'].user.id:
-            user = self.context['request'].user
-            return Follow.objects.filter(from_user=user, followed_user=obj).exists()
+            return SocialGraphLoader.for_request(self.context['request'])
+        return None
+
+    def get_is_followed(self, obj):
+        social_graph = self.get_social_graph()
+        if social_graph:
+            return social_graph.is_followed(obj)
         return False
 
     def get_connection_invitation_sent(self, obj):
-        if 'request' in self.context and self.context['request'].user.id:
-            user = self.context['request'].user
-            return Connection.objects.filter(requester=user, addressee=obj, accepted=False).exists()
+        social_graph = self.get_social_graph()
+        if social_graph:
+            return social_graph.is_invitation_sent(obj)
         return False
 
     def get_accept_invitation(self, obj):
-        if 'request' in self.context and self.context['request'].user.id:
-            user = self.context['request'].user
-            return Connection.objects.filter(requester=obj, addressee=user, accepted=False).exists()
+        social_graph = self.get_social_graph()
+        if social_graph:
+            return social_graph.is_invitation_received(obj)
         return False
 
     def get_is_connection(self, obj):
-        if 'request' in self.context and self.context['request'].user.id:
-            user = self.context['request'].user
-            return Connection.objects.filter(Q(requester=user, addressee=obj) |
-                                             Q(requester=obj, addressee=user), accepted=True).exists()
+        social_graph = self.get_social_graph()
+        if social_graph:
+            return social_graph.is_connection(obj)
         return False
 
 
@@ -1031,15 +1048,14 @@ class CreateDonationSerializer(serializers.Serializer):
             user=to_user
         )
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        realtime.dispatch(
             "user-%s" % to_user.id, {
                 "type": "send.notification",
                 "event": "NEW_DONATION",
                 "notification__pk": str(user_notification.pk),
             }
         )
-        if not to_user.is_online and to_user.email_notifications_allowed:
+        if to_user.email_notifications_allowed and not presence.is_online(to_user.id):
             send_new_donation(user, to_user, is_anonymous)
         if not is_anonymous and user:
             user.karma_amount += paid_karma
@@ -0,0 +1,115 @@
+# Django
+from django.test import TestCase
+
+# Model
+from api.users.models import User
+
+# Utils
+from api.users import presence
+from api.utils.testing import FakeRedis
+from unittest import mock
+
+
+class PresenceTestCase(TestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.other_user = User.objects.create(username="ivan", email="ivan@gmail.com")
+
+    def test_connect_and_disconnect(self):
+        """Users should be online while they are connected"""
+        presence.connect(self.user.id, "connection-1")
+        self.assertEqual(presence.are_online([self.user.id, self.other_user.id]), {
+            self.user.id: True,
+            self.other_user.id: False,
+        })
+        presence.disconnect(self.user.id, "connection-1")
+        self.assertFalse(presence.is_online(self.user.id))
+
+    def test_connect_syncs_flag(self):
+        """The online flag should follow the presence"""
+        presence.connect(self.user.id, "connection-1")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_online)
+        presence.disconnect(self.user.id, "connection-1")
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_online)
+
+
+class RedisPresenceTestCase(TestCase):
+    def setUp(self):
+
+        self.user = User.objects.create(username="alex", email="alex@gmail.com")
+        self.now = 1000.0
+        self.connection = FakeRedis()
+        patches = [
+            mock.patch.object(presence, "get_connection", return_value=self.connection),
+            mock.patch.object(presence, "time", mock.Mock(time=lambda: self.now)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def is_flagged_online(self):
+        return User.objects.get(id=self.user.id).is_online
+
+    def test_several_connections(self):
+        """Users should stay online until their last connection closes"""
+        presence.connect(self.user.id, "connection-1")
+        with self.assertNumQueries(0):
+            presence.connect(self.user.id, "connection-2")
+
+        presence.disconnect(self.user.id, "connection-1")
+        self.assertTrue(presence.is_online(self.user.id))
+        self.assertTrue(self.is_flagged_online())
+
+        presence.disconnect(self.user.id, "connection-2")
+        self.assertFalse(presence.is_online(self.user.id))
+        self.assertFalse(self.is_flagged_online())
+
+    def test_heartbeat_keeps_online(self):
+        """Heartbeats should renew the connection before it expires"""
+        presence.connect(self.user.id, "connection-1")
+        for _ in range(3):
+            self.now += presence.PRESENCE_TTL - 1
+            presence.heartbeat(self.user.id, "connection-1")
+        self.assertTrue(presence.is_online(self.user.id))
+
+    def test_sync_presence(self):
+        """Users left online by a crashed worker should be set offline"""
+        presence.connect(self.user.id, "connection-1")
+        self.assertEqual(presence.sync_presence(), 0)
+
+        # The worker crashed without disconnecting
+        self.now += presence.PRESENCE_TTL + 1
+        self.assertFalse(presence.is_online(self.user.id))
+        self.assertTrue(self.is_flagged_online())
+        self.assertEqual(presence.sync_presence(), 1)
+        self.assertFalse(self.is_flagged_online())
+
+        # The next connection sets the user online again
+        presence.connect(self.user.id, "connection-2")
+        self.assertTrue(self.is_flagged_online())
+
+    def test_disconnect_racing_reconnect(self):
+        """A reconnect on another worker during the last disconnect should keep the user online"""
+        presence.connect(self.user.id, "connection-1")
+        set_flags = presence.set_flags
+
+        def reconnect(user_ids):
+            # The other worker connects after the connection was removed, before the flag is written
+            self.assertEqual(presence.touch(self.connection, self.user.id, "connection-2"), 1)
+            return set_flags(user_ids)
+
+        with mock.patch.object(presence, "set_flags", side_effect=reconnect):
+            presence.disconnect(self.user.id, "connection-1")
+        self.assertTrue(presence.is_online(self.user.id))
+        self.assertTrue(self.is_flagged_online())
+
+    def test_sync_presence_sets_online(self):
+        """Connected users flagged offline should be set online"""
+        presence.connect(self.user.id, "connection-1")
+        User.objects.filter(id=self.user.id).update(is_online=False)
+        self.assertEqual(presence.sync_presence(), 1)
+        self.assertTrue(self.is_flagged_online())
+        self.assertEqual(presence.sync_presence(), 0)
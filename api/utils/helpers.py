@@ -7,6 +7,7 @@ from django.template.loader import render_to_string
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db.models import Sum
+from django.db import transaction
 
 # DRF
 from rest_framework import serializers
@@ -283,13 +284,17 @@ def get_chat(sent_by, sent_to):
     if not sent_by or not sent_to:
         return False
 
-    chats = Chat.objects.filter(participants=sent_by)
-    chats = chats.filter(participants=sent_to)
-    if chats.exists():
-        for chat in chats:
-            if chat.participants.all().count() == 2:
-                return chat
-    return False
+    return Chat.objects.filter(pair_key=Chat.get_pair_key(sent_by, sent_to)).first() or False
+
+
+def get_or_create_chat(sent_by, sent_to):
+    """Return the direct chat of the users and if it was created."""
+    # A concurrent creation fails on the pair key and gets the chat once committed
+    with transaction.atomic():
+        chat, created = Chat.objects.get_or_create(pair_key=Chat.get_pair_key(sent_by, sent_to))
+        if created:
+            chat.participants.add(sent_by, sent_to)
+    return chat, created
 
 
 def get_currency_rate(currency, rate_date='latest'):
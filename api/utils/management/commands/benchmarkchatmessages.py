@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from channels.testing import WebsocketCommunicator
+from asgiref.sync import async_to_sync
+
+from api.users.models import User
+from api.chats.models import Chat
+from config.routing import application
+
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = "Compare posting chat messages to the messages API with sending them over the chat socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # The sockets persist in other threads, the data has to be committed
+        sender = User.objects.create(username="benchmark-sender", email="benchmark-sender@talendy.com")
+        receiver = User.objects.create(username="benchmark-receiver", email="benchmark-receiver@talendy.com")
+        try:
+            chat = Chat.objects.create()
+            chat.participants.add(sender)
+            chat.participants.add(receiver)
+            sender_token = Token.objects.create(user=sender).key
+            receiver_token = Token.objects.create(user=receiver).key
+
+            self.report('messages API', *self.post_messages(chat, sender_token, options['messages']))
+            self.report('chat socket', *async_to_sync(self.send_messages)(
+                chat, sender_token, receiver_token, options['messages']))
+        finally:
+            Chat.objects.filter(participants=sender).delete()
+            User.objects.filter(id__in=[sender.id, receiver.id]).delete()
+
+    def post_messages(self, chat, token, count):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token %s" % token)
+        latencies = []
+        started = time.perf_counter()
+        for index in range(count):
+            sent = time.perf_counter()
+            client.post("/api/chats/%s/messages/" % chat.id, {"text": "Message %s" % index}, format="json")
+            latencies.append(time.perf_counter() - sent)
+        return latencies, time.perf_counter() - started
+
+    async def send_messages(self, chat, sender_token, receiver_token, count):
+        # The sockets only accept the allowed hosts origins
+        headers = [(b"origin", b"http://localhost")]
+        sender = WebsocketCommunicator(application, "/ws/chat/%s/?token=%s" % (chat.id, sender_token), headers)
+        receiver = WebsocketCommunicator(application, "/ws/chat/%s/?token=%s" % (chat.id, receiver_token), headers)
+        await sender.connect()
+        await receiver.connect()
+
+        latencies = []
+        started = time.perf_counter()
+        for index in range(count):
+            sent = time.perf_counter()
+            await sender.send_json_to({"text": "Message %s" % index})
+            await receiver.receive_json_from(timeout=5)
+            latencies.append(time.perf_counter() - sent)
+            await sender.receive_json_from(timeout=5)
+        elapsed = time.perf_counter() - started
+
+        await sender.disconnect()
+        await receiver.disconnect()
+        return latencies, elapsed
+
+    def report(self, name, latencies, elapsed):
+        latencies = sorted(latencies)
+        print("%s: %.2f ms mean, %.2f ms p95 latency, %.0f messages/s" % (
+            name,
+            statistics.mean(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            len(latencies) / elapsed,
+        ))
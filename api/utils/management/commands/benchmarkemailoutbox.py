@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from api.users.models import User
+from api.posts.models import Post
+from api.notifications import outbox
+
+import time
+
+
+class Command(BaseCommand):
+    help = "Compare sending one email per call with draining the email outbox over the locmem backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=outbox.OUTBOX_BATCH_SIZE)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            author = User.objects.create(username="benchmark-author", email="benchmark-author@talendy.com")
+            post = Post.objects.create(user=author, title="Benchmark post", members_count=1)
+            users = [
+                User(username="benchmark-%s" % index, email="benchmark-%s@talendy.com" % index)
+                for index in range(options['emails'])
+            ]
+            User.objects.bulk_create(users)
+            print("%s recipients created..." % len(users))
+
+            started = time.perf_counter()
+            for user in users:
+                content = render_to_string('emails/users/new_post.html', {'user': author, 'post': post})
+                msg = EmailMultiAlternatives('New post', content, outbox.FROM_EMAIL, [user.email])
+                msg.attach_alternative(content, "text/html")
+                msg.send()
+            self.report('one send per email', len(users), time.perf_counter() - started)
+
+            started = time.perf_counter()
+            outbox.enqueue('new_post', users, user=author, post=post)
+            enqueued = time.perf_counter() - started
+            sent = outbox.drain(options['batch_size'])
+            self.report('outbox (enqueue %.2f s)' % enqueued, sent, time.perf_counter() - started)
+
+            transaction.set_rollback(True)
+
+    def report(self, name, count, elapsed):
+        print("%s: %s emails in %.2f s, %.0f emails/s" % (name, count, elapsed, count / elapsed))
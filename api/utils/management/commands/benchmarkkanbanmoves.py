@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.users.models import User
+from api.posts.models import Post, KanbanList, KanbanCard
+from api.posts import kanbans
+
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = "Measure the latency and rows written of kanban card moves on long lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=5000)
+        parser.add_argument('--moves', type=int, default=500)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        user = User.objects.create(username="benchmark-kanban", email="benchmark-kanban@talendy.com")
+        try:
+            post = Post.objects.create(user=user, title="Benchmark kanban")
+            lists = [kanbans.create_list(post, title=title) for title in ("To do", "Done")]
+            for kanban_list in lists:
+                KanbanCard.objects.bulk_create([
+                    KanbanCard(kanban_list=kanban_list, title="Card %s" % index, rank=rank)
+                    for index, rank in enumerate(kanbans.spread(options['cards']))
+                ], batch_size=1000)
+
+            self.report('moves in a list', *self.move(post, lists[:1], options['moves'], random.randint))
+            self.report('moves between lists', *self.move(post, lists, options['moves'], random.randint))
+            # Every move halves the same gap, the worst case for the key length
+            self.report('moves to one gap', *self.move(post, lists[:1], options['moves'], lambda start, end: 1))
+
+            started = time.perf_counter()
+            changed = kanbans.rebalance(KanbanList.__name__, lists[0].id)
+            print("rebalance: %d keys in %.2f ms, %d max key length" % (
+                changed, (time.perf_counter() - started) * 1000, self.get_max_length(lists[0])))
+        finally:
+            Post.objects.filter(user=user).delete()
+            user.delete()
+
+    def move(self, post, lists, count, get_end):
+        latencies = []
+        writes = []
+        for _ in range(count):
+            list_start, list_end = random.choice(lists), random.choice(lists)
+            start = random.randint(0, KanbanCard.objects.filter(kanban_list=list_start).count() - 1)
+            end = get_end(0, KanbanCard.objects.filter(kanban_list=list_end).count() - 1)
+            with CaptureQueriesContext(connection) as queries:
+                sent = time.perf_counter()
+                kanbans.move_card(post.id, list_start.id, list_end.id, start, end)
+                latencies.append(time.perf_counter() - sent)
+            writes.append(len([query for query in queries if query["sql"].startswith("UPDATE")]))
+        return latencies, writes, max(self.get_max_length(kanban_list) for kanban_list in lists)
+
+    def get_max_length(self, kanban_list):
+        ranks = KanbanCard.objects.filter(kanban_list=kanban_list).values_list("rank", flat=True)
+        return max(len(rank) for rank in ranks)
+
+    def report(self, name, latencies, writes, length):
+        latencies = sorted(latencies)
+        print("%s: %.2f ms mean, %.2f ms p95 latency, %.1f updates per move, %d max key length" % (
+            name,
+            statistics.mean(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            statistics.mean(writes),
+            length,
+        ))
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api.users.models import User
+from api.posts.models import Post
+from api.posts.models.posts import get_search_vector
+from api.posts.filters import PostSearchFilter
+from faker import Faker
+
+import random
+import time
+
+fakegen = Faker()
+
+# Fields of the replaced icontains search filter
+ICONTAINS_FIELDS = (
+    "title",
+    "text",
+    "user__username",
+    "user__email",
+    "user__first_name",
+    "user__last_name",
+)
+
+
+class Command(BaseCommand):
+    help = "Compare the post full text search with the icontains search filter on a generated corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            terms = self.create_corpus(options['posts'])
+
+            def icontains_search(term):
+                conditions = Q()
+                for field in ICONTAINS_FIELDS:
+                    conditions |= Q(**{'%s__icontains' % field: term})
+                return Post.objects.filter(conditions).order_by('-created')
+
+            def full_text_search(term):
+                return PostSearchFilter().filter_queryset(FakeRequest(term), Post.objects.all(), None)
+
+            for name, search in (('icontains', icontains_search), ('full text', full_text_search)):
+                elapsed = self.measure(search, terms, options['iterations'])
+                print("%s: %.2f ms per search" % (name, elapsed * 1000))
+
+            transaction.set_rollback(True)
+
+    def create_corpus(self, count):
+        users = [
+            User.objects.create(
+                username="benchmark-%s" % index,
+                email="benchmark-%s@talendy.com" % index,
+                first_name=fakegen.first_name(),
+                last_name=fakegen.last_name(),
+            ) for index in range(50)
+        ]
+        posts = [
+            Post(user=random.choice(users), title=fakegen.sentence(), text=fakegen.text(1000), members_count=1)
+            for index in range(count)
+        ]
+        Post.objects.bulk_create(posts, batch_size=1000)
+
+        # bulk_create skips Post.save, index the corpus at once
+        for user in users:
+            Post.objects.filter(user=user).update(search_vector=get_search_vector(user.get_search_author()))
+        print("Corpus of %s posts created..." % count)
+
+        return [fakegen.word() for index in range(10)]
+
+    def measure(self, search, terms, iterations):
+        started = time.perf_counter()
+        for index in range(iterations):
+            for term in terms:
+                list(search(term)[:12])
+        return (time.perf_counter() - started) / (iterations * len(terms))
+
+
+class FakeRequest:
+    def __init__(self, term):
+        self.query_params = {'search': term}
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+
+from api.posts import notes
+
+import json
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = "Compare the bytes and server time per shared notes edit of full text updates with ops"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--length', type=int, default=10000)
+        parser.add_argument('--edits', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        initial = text = "".join(random.choice("abcdefghij ") for _ in range(options['length']))
+        edits = []
+        for revision in range(options['edits']):
+            position = random.randint(0, len(text))
+            if random.random() < 0.8 or position == len(text):
+                op = {"position": position, "insert": random.choice("abcdefghij ")}
+            else:
+                op = {"position": position, "delete": 1}
+            text = notes.apply(text, op)
+            edits.append((revision, op, text))
+
+        full_text = [json.dumps({"shared_notes": text}) for revision, op, text in edits]
+        ops = [
+            json.dumps({
+                "action": "publish",
+                "topic": "post",
+                "id": "00000000-0000-0000-0000-000000000000",
+                "event": "notes_op",
+                "data": {"revision": revision, "op": op},
+            }) for revision, op, text in edits
+        ]
+        self.report('full text', full_text, self.decode_full_text)
+        self.report('ops', ops, lambda payloads: self.apply_ops(initial, payloads))
+
+    def decode_full_text(self, payloads):
+        for payload in payloads:
+            json.loads(payload)["shared_notes"]
+
+    def apply_ops(self, text, payloads):
+        for payload in payloads:
+            data = json.loads(payload)["data"]
+            if notes.is_valid_op(data["op"]):
+                text = notes.apply(text, data["op"])
+
+    def report(self, name, payloads, handle):
+        started = time.perf_counter()
+        handle(payloads)
+        elapsed = time.perf_counter() - started
+        sizes = [len(payload.encode()) for payload in payloads]
+        print("%s: %.0f bytes mean, %d bytes max per edit, %.1f KB total, %.2f us per edit" % (
+            name,
+            statistics.mean(sizes),
+            max(sizes),
+            sum(sizes) / 1024,
+            elapsed / len(payloads) * 1000000,
+        ))
@@ -5,6 +5,7 @@ import random
 
 from api.users.models import User
 from api.chats.models import Chat
+from api.utils import helpers
 from faker import Faker
 
 import uuid
@@ -54,9 +55,7 @@ class Command(BaseCommand):
             users = User.objects.all().exclude(username="alex")
             alex_user = User.objects.get(username="alex")
             for user in users:
-                chat = Chat.objects.create()
-                chat.participants.add(alex_user, user)
-                chat.save()
+                helpers.get_or_create_chat(alex_user, user)
             print("Chats created...")
 
         add_users(5)
@@ -1,7 +1,199 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+# Django
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Django REST Framework
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Utils
+import base64
+import datetime
+import json
 
 
 class ShortResultsSetPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'page_size'
     max_page_size = 6
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """Keyset pagination.
+
+    Opt-in with the `after` or `before` query params (empty to start from
+    the top of the feed). Pages are sliced with a WHERE over the composite
+    ordering key instead of OFFSET and no COUNT(*) is issued. Requests
+    without them, or views without a keyset ordering, fall back to the
+    limit/offset pagination.
+    """
+
+    after_query_param = 'after'
+    before_query_param = 'before'
+    ordering = ('-created', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(view)
+        keyset = self.ordering is not None and self.get_keyset(queryset, request)
+        self.keyset = bool(keyset)
+        if not self.keyset:
+            return super(KeysetPagination, self).paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.reverse, cursor = keyset
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, cursor))
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+            self.has_next = bool(cursor)
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = bool(cursor)
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super(KeysetPagination, self).get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_keyset(self, queryset, request):
+        """Return if the page goes backwards and the key values to start from.
+
+        Return None when the request is not paginated by keyset.
+        """
+        if self.before_query_param in request.query_params:
+            cursor = request.query_params[self.before_query_param]
+            return True, self.decode_cursor(queryset, cursor) if cursor else None
+        if self.after_query_param in request.query_params:
+            cursor = request.query_params[self.after_query_param]
+            return False, self.decode_cursor(queryset, cursor) if cursor else None
+        return None
+
+    def get_ordering(self, view):
+        if hasattr(view, 'get_keyset_ordering'):
+            return view.get_keyset_ordering()
+        return KeysetPagination.ordering
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super(KeysetPagination, self).get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.after_query_param, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super(KeysetPagination, self).get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.before_query_param, self.page[0])
+
+    def get_position_query_params(self):
+        """Return the query params that place a page, dropped from the links."""
+        return [self.offset_query_param, self.after_query_param, self.before_query_param]
+
+    def get_link(self, param, obj):
+        url = self.request.build_absolute_uri()
+        for position_param in self.get_position_query_params():
+            url = remove_query_param(url, position_param)
+        return replace_query_param(url, param, self.encode_cursor(obj))
+
+    def get_keyset_filter(self, ordering, values):
+        """Return rows placed after the key on the given ordering.
+
+        (a, b) after (x, y) on descending fields is a < x OR (a = x AND b < y).
+        """
+        keyset_filter = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = '%s__lt' % name if field.startswith('-') else '%s__gt' % name
+            condition = Q(**{lookup: values[index]})
+            for previous_field, value in zip(ordering[:index], values):
+                condition &= Q(**{previous_field.lstrip('-'): value})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def invert(self, field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            elif not isinstance(value, (int, float)):
+                value = str(value)
+            values.append(value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, queryset, cursor):
+        """Return the key values of the cursor converted by the ordering fields."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering) or None in values:
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = [queryset.model._meta.get_field(field.lstrip('-')) for field in self.ordering]
+        try:
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class MessageHistoryPagination(KeysetPagination):
+    """Keyset pagination of the messages of a room.
+
+    Besides the cursors, the `before_id` and `after_id` query params page
+    the messages written before or after the given message.
+    """
+
+    before_id_query_param = 'before_id'
+    after_id_query_param = 'after_id'
+
+    def get_keyset(self, queryset, request):
+        # The history is ordered from the newest, older messages come after
+        if request.query_params.get(self.before_id_query_param):
+            return False, self.get_message_key(queryset, request.query_params[self.before_id_query_param])
+        if request.query_params.get(self.after_id_query_param):
+            return True, self.get_message_key(queryset, request.query_params[self.after_id_query_param])
+        return super(MessageHistoryPagination, self).get_keyset(queryset, request)
+
+    def get_position_query_params(self):
+        return super(MessageHistoryPagination, self).get_position_query_params() + [
+            self.before_id_query_param, self.after_id_query_param]
+
+    def get_message_key(self, queryset, id):
+        fields = [field.lstrip('-') for field in self.ordering]
+        try:
+            values = queryset.filter(id=id).values_list(*fields).first()
+        except (TypeError, ValueError, ValidationError):
+            values = None
+        if values is None:
+            raise NotFound(self.invalid_cursor_message)
+        return list(values)
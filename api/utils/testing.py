@@ -0,0 +1,217 @@
+"""Tests utilities."""
+
+# Utils
+from redis import WatchError
+
+
+def to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class FakeRedis:
+    """The Redis commands used by the buffers and timelines, in memory.
+
+    Expirations are not tracked. Lua scripts can not run, the scripts used
+    by a test are given as Python functions called with the connection,
+    the keys and the args.
+    """
+
+    def __init__(self, scripts=None):
+        self.data = {}
+        self.versions = {}
+        self.scripts = scripts or {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        function = self.scripts[script]
+
+        def run(keys=(), args=(), client=None):
+            if client is not None:
+                return client.queue(function, self, keys, args)
+            return function(self, keys, args)
+        return run
+
+    def touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def get(self, key, default):
+        if key not in self.data:
+            self.data[key] = default
+        return self.data[key]
+
+    def clean(self, key):
+        if key in self.data and not self.data[key]:
+            del self.data[key]
+
+    def exists(self, *keys):
+        return len([key for key in keys if key in self.data])
+
+    def delete(self, *keys):
+        deleted = [key for key in keys if self.data.pop(key, None) is not None]
+        for key in deleted:
+            self.touch(key)
+        return len(deleted)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def scan_iter(self, match=None):
+        prefix = (match or "*").rstrip("*")
+        return [key.encode() for key in list(self.data) if key.startswith(prefix)]
+
+    # Sorted sets
+
+    def in_range(self, score, low, high):
+        return float(low) <= score <= float(high)
+
+    def ranked(self, key):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zadd(self, key, mapping):
+        members = self.get(key, {})
+        mapping = {to_bytes(member): float(score) for member, score in mapping.items()}
+        added = len(set(mapping) - set(members))
+        members.update(mapping)
+        self.touch(key)
+        return added
+
+    def zrem(self, key, *members):
+        removed = [member for member in members if self.data.get(key, {}).pop(to_bytes(member), None) is not None]
+        self.clean(key)
+        self.touch(key)
+        return len(removed)
+
+    def zremrangebyscore(self, key, low, high):
+        members = self.data.get(key, {})
+        return self.zrem(key, *[member for member, score in members.items() if self.in_range(score, low, high)])
+
+    def zremrangebyrank(self, key, start, stop):
+        ranked = self.ranked(key)
+        stop = len(ranked) + stop if stop < 0 else stop
+        return self.zrem(key, *[member for member, score in ranked[start:stop + 1]])
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        ranked = list(reversed(self.ranked(key)))
+        stop = len(ranked) + stop if stop < 0 else stop
+        entries = ranked[start:stop + 1]
+        return entries if withscores else [member for member, score in entries]
+
+    def zcount(self, key, low, high):
+        return len([score for score in self.data.get(key, {}).values() if self.in_range(score, low, high)])
+
+    def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    # Hashes
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(to_bytes(field))
+
+    def hmget(self, key, *fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hset(self, key, field, value):
+        fields = self.get(key, {})
+        added = to_bytes(field) not in fields
+        fields[to_bytes(field)] = to_bytes(value)
+        self.touch(key)
+        return int(added)
+
+    def hsetnx(self, key, field, value):
+        if self.hget(key, field) is not None:
+            return 0
+        return self.hset(key, field, value)
+
+    def hincrby(self, key, field, amount=1):
+        value = int(self.hget(key, field) or 0) + amount
+        self.hset(key, field, value)
+        return value
+
+    # Sets
+
+    def sadd(self, key, *members):
+        members = {to_bytes(member) for member in members}
+        added = len(members - self.get(key, set()))
+        self.data[key] |= members
+        self.touch(key)
+        return added
+
+    def srem(self, key, *members):
+        removed = {to_bytes(member) for member in members} & self.data.get(key, set())
+        self.data.get(key, set()).difference_update(removed)
+        self.clean(key)
+        self.touch(key)
+        return len(removed)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    # Lists
+
+    def rpush(self, key, *values):
+        stored = self.get(key, [])
+        stored.extend(to_bytes(value) for value in values)
+        self.touch(key)
+        return len(stored)
+
+    def lrange(self, key, start, stop):
+        values = self.data.get(key, [])
+        stop = len(values) + stop if stop < 0 else stop
+        return values[start:stop + 1]
+
+    def ltrim(self, key, start, stop):
+        self.data[key] = self.lrange(key, start, stop)
+        self.clean(key)
+        self.touch(key)
+        return True
+
+
+class FakePipeline:
+    """Queue the commands until executed, run them at once after a watch."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.commands = []
+        self.watched = None
+        self.multiple = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.reset()
+
+    def __getattr__(self, name):
+        command = getattr(self.connection, name)
+
+        def run(*args, **kwargs):
+            if self.watched is not None and not self.multiple:
+                return command(*args, **kwargs)
+            return self.queue(command, *args, **kwargs)
+        return run
+
+    def queue(self, command, *args, **kwargs):
+        self.commands.append((command, args, kwargs))
+        return self
+
+    def watch(self, *keys):
+        self.watched = {key: self.connection.versions.get(key, 0) for key in keys}
+
+    def multi(self):
+        self.multiple = True
+
+    def reset(self):
+        self.commands = []
+        self.watched = None
+        self.multiple = False
+
+    def execute(self):
+        commands, watched = self.commands, self.watched
+        self.reset()
+        if watched and any(self.connection.versions.get(key, 0) != version for key, version in watched.items()):
+            raise WatchError()
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
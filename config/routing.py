@@ -1,12 +1,18 @@
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
 from api.notifications import routing as notifications_routing
+from api.chats import routing as chats_routing
+from api.users.middleware import TokenAuthMiddlewareStack
 
 application = ProtocolTypeRouter(
     {
-        "websocket": AuthMiddlewareStack(
-            URLRouter(
-                notifications_routing.websocket_urlpatterns
+        # The sockets authenticate with the token cookie, other sites must not open them
+        "websocket": AllowedHostsOriginValidator(
+            TokenAuthMiddlewareStack(
+                URLRouter(
+                    notifications_routing.websocket_urlpatterns +
+                    chats_routing.websocket_urlpatterns
+                )
             )
         ),
     }
@@ -80,7 +80,7 @@ INSTALLED_APPS = [
     "api.donations.apps.DonationsAppConfig",
     "api.posts.apps.PostsAppConfig",
     "api.communities.apps.CommunitiesAppConfig",
-    "api.chats",
+    "api.chats.apps.ChatsConfig",
     # THIRD_PARTY_APPS
     "rest_framework",
     "rest_framework.authtoken",
@@ -108,6 +108,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.notifications.middleware.RealtimeEventsMiddleware",
     # 'django.middleware.locale.LocaleMiddleware'
 ]
 
@@ -359,6 +360,16 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERYD_TASK_TIME_LIMIT = 5 * 60
 CELERYD_TASK_SOFT_TIME_LIMIT = 60
 
+# Message digest emails, seconds without new messages before sending and
+# minimum seconds between two digests of the same user
+MESSAGE_DIGEST_QUIET_WINDOW = 60 * 5
+MESSAGE_DIGEST_RATE_LIMIT = 60 * 60
+
+# Whiteboard snapshots, seconds without new strokes or strokes before
+# rasterizing the drawing
+DRAWING_SNAPSHOT_QUIET_WINDOW = 10
+DRAWING_SNAPSHOT_STROKES = 100
+
 FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
 
 # Websockets
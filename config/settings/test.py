@@ -40,3 +40,18 @@ TEMPLATES[0]["OPTIONS"]["loaders"] = [  # NOQA
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 EMAIL_HOST = "localhost"
 EMAIL_PORT = 1025
+
+# Celery
+CELERY_TASK_ALWAYS_EAGER = True
+
+# Message digests, eager tasks can not wait
+MESSAGE_DIGEST_QUIET_WINDOW = 0
+MESSAGE_DIGEST_RATE_LIMIT = 0
+DRAWING_SNAPSHOT_QUIET_WINDOW = 0
+
+# Channels
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}